@@ -1,4 +1,5 @@
 import datetime
+from decimal import Decimal
 
 from beancount.core.prices import build_price_map
 from fava.core import FavaLedger
@@ -7,11 +8,13 @@ from freezegun import freeze_time
 
 from doujia.extensions.dashboard_logic import (
     ExpenseChartConfig,
+    _sum_amount_at,
     dashboard_summary,
     expense_group,
     expense_summary,
     grouped_account_compared_balance,
     interval_balance,
+    interval_balances,
     outing_expense_summary,
     transaction_count,
 )
@@ -490,6 +493,68 @@ def test_net_worth_interval_support_begin_date(
     assert amounts[1] == (datetime.date(year=2022, month=3, day=1), 2)
 
 
+def test_net_worth_interval_balances_should_match_single_group(
+    doc_ledger: FavaLedger,
+):
+    """
+    @@@/main.bean
+    2020-01-01 open Assets:Short:Cash
+    2020-01-01 open Assets:Short:Stock
+    2020-01-01 open Liabilities:Short
+    2020-01-01 open Equity:Opening-Balances
+
+    2022-01-01 price USD 6.5 CNY
+    2022-01-01 price AAPL 100 USD
+
+    2022-01-03 !
+        Assets:Short:Cash 1000 CNY
+        Equity:Opening-Balances
+
+    2022-01-10 !
+        Assets:Short:Stock 2 AAPL {90 USD}
+        Liabilities:Short -180 USD
+
+    2022-02-15 price AAPL 120 USD
+    2022-02-20 price USD 6.8 CNY
+
+    2022-03-05 !
+        Assets:Short:Stock -1 AAPL {90 USD}
+        Liabilities:Short 120 USD
+        Equity:Opening-Balances -30 USD
+    """
+    groups = {
+        "total": ["Assets:Short", "Liabilities:Short"],
+        "stock": ["Assets:Short:Stock"],
+        "empty": ["Assets:Long"],
+    }
+    end_date = datetime.date(year=2022, month=3, day=10)
+
+    for begin_date in [None, datetime.date(year=2022, month=1, day=5)]:
+        balances = interval_balances(doc_ledger, end_date, groups, "CNY", begin_date=begin_date)
+        assert balances["empty"] == []
+        assert balances["total"][0][0] == (begin_date or datetime.date(year=2022, month=1, day=2))
+        assert balances["stock"][0][0] == datetime.date(year=2022, month=1, day=9)
+        for name in ["total", "stock"]:
+            assert balances[name][-1][0] == end_date
+            for date, amount in balances[name]:
+                assert amount == _sum_amount_at(date + datetime.timedelta(days=1), groups[name], doc_ledger, "CNY")
+
+    balances = interval_balances(doc_ledger, end_date, groups, "CNY", sampling="month")
+    assert [x for x, _ in balances["total"]] == [
+        datetime.date(year=2021, month=12, day=31),
+        datetime.date(year=2022, month=1, day=31),
+        datetime.date(year=2022, month=2, day=28),
+        datetime.date(year=2022, month=3, day=10),
+    ]
+    assert balances["total"][1][1] == Decimal("1130")
+    assert balances["stock"] == [
+        (datetime.date(year=2021, month=12, day=31), 0),
+        (datetime.date(year=2022, month=1, day=31), Decimal("1300")),
+        (datetime.date(year=2022, month=2, day=28), Decimal("1632")),
+        (datetime.date(year=2022, month=3, day=10), Decimal("816")),
+    ]
+
+
 @freeze_time("2022-01-01")
 def test_dashboard_summary(doc_ledger: FavaLedger):
     """
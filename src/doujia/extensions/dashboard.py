@@ -11,7 +11,7 @@ from doujia.extensions.dashboard_logic import (
     dashboard_summary,
     expense_group,
     grouped_account_compared_balance,
-    interval_balance,
+    interval_balances,
     outing_expense_summary,
     transaction_count,
 )
@@ -64,36 +64,19 @@ class Dashboard(FavaExtensionBase):
     def net_worth_chart(self):
         begin, end = parse_date("2021-08-01 - day")
         end = end - timedelta(days=1)
-        return jsonify(
-            NetWorthChart(
-                title="Net Worth",
-                currency="CNY",
-                total=interval_balance(
-                    self.ledger,
-                    end,
-                    ["Assets:Short", "Liabilities:Short"],
-                    "CNY",
-                    interval_days=1,
-                    begin_date=begin,
-                ),
-                investment=interval_balance(
-                    self.ledger,
-                    end,
-                    ["Assets:Short:Investment"],
-                    "CNY",
-                    interval_days=1,
-                    begin_date=begin,
-                ),
-                stock=interval_balance(
-                    self.ledger,
-                    end,
-                    ["Assets:Short:Stock"],
-                    "CNY",
-                    interval_days=1,
-                    begin_date=begin,
-                ),
-            )
+        balances = interval_balances(
+            self.ledger,
+            end,
+            {
+                "total": ["Assets:Short", "Liabilities:Short"],
+                "investment": ["Assets:Short:Investment"],
+                "stock": ["Assets:Short:Stock"],
+            },
+            "CNY",
+            sampling="day",
+            begin_date=begin,
         )
+        return jsonify(NetWorthChart(title="Net Worth", currency="CNY", **balances))
 
     def dashboard_summary(self):
         begin, _ = parse_date("year")
@@ -1,17 +1,20 @@
 import datetime
+from bisect import bisect_left
+from collections.abc import Callable
 from decimal import Decimal
-from typing import NamedTuple, cast
+from typing import NamedTuple
 
 from beancount.core import data, getters
 from beancount.core.data import Directive
 from beancount.core.inventory import Inventory
+from beancount.core.number import ONE, ZERO
 from beancount.core.prices import build_price_map
-from fava.beans.abc import Posting
-from fava.beans.protocols import Amount
+from fava.beans.prices import FavaPriceMap
 from fava.core import CounterInventory, FavaLedger
 from fava.core.conversion import conversion_from_str, convert_position
 from fava.util.date import parse_date
 
+from doujia.ledger.snapshot import LedgerSnapshot, UnitsKey
 from doujia.report.daily import DailyReport, daily_report
 from doujia.report.saving import calc_saving
 from doujia.report.summerize import (
@@ -206,18 +209,11 @@ def _sum_amount_at(
     """统计特定账户在 end 日期之前的 balance, 不包括 end_exclude 这一天"""
     inventory = CounterInventory()
 
-    for txn in ledger.all_entries_by_type.Transaction:
-        if txn.date >= end_exclude:
-            continue
-
-        for posting in txn.postings:
-            founds = False
-            for prefix in account_prefixes:
-                if posting.account.startswith(prefix):
-                    founds = True
-                    break
-            if founds:
-                inventory.add_position(posting)
+    # 换算时只会用到成本的货币, 因此按 (货币, 成本货币) 汇总即可
+    units = LedgerSnapshot.of(ledger.all_entries).units_before(account_prefixes, end_exclude)
+    for (units_currency, cost_currency), number in units.items():
+        cost = None if cost_currency is None else data.Cost(Decimal(0), cost_currency, None, None)
+        inventory.add_amount(data.Amount(number, units_currency), cost)
 
     if len(inventory) == 0:
         return Decimal(0)
@@ -338,43 +334,175 @@ def outing_expense_summary(
     return OutingExpenseSummary(total=total, last_total=last_total, groups=groups, last_groups=last_groups)
 
 
-def interval_balance(
-    ledger: FavaLedger,
-    end_date: datetime.date,
-    account_prefixes: list[str],
+def _daily_rates(prices: FavaPriceMap, base_quote: tuple[str, str], dates: list[datetime.date]) -> list[Decimal | None]:
+    """base_quote 在每个升序的 dates 上的价格, 与 prices.get_price 的结果一致"""
+    base, quote = base_quote
+    if base == quote:
+        return [ONE] * len(dates)
+
+    price_list = prices.get_all_prices(base_quote) or []
+    rates: list[Decimal | None] = []
+    rate = None
+    index = 0
+    for date in dates:
+        while index < len(price_list) and price_list[index][0] <= date:
+            rate = price_list[index][1]
+            index += 1
+        rates.append(rate)
+    return rates
+
+
+def _conversion_rates(
+    prices: FavaPriceMap,
+    key: UnitsKey,
     currency: str,
-    interval_days=7,
-    begin_date: datetime.date | None = None,
-) -> list[DataPoint]:
-    all_inventory = CounterInventory()
-    posting_by_date: list[tuple[datetime.date, Posting]] = []
-    for txn in ledger.all_entries_by_type.Transaction:
-        if txn.date <= end_date:
-            for posting in txn.postings:
-                for account_prefix in account_prefixes:
-                    if posting.account.startswith(account_prefix):
-                        posting_by_date.append((txn.date, posting))
-                        all_inventory.add_position(posting)
-                        break
+    dates: list[datetime.date],
+) -> list[tuple[Decimal, ...] | None]:
+    """与 convert_position 相同的换算规则: 优先直接换算, 否则经由成本货币换算, 都不行时为 None"""
+    units_currency, cost_currency = key
+    direct = _daily_rates(prices, (units_currency, currency), dates)
+    if cost_currency is None or cost_currency == currency:
+        return [None if rate is None else (rate,) for rate in direct]
+
+    rates1 = _daily_rates(prices, (units_currency, cost_currency), dates)
+    rates2 = _daily_rates(prices, (cost_currency, currency), dates)
+    result: list[tuple[Decimal, ...] | None] = []
+    for rate, rate1, rate2 in zip(direct, rates1, rates2, strict=True):
+        if rate is not None:
+            result.append((rate,))
+        elif rate1 is not None and rate2 is not None:
+            result.append((rate1, rate2))
+        else:
+            result.append(None)
+    return result
 
-    accumulated_amounts: list[DataPoint] = []
-    while len(posting_by_date) > 0:
-        while len(posting_by_date) > 0 and posting_by_date[-1][0] > end_date:
-            _, posting = posting_by_date.pop()
-            amount = cast(Amount, data.Amount(-posting.units.number, posting.units.currency))
 
-            all_inventory.add_amount(amount, posting.cost)
+def _previous_month_end(date: datetime.date) -> datetime.date:
+    return date.replace(day=1) - datetime.timedelta(days=1)
 
-        accumulated_amounts.append((end_date, _get_only_amount(all_inventory, ledger, currency, end_date)))
 
-        if begin_date and end_date == begin_date:
+SAMPLING_STEPS: dict[str, Callable[[datetime.date], datetime.date]] = {
+    "day": lambda x: x - datetime.timedelta(days=1),
+    "week": lambda x: x - datetime.timedelta(days=7),
+    "month": _previous_month_end,
+}
+
+
+def _sample_dates(
+    end_date: datetime.date,
+    first_date: datetime.date,
+    step: Callable[[datetime.date], datetime.date],
+    begin_date: datetime.date | None,
+) -> list[datetime.date]:
+    """从 end_date 开始向前取点, 直到第一笔 posting 之前或 begin_date"""
+    dates: list[datetime.date] = []
+    while True:
+        dates.append(end_date)
+        if end_date < first_date or (begin_date and end_date == begin_date):
             break
 
-        end_date = end_date - datetime.timedelta(days=interval_days)
+        end_date = step(end_date)
         if begin_date:
             end_date = max(end_date, begin_date)
 
-    return [x for x in reversed(accumulated_amounts)]
+    return [x for x in reversed(dates)]
+
+
+def _interval_balances(
+    ledger: FavaLedger,
+    end_date: datetime.date,
+    groups: dict[str, list[str]],
+    currency: str,
+    step: Callable[[datetime.date], datetime.date],
+    begin_date: datetime.date | None = None,
+) -> dict[str, list[DataPoint]]:
+    snapshot = LedgerSnapshot.of(ledger.all_entries)
+    result: dict[str, list[DataPoint]] = {name: [] for name in groups}
+
+    first_dates: dict[str, datetime.date] = {}
+    for name, account_prefixes in groups.items():
+        dates = [snapshot.dates_by_account[account][0] for account in snapshot.accounts(account_prefixes)]
+        if dates and min(dates) <= end_date:
+            first_dates[name] = min(dates)
+    if not first_dates:
+        return result
+
+    sample_dates = _sample_dates(end_date, min(first_dates.values()), step, begin_date)
+    # 每组从第一笔 posting 之前的最后一个采样点开始, 与单独计算这一组时一致
+    starts = {name: max(bisect_left(sample_dates, first_date) - 1, 0) for name, first_date in first_dates.items()}
+
+    # 第一个采样点之前的数量直接查累计数量, 之后的 posting 按日期合并后顺序累加
+    begin = sample_dates[0] + datetime.timedelta(days=1)
+    totals = {name: snapshot.units_before(groups[name], begin) for name in first_dates}
+    postings: list[tuple[datetime.date, str, UnitsKey, Decimal]] = []
+    for name in first_dates:
+        for ref in snapshot.postings(groups[name], begin, end_date + datetime.timedelta(days=1)):
+            units, cost = ref.posting.units, ref.posting.cost
+            key = (units.currency, cost.currency if cost is not None else None)
+            postings.append((ref.date, name, key, units.number))
+    postings.sort(key=lambda x: x[0])
+
+    rates: dict[UnitsKey, list[tuple[Decimal, ...] | None]] = {}
+    index = 0
+    for i, date in enumerate(sample_dates):
+        while index < len(postings) and postings[index][0] <= date:
+            _, name, key, number = postings[index]
+            totals[name][key] = totals[name].get(key, ZERO) + number
+            index += 1
+
+        for name, units in totals.items():
+            if i < starts[name]:
+                continue
+
+            amount = Decimal(0)
+            for key, number in units.items():
+                if number == ZERO:
+                    continue
+                if key not in rates:
+                    rates[key] = _conversion_rates(ledger.prices, key, currency, sample_dates)
+                factors = rates[key][i]
+                if factors is None:
+                    message = f"can't convert currencies {[key[0]]} at date {date}"
+                    raise CurrencyConversionError(message=message)
+                for factor in factors:
+                    number = number * factor
+                amount += number
+            result[name].append((date, amount))
+
+    return result
+
+
+def interval_balances(
+    ledger: FavaLedger,
+    end_date: datetime.date,
+    groups: dict[str, list[str]],
+    currency: str,
+    sampling: str = "day",
+    begin_date: datetime.date | None = None,
+) -> dict[str, list[DataPoint]]:
+    """
+    一次正向遍历得到多组账户的 interval_balance, 每组按 (货币, 成本货币) 维护累计数量
+    汇率按采样日期预先计算, sampling 可以是 day / week / month
+    """
+    return _interval_balances(ledger, end_date, groups, currency, SAMPLING_STEPS[sampling], begin_date)
+
+
+def interval_balance(
+    ledger: FavaLedger,
+    end_date: datetime.date,
+    account_prefixes: list[str],
+    currency: str,
+    interval_days=7,
+    begin_date: datetime.date | None = None,
+) -> list[DataPoint]:
+    return _interval_balances(
+        ledger,
+        end_date,
+        {"balance": account_prefixes},
+        currency,
+        lambda x: x - datetime.timedelta(days=interval_days),
+        begin_date,
+    )["balance"]
 
 
 def dashboard_summary(
@@ -441,18 +569,12 @@ def _fill_multiple_period_inventory(
     accounts: set[str],
     multiple_period_inventories: list[MultiplePeriodInventory],
 ):
-    for entry in entries:
-        if not isinstance(entry, data.Transaction):
-            continue
-
-        for posting in entry.postings:
-            if posting.account in accounts:
-                for mpi in multiple_period_inventories:
-                    if posting.account not in mpi.inventories:
-                        mpi.inventories[posting.account] = Inventory()
-
-                    if mpi.start_inclusive <= entry.date < mpi.end_exclusive:
-                        mpi.inventories[posting.account].add_position(posting)
+    snapshot = LedgerSnapshot.of(entries)
+    for account in accounts:
+        for mpi in multiple_period_inventories:
+            inventory = mpi.inventories.setdefault(account, Inventory())
+            for ref in snapshot.account_postings(account, mpi.start_inclusive, mpi.end_exclusive):
+                inventory.add_position(ref.posting)
 
 
 def grouped_account_compared_balance(
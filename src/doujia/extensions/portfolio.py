@@ -10,13 +10,14 @@ from doujia.extensions.portfolio_logic import (
     extract_beangrow_config_from_fava,
     overview_report,
 )
+from doujia.report.dashboard import gen_dashboard_data
 from doujia.report.investment import (
     calendar_returns,
     cumulative_returns,
     investments_performance,
     irr_summary,
 )
-from doujia.report.nav import gen_nav_index_data
+from doujia.report.nav_checkpoint import nav_checkpoints
 from doujia.report.pnl import gen_pnl_data
 
 
@@ -96,7 +97,7 @@ class Portfolio(FavaExtensionBase):
     def nav_index(self):
         begin_date, end_date, pricer, group, adlist = self._get_group_and_config()
 
-        nav_index = gen_nav_index_data(
+        nav_index = nav_checkpoints.gen_nav_index_data(
             account_datas=adlist,
             price_map=pricer.price_map,
             begin_date=begin_date,
@@ -106,6 +107,29 @@ class Portfolio(FavaExtensionBase):
 
         return jsonify(nav_index)
 
+    @extension_endpoint
+    def dashboard(self):
+        begin_date, end_date, pricer, group, adlist = self._get_group_and_config()
+
+        dashboard = gen_dashboard_data(
+            account_datas=adlist,
+            price_map=pricer.price_map,
+            begin_date=begin_date,
+            end_date=end_date,
+            target_currency=group.currency,
+        )
+
+        return jsonify(
+            {
+                "nav_index": dashboard.nav,
+                "pnl": dashboard.pnl,
+                "holdings": [
+                    {"number": position.units.number, "currency": position.units.currency}
+                    for position in dashboard.holdings.get_positions()
+                ],
+            }
+        )
+
     @extension_endpoint
     def cash_flows(self):
         begin_date, end_date, pricer, _, adlist = self._get_group_and_config()
@@ -3,16 +3,17 @@ from collections import namedtuple
 from pathlib import Path
 from typing import Any
 
-import beangrow.config as configlib
 import beangrow.returns as returnslib
-from beancount.core import getters, prices
+from beancount.core import prices
 from beancount.core.data import Directive
 from beangrow import investments
 from fava.core import FavaLedger
 from flask import current_app
 
+from doujia.report.extraction import beangrow_extractor
+from doujia.report.xirr import ReturnsProblem, compute_returns_batch
+
 Config = namedtuple("Config", ["beangrow_config_path"])
-GroupPerformanceDigest = namedtuple("GroupPerformanceDigest", ["irr"])
 GroupPerformance = namedtuple(
     "GroupPerformance",
     [
@@ -41,21 +42,10 @@ def extract_beangrow_config(
     end_date: datetime.date,
     dcontext: Any,
 ) -> tuple[returnslib.Pricer, dict, dict[investments.Account, investments.AccountData]]:
-    accounts = getters.get_accounts(entries)
-
     price_map = prices.build_price_map(entries)
     pricer = returnslib.Pricer(price_map)
 
-    beangrow_config = configlib.read_config(str(beangrow_config_path), [], accounts)
-
-    account_data_map = investments.extract(
-        entries,
-        dcontext,
-        beangrow_config,
-        end_date,
-        False,
-        "",
-    )
+    beangrow_config, account_data_map = beangrow_extractor.extract(entries, dcontext, beangrow_config_path, end_date)
 
     return pricer, beangrow_config.groups.group, account_data_map
 
@@ -67,24 +57,12 @@ def overview_report(
     start_date: datetime.date,
     end_date: datetime.date,
 ) -> list[dict]:
-    group_performances = []
+    problems = []
     for group in groups:
         adlist = [account_data_map[name] for name in group.investment if name in account_data_map]
+        cash_flows = returnslib.truncate_and_merge_cash_flows(pricer, adlist, start_date, end_date)
+        problems.append(ReturnsProblem(cash_flows, group.currency, end_date))
 
-        performance = _calculate_simple_group_performance(pricer, adlist, start_date, end_date, group.currency)
-        group_performances.append(dict(name=group.name, irr=performance.irr))
-
-    return group_performances
-
-
-def _calculate_simple_group_performance(
-    pricer: returnslib.Pricer,
-    adlist: list[investments.AccountData],
-    start_date: datetime.date,
-    end_date: datetime.date,
-    target_currency: str,
-) -> GroupPerformanceDigest:
-    truncated_cash_flows = returnslib.truncate_and_merge_cash_flows(pricer, adlist, start_date, end_date)
-    irr = returnslib.compute_returns(truncated_cash_flows, pricer, target_currency, end_date)
-
-    return GroupPerformanceDigest(irr=irr.total)
+    # 所有组的 IRR 在一次批量求解中完成
+    returns = compute_returns_batch(problems, pricer)
+    return [dict(name=group.name, irr=x.total) for group, x in zip(groups, returns, strict=True)]
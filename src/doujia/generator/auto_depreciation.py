@@ -22,10 +22,11 @@ from datetime import date
 
 from beancount.core import amount, convert, data
 from beancount.core.number import D, Decimal
-from beancount.loader import load_file
 from beancount.parser.printer import print_entries
 from dateutil.relativedelta import relativedelta
 
+from doujia.ledger.cache import load_file
+
 
 @dataclass
 class DepreciationConfig:
@@ -0,0 +1,79 @@
+from beancount.loader import load_file
+from beancount.parser import printer
+from pytest_mock import MockerFixture
+
+from doujia.ledger.cache import LedgerCache
+
+
+def _format(entries):
+    return [printer.format_entry(entry) for entry in entries]
+
+
+def test_cache_should_skip_loading_unchanged_ledger(doc_fs_ledger_filename: str, mocker: MockerFixture):
+    """
+    @@@/ledger/main.bean
+    include "sub/*.bean"
+
+    2020-01-01 open Assets:Cash
+    2020-01-01 open Expenses:Food
+
+    @@@/ledger/sub/a.bean
+    2020-01-02 *
+        Expenses:Food 1 CNY
+        Assets:Cash
+    """
+    load = mocker.Mock(wraps=load_file)
+    cache = LedgerCache("/cache")
+
+    entries, _, _ = cache.load_file(doc_fs_ledger_filename, load=load)
+    cached_entries, cached_errors, cached_options_map = cache.load_file(doc_fs_ledger_filename, load=load)
+
+    assert load.call_count == 1
+    assert _format(cached_entries) == _format(entries)
+    assert cached_errors == []
+    assert cached_options_map["include"] == ["/ledger/main.bean", "/ledger/sub/a.bean"]
+
+
+def test_cache_should_reload_when_include_files_change(doc_fs_ledger_filename: str, mocker: MockerFixture):
+    """
+    @@@/ledger/main.bean
+    include "sub/*.bean"
+
+    2020-01-01 open Assets:Cash
+    2020-01-01 open Expenses:Food
+
+    @@@/ledger/sub/a.bean
+    2020-01-02 *
+        Expenses:Food 1 CNY
+        Assets:Cash
+    """
+    load = mocker.Mock(wraps=load_file)
+    cache = LedgerCache("/cache")
+    cache.load_file(doc_fs_ledger_filename, load=load)
+
+    with open("/ledger/sub/a.bean", "a", encoding="utf-8") as f:
+        f.write("\n2020-01-03 *\n    Expenses:Food 2 CNY\n    Assets:Cash\n")
+    entries, _, _ = cache.load_file(doc_fs_ledger_filename, load=load)
+    assert load.call_count == 2
+    assert len(entries) == 4
+
+    with open("/ledger/sub/b.bean", "w", encoding="utf-8") as f:
+        f.write("2020-01-04 *\n    Expenses:Food 3 CNY\n    Assets:Cash\n")
+    entries, _, _ = cache.load_file(doc_fs_ledger_filename, load=load)
+    assert load.call_count == 3
+    assert len(entries) == 5
+
+
+def test_cache_should_ignore_other_versions(doc_fs_ledger_filename: str, mocker: MockerFixture):
+    """
+    @@@/ledger/main.bean
+    2020-01-01 open Assets:Cash
+    """
+    load = mocker.Mock(wraps=load_file)
+    cache = LedgerCache("/cache")
+    cache.load_file(doc_fs_ledger_filename, load=load)
+
+    mocker.patch("doujia.ledger.cache.CACHE_VERSION", 2)
+    cache.load_file(doc_fs_ledger_filename, load=load)
+
+    assert load.call_count == 2
@@ -0,0 +1,59 @@
+import datetime
+from typing import TypeVar
+
+from beancount.core import data
+from beancount.core.inventory import Inventory
+
+from doujia.ledger.inventory_checkpoint import InventoryCheckpoints
+from doujia.ledger.snapshot import LedgerSnapshot
+
+Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
+
+
+def test_inventory_checkpoints_should_match_replay(entries: list[Directive]):
+    """
+    @@@/main.bean
+    2020-01-01 open Assets:Cash
+    2020-01-01 open Assets:Stock
+    2020-01-01 open Income:PnL
+
+    2020-01-15 *
+        Assets:Stock 10 AAPL {100 USD}
+        Assets:Cash -1000 USD
+
+    2020-02-01 *
+        Assets:Stock 5 AAPL {120 USD}
+        Assets:Cash -600 USD
+
+    2020-05-20 *
+        Assets:Stock -10 AAPL {100 USD} @ 130 USD
+        Assets:Cash 1300 USD
+        Income:PnL -300 USD
+
+    2020-05-31 *
+        Assets:Cash 10 USD
+        Income:PnL
+    """
+    snapshot = LedgerSnapshot.build(entries)
+    checkpoints = InventoryCheckpoints.build(snapshot)
+
+    assert checkpoints.months[0] == datetime.date(2020, 1, 1)
+    assert checkpoints.months[-1] == datetime.date(2020, 6, 1)
+
+    date = datetime.date(2019, 12, 30)
+    while date < datetime.date(2020, 7, 3):
+        for prefixes in [["Assets"], ["Assets:Stock"], ["Income", "Assets:Cash"]]:
+            expected = Inventory()
+            for ref in snapshot.postings(prefixes, end_exclusive=date):
+                expected.add_position(ref.posting)
+
+            actual = checkpoints.inventory_at(prefixes, date)
+            # 结果是新的 Inventory, 修改后不影响 checkpoint
+            actual.add_amount(data.Amount(data.D(1), "XXX"))
+            actual.add_amount(data.Amount(data.D(-1), "XXX"))
+            assert actual == expected, (date, prefixes)
+        date += datetime.timedelta(days=1)
+
+    stock = checkpoints.account_inventories(["Assets:Stock"], datetime.date(2020, 3, 1))["Assets:Stock"]
+    assert len(stock) == 2
+    assert checkpoints.account_inventories(["Assets:Stock"], datetime.date(2020, 1, 15)) == {}
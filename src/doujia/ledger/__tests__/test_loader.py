@@ -0,0 +1,96 @@
+from beancount.loader import load_file
+from beancount.parser import printer
+from pytest_mock import MockerFixture
+
+from doujia.ledger import loader
+from doujia.ledger.loader import IncrementalLoader
+
+
+def _format(entries):
+    return [printer.format_entry(entry) for entry in entries]
+
+
+def test_incremental_load_should_match_beancount_loader(doc_fs_ledger_filename: str):
+    """
+    @@@/main.bean
+    option "operating_currency" "CNY"
+    include "sub/*.bean"
+
+    2020-01-01 open Assets:Cash
+    2020-01-01 open Assets:Stock
+    2020-01-01 open Equity:Opening
+    2020-01-01 pad Assets:Cash Equity:Opening
+    2020-01-05 balance Assets:Cash 1000 CNY
+
+    @@@/sub/stock.bean
+    2020-01-10 * "buy"
+        Assets:Stock 10 AAPL {10 CNY}
+        Assets:Cash
+    """
+    entries, errors, options_map = IncrementalLoader().load_file(doc_fs_ledger_filename)
+    expected_entries, expected_errors, expected_options_map = load_file(doc_fs_ledger_filename)
+
+    assert _format(entries) == _format(expected_entries)
+    assert errors == expected_errors
+    assert options_map["include"] == expected_options_map["include"]
+
+
+def test_incremental_load_should_only_reparse_changed_files(doc_fs_ledger_filename: str, mocker: MockerFixture):
+    """
+    @@@/main.bean
+    include "a.bean"
+    include "b.bean"
+
+    2020-01-01 open Assets:Cash
+    2020-01-01 open Expenses:Food
+
+    @@@/a.bean
+    2020-01-02 *
+        Expenses:Food 1 CNY
+        Assets:Cash
+
+    @@@/b.bean
+    2020-01-03 *
+        Expenses:Food 2 CNY
+        Assets:Cash
+    """
+    incremental_loader = IncrementalLoader()
+    incremental_loader.load_file(doc_fs_ledger_filename)
+
+    parse_file = mocker.spy(loader.parser, "parse_file")
+
+    with open("/b.bean", "a", encoding="utf-8") as f:
+        f.write("\n2020-01-04 *\n    Expenses:Food 3 CNY\n    Assets:Cash\n")
+
+    entries, errors, _ = incremental_loader.load_file(doc_fs_ledger_filename)
+
+    assert parse_file.call_count == 1
+    assert parse_file.call_args.kwargs["report_filename"] == "/b.bean"
+    assert errors == []
+    assert _format(entries) == _format(load_file(doc_fs_ledger_filename)[0])
+
+
+def test_warm_should_only_parse_files(doc_fs_ledger_filename: str, mocker: MockerFixture):
+    """
+    @@@/main.bean
+    include "a.bean"
+
+    2020-01-01 open Assets:Cash
+    2020-01-01 open Expenses:Food
+
+    @@@/a.bean
+    2020-01-02 *
+        Expenses:Food 1 CNY
+        Assets:Cash
+    """
+    incremental_loader = IncrementalLoader()
+    book = mocker.spy(loader.booking, "book")
+    incremental_loader.warm(doc_fs_ledger_filename)
+    assert book.call_count == 0
+
+    # 预热后没有变化的文件不再解析
+    parse_file = mocker.spy(loader.parser, "parse_file")
+    entries, errors, _ = incremental_loader.load_file(doc_fs_ledger_filename)
+    assert parse_file.call_count == 0
+    assert errors == []
+    assert _format(entries) == _format(load_file(doc_fs_ledger_filename)[0])
@@ -0,0 +1,92 @@
+import datetime
+from typing import TypeVar
+
+from beancount.core import data
+
+from doujia.ledger.snapshot import AccountTrie, LedgerSnapshot
+
+Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
+
+
+def test_account_trie_should_match_like_startswith():
+    trie = AccountTrie(["Assets:Short", "Assets:Short:Stock", "Assets:ShortTerm", "Assets:Long", "Expenses:Food"])
+
+    assert sorted(trie.find("Assets:Short")) == ["Assets:Short", "Assets:Short:Stock", "Assets:ShortTerm"]
+    assert sorted(trie.find("Assets:Short:")) == ["Assets:Short:Stock"]
+    assert sorted(trie.find("Expenses")) == ["Expenses:Food"]
+    assert trie.find("Income") == []
+
+
+def test_snapshot_postings_by_prefix_and_date(entries: list[Directive]):
+    """
+    @@@/main.bean
+    2020-01-01 open Assets:A:Sub
+    2020-01-01 open Assets:B
+    2020-01-01 open Expenses:Food
+
+    2020-01-01 *
+        Assets:A:Sub 100 CNY
+        Assets:B
+
+    2020-01-02 *
+        Expenses:Food 10 CNY
+        Assets:A:Sub
+
+    2020-01-03 *
+        Assets:A:Sub 1 CNY
+        Assets:B
+    """
+    snapshot = LedgerSnapshot.build(entries)
+
+    refs = snapshot.postings(["Assets:A"], end_exclusive=datetime.date(2020, 1, 3))
+    assert [ref.date for ref in refs] == [datetime.date(2020, 1, 1), datetime.date(2020, 1, 2)]
+    assert [ref.posting.units.number for ref in refs] == [100, -10]
+
+    refs = snapshot.postings(["Assets:A", "Assets"], begin=datetime.date(2020, 1, 2))
+    assert len(refs) == 3
+
+    assert len(snapshot.transactions_between(datetime.date(2020, 1, 2), datetime.date(2020, 1, 3))) == 1
+
+
+def test_snapshot_of_should_reuse_same_entries(entries: list[Directive]):
+    """
+    @@@/main.bean
+    2020-01-01 open Assets:A
+    """
+    snapshot = LedgerSnapshot.of(entries)
+
+    assert LedgerSnapshot.of(entries) is snapshot
+    assert LedgerSnapshot.of(snapshot) is snapshot
+
+
+def test_snapshot_units_before(entries: list[Directive]):
+    """
+    @@@/main.bean
+    2020-01-01 open Assets:A:Sub
+    2020-01-01 open Assets:A:Stock
+    2020-01-01 open Assets:B
+
+    2020-01-01 *
+        Assets:A:Sub 100 CNY
+        Assets:B
+
+    2020-01-02 *
+        Assets:A:Stock 2 AAPL {10 USD}
+        Assets:A:Sub -20 CNY
+        Assets:B 20 CNY
+        Assets:B -20 USD
+
+    2020-01-02 *
+        Assets:A:Sub -80 CNY
+        Assets:B
+
+    2020-01-03 *
+        Assets:A:Sub 1 CNY
+        Assets:B
+    """
+    snapshot = LedgerSnapshot.build(entries)
+
+    assert snapshot.units_before(["Assets:A"], datetime.date(2020, 1, 1)) == {}
+    assert snapshot.units_before(["Assets:A"], datetime.date(2020, 1, 2)) == {("CNY", None): 100}
+    assert snapshot.units_before(["Assets:A"], datetime.date(2020, 1, 3)) == {("AAPL", "USD"): 2}
+    assert snapshot.units_before(["Assets:A", "Assets:B"]) == {("AAPL", "USD"): 2, ("USD", None): -20}
@@ -0,0 +1,84 @@
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from doujia.ledger.watcher import LedgerWatcher, WatchTargets
+
+
+def _create_ledger(root: Path) -> WatchTargets:
+    (root / ".git" / "refs" / "heads").mkdir(parents=True)
+    (root / ".git" / "HEAD").write_text("ref: refs/heads/main\n")
+    (root / "main.bean").write_text('include "sub.bean"\n')
+    (root / "sub.bean").write_text("")
+
+    return WatchTargets(
+        ledger_files={str(root / "main.bean"), str(root / "sub.bean")},
+        git_paths={str(root / ".git" / "HEAD"), str(root / ".git" / "refs" / "heads")},
+    )
+
+
+def _start_watcher(targets: WatchTargets, use_inotify: bool) -> tuple[LedgerWatcher, list[bool], threading.Event]:
+    changes: list[bool] = []
+    changed = threading.Event()
+
+    def on_change(ledger_changed: bool):
+        changes.append(ledger_changed)
+        changed.set()
+
+    watcher = LedgerWatcher(
+        get_targets=lambda: targets,
+        on_change=on_change,
+        debounce=0.2,
+        poll_interval=0.05,
+        use_inotify=use_inotify,
+    )
+    watcher.start()
+    # 等待 watcher 线程完成监听的初始化
+    time.sleep(0.2)
+    return watcher, changes, changed
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_watcher_should_debounce_burst_of_writes(tmp_path: Path, use_inotify: bool):
+    targets = _create_ledger(tmp_path)
+    watcher, changes, changed = _start_watcher(targets, use_inotify)
+
+    try:
+        for i in range(5):
+            with open(tmp_path / "sub.bean", "a") as f:
+                f.write(f"; {i}\n")
+            time.sleep(0.02)
+        (tmp_path / ".git" / "refs" / "heads" / "main").write_text("0" * 40 + "\n")
+
+        assert changed.wait(timeout=5)
+        time.sleep(0.5)
+    finally:
+        watcher.stop()
+
+    assert changes == [True]
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_watcher_should_report_git_only_change(tmp_path: Path, use_inotify: bool):
+    targets = _create_ledger(tmp_path)
+    watcher, changes, changed = _start_watcher(targets, use_inotify)
+
+    try:
+        (tmp_path / ".git" / "HEAD").write_text("ref: refs/heads/other\n")
+
+        assert changed.wait(timeout=5)
+    finally:
+        watcher.stop()
+
+    assert changes == [False]
+
+
+def test_watcher_should_ignore_unrelated_files(tmp_path: Path):
+    targets = _create_ledger(tmp_path)
+
+    assert targets.classify(str(tmp_path / ".git" / "index")) is None
+    assert targets.classify(str(tmp_path / "main.bean.swp")) is None
+    assert targets.classify(str(tmp_path / "new.bean")) == "ledger"
+    assert targets.classify(str(tmp_path / ".git" / "refs" / "heads" / "main")) == "git"
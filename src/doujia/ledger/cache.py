@@ -0,0 +1,168 @@
+import glob
+import hashlib
+import os
+import pickle
+import re
+import struct
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from os import path
+from typing import NamedTuple, TypeVar
+
+import beancount
+import git
+from beancount import loader
+from beancount.core import data
+from logzero import logger
+
+Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
+LoadResult = tuple[list[Directive], list, dict]
+
+CACHE_MAGIC = b"DJLEDGER"
+# 修改缓存内容结构时需要增加版本号, 旧版本的缓存会被直接忽略
+CACHE_VERSION = 1
+
+_HEADER = struct.Struct("<8sIQ")
+_INCLUDE_RE = re.compile(rb'^include\s+"([^"]+)"', re.MULTILINE)
+
+
+class CacheKey(NamedTuple):
+    version: int
+    runtime: str
+    commit_id: str | None
+    manifest: tuple[tuple[str, str], ...]
+
+
+def default_cache_dir() -> str:
+    """命令行工具使用的缓存目录, 可以通过 DOUJIA_CACHE_DIR 覆盖"""
+    if "DOUJIA_CACHE_DIR" in os.environ:
+        return os.environ["DOUJIA_CACHE_DIR"]
+
+    cache_home = os.environ.get("XDG_CACHE_HOME", path.join(path.expanduser("~"), ".cache"))
+    return path.join(cache_home, "doujia")
+
+
+def _get_commit_id(ledger_root: str) -> str | None:
+    try:
+        return git.Repo(ledger_root, search_parent_directories=True).head.commit.hexsha
+    except Exception:
+        return None
+
+
+def _build_manifest(filename: str) -> tuple[tuple[str, str], ...]:
+    """
+    不解析 beancount 语法, 只通过 include 行找到所有文件并计算内容 hash
+    """
+    manifest: dict[str, str] = {}
+    stack = [path.normpath(filename)]
+    while stack:
+        current = stack.pop(0)
+        if current in manifest or not path.exists(current):
+            continue
+
+        with open(current, "rb") as f:
+            content = f.read()
+        manifest[current] = hashlib.sha256(content).hexdigest()
+
+        cwd = path.dirname(current)
+        for match in _INCLUDE_RE.finditer(content):
+            search_path = path.join(cwd, match.group(1).decode("utf-8"))
+            stack.extend(path.normpath(x) for x in glob.glob(search_path, recursive=True))
+
+    return tuple(sorted(manifest.items()))
+
+
+class LedgerCache:
+    """
+    把 load_file 的结果 (entries, errors, options_map) 保存到磁盘
+    git commit 与所有 include 文件的内容 hash 都没有变化时, 直接读取缓存跳过解析与 booking
+
+    文件格式: magic | version | key 长度 | pickle(key) | pickle((entries, errors, options_map))
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+
+    def _cache_path(self, filename: str) -> str:
+        name = hashlib.sha256(filename.encode("utf-8")).hexdigest()[:16]
+        return path.join(self.cache_dir, f"ledger-{name}.cache")
+
+    def _compute_key(self, filename: str) -> CacheKey:
+        return CacheKey(
+            version=CACHE_VERSION,
+            runtime=f"{sys.version_info.major}.{sys.version_info.minor}/beancount-{beancount.__version__}",
+            commit_id=_get_commit_id(path.dirname(filename)),
+            manifest=_build_manifest(filename),
+        )
+
+    def _read(self, cache_path: str, key: CacheKey) -> LoadResult | None:
+        try:
+            with open(cache_path, "rb") as f:
+                magic, version, key_length = _HEADER.unpack(f.read(_HEADER.size))
+                if magic != CACHE_MAGIC or version != CACHE_VERSION:
+                    return None
+
+                if pickle.loads(f.read(key_length)) != key:
+                    return None
+
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to read ledger cache {cache_path}: {e!s}")
+            return None
+
+    def _write(self, cache_path: str, key: CacheKey, result: LoadResult):
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        key_bytes = pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL)
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, len(key_bytes)))
+                f.write(key_bytes)
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)
+        except Exception as e:
+            logger.warning(f"Failed to write ledger cache {cache_path}: {e!s}")
+            if path.exists(temp_path):
+                os.remove(temp_path)
+
+    def load_file(
+        self,
+        filename: str,
+        load: Callable[[str], LoadResult] = loader.load_file,
+    ) -> LoadResult:
+        """与 beancount.loader.load_file 返回值一致, 缓存未命中时调用 load 并写入缓存"""
+        filename = path.abspath(filename)
+        cache_path = self._cache_path(filename)
+
+        start = time.perf_counter()
+        key = self._compute_key(filename)
+        result = self._read(cache_path, key)
+        if result is not None:
+            logger.info(f"Loaded {filename} from cache in {time.perf_counter() - start:.3f}s")
+            return result
+
+        result = load(filename)
+        _, _, options_map = result
+        logger.info(f"Loaded {filename} without cache in {time.perf_counter() - start:.3f}s")
+
+        # include 行扫描与 beancount 的解析结果不一致时, 无法保证缓存失效, 不写入缓存
+        if sorted(options_map["include"]) != [x[0] for x in key.manifest]:
+            logger.warning(f"Include files of {filename} can't be tracked, skip writing cache")
+            return result
+
+        # 解析过程中文件发生了变化
+        if _build_manifest(filename) != key.manifest:
+            return result
+
+        self._write(cache_path, key, result)
+        return result
+
+
+def load_file(filename: str, cache_dir: str | None = None) -> LoadResult:
+    """命令行工具使用的带缓存的 load_file"""
+    return LedgerCache(cache_dir or default_cache_dir()).load_file(filename)
@@ -0,0 +1,91 @@
+import copy
+import datetime
+from bisect import bisect_right
+from collections.abc import Iterable
+
+from beancount.core.inventory import Inventory
+
+from doujia.ledger.snapshot import LedgerSnapshot
+
+
+def _next_month(date: datetime.date) -> datetime.date:
+    return datetime.date(date.year + date.month // 12, date.month % 12 + 1, 1)
+
+
+class InventoryCheckpoints:
+    """
+    每个月第一天 (不包含当天) 每个账户的完整 inventory, 包括成本 lot
+    任意日期的 inventory 由不晚于该日期的最近一个 checkpoint 加上最多一个月的 posting 得到
+    没有变化的账户在相邻的 checkpoint 之间共享同一个 Inventory, checkpoint 中的 Inventory 不能修改
+    """
+
+    def __init__(
+        self,
+        snapshot: LedgerSnapshot,
+        months: list[datetime.date],
+        inventories: list[dict[str, Inventory]],
+    ):
+        self.snapshot = snapshot
+        self.months = months
+        self.inventories = inventories
+
+    @classmethod
+    def build(cls, snapshot: LedgerSnapshot) -> "InventoryCheckpoints":
+        months: list[datetime.date] = []
+        inventories: list[dict[str, Inventory]] = []
+        if not snapshot.transactions:
+            return cls(snapshot, months, inventories)
+
+        current: dict[str, Inventory] = {}
+        # 当前月份已经复制过的账户, 复制之前的 Inventory 属于上一个 checkpoint
+        copied: set[str] = set()
+        month = snapshot.transactions[0].date.replace(day=1)
+        for transaction in snapshot.transactions:
+            while transaction.date >= month:
+                months.append(month)
+                inventories.append(dict(current))
+                copied = set()
+                month = _next_month(month)
+
+            for posting in transaction.postings:
+                account = posting.account
+                if account not in copied:
+                    inventory = current.get(account)
+                    current[account] = copy.copy(inventory) if inventory is not None else Inventory()
+                    copied.add(account)
+                current[account].add_position(posting)
+
+        months.append(month)
+        inventories.append(current)
+        return cls(snapshot, months, inventories)
+
+    def account_inventories(
+        self,
+        account_prefixes: Iterable[str],
+        end_exclusive: datetime.date,
+    ) -> dict[str, Inventory]:
+        """前缀匹配的每个账户在 end_exclusive 之前的 inventory, 没有 posting 的账户不返回"""
+        index = bisect_right(self.months, end_exclusive) - 1
+        checkpoint = self.inventories[index] if index >= 0 else {}
+        begin = self.months[index] if index >= 0 else None
+
+        result: dict[str, Inventory] = {}
+        for account in self.snapshot.accounts(account_prefixes):
+            refs = self.snapshot.account_postings(account, begin, end_exclusive)
+            inventory = checkpoint.get(account)
+            if inventory is None and not refs:
+                continue
+
+            inventory = copy.copy(inventory) if inventory is not None else Inventory()
+            for ref in refs:
+                inventory.add_position(ref.posting)
+            result[account] = inventory
+
+        return result
+
+    def inventory_at(self, account_prefixes: Iterable[str], end_exclusive: datetime.date) -> Inventory:
+        """前缀匹配的账户在 end_exclusive 之前的合计 inventory"""
+        result = Inventory()
+        for inventory in self.account_inventories(account_prefixes, end_exclusive).values():
+            result.add_inventory(inventory)
+        return result
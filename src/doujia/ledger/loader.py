@@ -0,0 +1,171 @@
+import copy
+import glob
+import hashlib
+import io
+import sys
+import threading
+from dataclasses import dataclass
+from os import path
+from typing import TypeVar
+
+from beancount.core import data
+from beancount.loader import LoadError, aggregate_options_map, compute_input_hash, run_transformations
+from beancount.ops import validation
+from beancount.parser import booking, options, parser
+from beancount.utils import encryption
+from logzero import logger
+
+Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
+
+
+@dataclass
+class ParsedFile:
+    content_hash: str
+    entries: list[Directive]
+    errors: list
+    options_map: dict
+
+
+class IncrementalLoader:
+    """
+    增量加载 beancount 文件
+    按内容 hash 缓存每个 include 文件的解析结果, 只重新解析发生变化的文件,
+    然后对合并后的 entries 重新执行 booking, plugins 与校验
+    """
+
+    def __init__(self):
+        self._files: dict[str, ParsedFile] = {}
+        self._lock = threading.Lock()
+
+    def load_file(self, filename: str) -> tuple[list[Directive], list, dict]:
+        """与 beancount.loader.load_file 返回值一致"""
+        with self._lock:
+            return self._load(path.abspath(filename))
+
+    def warm(self, filename: str):
+        """只解析并缓存所有 include 文件, 不做 booking; 从磁盘缓存启动后预热, 之后的 reload 只解析变化的文件"""
+        with self._lock:
+            self._parse_recursive(path.abspath(filename))
+
+    def _load(self, filename: str) -> tuple[list[Directive], list, dict]:
+        entries, parse_errors, options_map = self._parse_recursive(filename)
+        entries.sort(key=data.entry_sortkey)
+
+        entries, balance_errors = booking.book(entries, options_map)
+        parse_errors.extend(balance_errors)
+
+        saved_pythonpath = list(sys.path)
+        try:
+            if "pythonpath" in options_map:
+                sys.path[0:0] = options_map["pythonpath"]
+            entries, errors = run_transformations(entries, parse_errors, options_map, None)
+        finally:
+            sys.path[:] = saved_pythonpath
+
+        errors.extend(validation.validate(entries, options_map, None, None))
+
+        options_map["input_hash"] = compute_input_hash(options_map["include"])
+        return entries, errors, options_map
+
+    def _parse_recursive(self, filename: str) -> tuple[list[Directive], list, dict]:
+        """对应 beancount.loader._parse_recursive, 区别在于未变化的文件直接复用上一次的解析结果"""
+        entries: list[Directive] = []
+        parse_errors: list = []
+        options_map = None
+        other_options_map = []
+
+        source_stack = [filename]
+        filenames_seen: set[str] = set()
+        reparsed: list[str] = []
+
+        while source_stack:
+            filename = path.normpath(source_stack.pop(0))
+            is_top_level = options_map is None
+
+            if filename in filenames_seen:
+                parse_errors.append(
+                    LoadError(data.new_metadata("<load>", 0), f'Duplicate filename parsed: "{filename}"', None)
+                )
+                continue
+
+            if not path.exists(filename):
+                parse_errors.append(
+                    LoadError(data.new_metadata("<load>", 0), f'File "{filename}" does not exist', None)
+                )
+                continue
+
+            filenames_seen.add(filename)
+            parsed = self._parse_file(filename, reparsed)
+
+            entries.extend(parsed.entries)
+            parse_errors.extend(parsed.errors)
+
+            # aggregate_options_map 会修改 dcontext, 缓存中保留一份干净的 options
+            src_options_map = copy.deepcopy(parsed.options_map)
+            if is_top_level:
+                options_map = src_options_map
+            else:
+                other_options_map.append(src_options_map)
+
+            cwd = path.dirname(filename)
+            for include_filename in src_options_map["include"]:
+                search_path = include_filename
+                if not path.isabs(include_filename):
+                    search_path = path.join(cwd, include_filename)
+                matched_filenames = glob.glob(search_path, recursive=True)
+                if not matched_filenames:
+                    parse_errors.append(
+                        LoadError(
+                            data.new_metadata("<load>", 0),
+                            f'File glob "{include_filename}" does not match any files',
+                            None,
+                        )
+                    )
+                for matched_filename in matched_filenames:
+                    if not path.isabs(matched_filename):
+                        matched_filename = path.join(cwd, matched_filename)
+                    source_stack.append(matched_filename)
+
+        # 删除已经不再被 include 的文件
+        for stale_filename in set(self._files) - filenames_seen:
+            del self._files[stale_filename]
+
+        logger.debug(f"Reparsed {len(reparsed)} of {len(filenames_seen)} files: {reparsed}")
+
+        if options_map is None:
+            options_map = options.OPTIONS_DEFAULTS.copy()
+
+        options_map["include"] = sorted(filenames_seen)
+        options_map = aggregate_options_map(options_map, other_options_map)
+
+        return entries, parse_errors, options_map
+
+    def _parse_file(self, filename: str, reparsed: list[str]) -> ParsedFile:
+        if encryption.is_encrypted_file(filename):
+            reparsed.append(filename)
+            src_entries, src_errors, src_options_map = parser.parse_string(
+                encryption.read_encrypted_file(filename), filename
+            )
+            return ParsedFile("", src_entries, src_errors, src_options_map)
+
+        with open(filename, "rb") as f:
+            content = f.read()
+        content_hash = hashlib.sha256(content).hexdigest()
+
+        cached = self._files.get(filename)
+        if cached is not None and cached.content_hash == content_hash:
+            return cached
+
+        reparsed.append(filename)
+        src_entries, src_errors, src_options_map = parser.parse_file(io.BytesIO(content), report_filename=filename)
+        parsed = ParsedFile(content_hash, src_entries, src_errors, src_options_map)
+        self._files[filename] = parsed
+        return parsed
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+
+
+# 全局单例
+incremental_loader = IncrementalLoader()
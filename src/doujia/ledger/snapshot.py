@@ -0,0 +1,241 @@
+import datetime
+from bisect import bisect_left
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import NamedTuple, TypeVar
+
+from beancount.core import data
+
+Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
+
+
+class PostingRef(NamedTuple):
+    """指向某笔交易中某条 posting 的引用, index 是交易在 entries 中的位置"""
+
+    date: datetime.date
+    index: int
+    transaction: data.Transaction
+    posting: data.Posting
+
+
+UnitsKey = tuple[str, str | None]
+
+
+class CumulativeUnits(NamedTuple):
+    """单个账户某种 (货币, 成本货币) 的累计数量, sums[i] 是 dates[i] 及之前所有 posting 的合计"""
+
+    dates: list[datetime.date]
+    sums: list[Decimal]
+
+
+class _TrieNode:
+    __slots__ = ("account", "children")
+
+    def __init__(self):
+        self.children: dict[str, _TrieNode] = {}
+        self.account: str | None = None
+
+
+class AccountTrie:
+    """按 ":" 分段的账户前缀树, 前缀匹配语义与 str.startswith 保持一致"""
+
+    def __init__(self, accounts: Iterable[str] = ()):
+        self._root = _TrieNode()
+        for account in accounts:
+            self.insert(account)
+
+    def insert(self, account: str):
+        node = self._root
+        for component in account.split(":"):
+            node = node.children.setdefault(component, _TrieNode())
+        node.account = account
+
+    def find(self, prefix: str) -> list[str]:
+        """返回所有以 prefix 开头的账户"""
+        *components, last = prefix.split(":")
+
+        node = self._root
+        for component in components:
+            node = node.children.get(component)
+            if node is None:
+                return []
+
+        result: list[str] = []
+        for name, child in node.children.items():
+            if name.startswith(last):
+                self._collect(child, result)
+        return result
+
+    def _collect(self, node: _TrieNode, result: list[str]):
+        if node.account is not None:
+            result.append(node.account)
+        for child in node.children.values():
+            self._collect(child, result)
+
+
+class _CachedSnapshot(NamedTuple):
+    snapshot: "LedgerSnapshot"
+    entry_count: int
+
+
+_last_snapshot: _CachedSnapshot | None = None
+
+
+@dataclass(frozen=True)
+class LedgerSnapshot:
+    """
+    一次 reload 产生的只读账本索引
+    按账户保存按日期排序的 posting, 查询成本只与命中的 posting 数量相关
+    """
+
+    entries: list[Directive]
+    options_map: dict
+    transactions: list[data.Transaction] = field(repr=False)
+    transaction_dates: list[datetime.date] = field(repr=False)
+    postings_by_account: dict[str, list[PostingRef]] = field(repr=False)
+    dates_by_account: dict[str, list[datetime.date]] = field(repr=False)
+    account_trie: AccountTrie = field(repr=False)
+    # 按账户延迟构建的累计数量
+    cumulative_units: dict[str, dict[UnitsKey, CumulativeUnits]] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+
+    @classmethod
+    def build(cls, entries: list[Directive], options_map: dict | None = None) -> "LedgerSnapshot":
+        transactions: list[data.Transaction] = []
+        postings_by_account: dict[str, list[PostingRef]] = {}
+
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, data.Transaction):
+                continue
+
+            transactions.append(entry)
+            for posting in entry.postings:
+                postings_by_account.setdefault(posting.account, []).append(
+                    PostingRef(entry.date, index, entry, posting)
+                )
+
+        # beancount 的 entries 已按日期排序, 这里保证外部传入的 entries 也满足 bisect 的前提
+        transactions.sort(key=lambda x: x.date)
+        for refs in postings_by_account.values():
+            refs.sort(key=lambda x: (x.date, x.index))
+
+        return cls(
+            entries=entries,
+            options_map=options_map if options_map is not None else {},
+            transactions=transactions,
+            transaction_dates=[x.date for x in transactions],
+            postings_by_account=postings_by_account,
+            dates_by_account={account: [x.date for x in refs] for account, refs in postings_by_account.items()},
+            account_trie=AccountTrie(postings_by_account.keys()),
+        )
+
+    @classmethod
+    def of(cls, entries: "list[Directive] | LedgerSnapshot") -> "LedgerSnapshot":
+        """
+        兼容仍然传入 entries 的调用方, 已经是 snapshot 时直接返回
+        同一个 entries 列表连续查询时复用上一次构建的 snapshot
+        """
+        global _last_snapshot
+
+        if isinstance(entries, LedgerSnapshot):
+            return entries
+
+        last = _last_snapshot
+        if last is not None and last.snapshot.entries is entries and len(entries) == last.entry_count:
+            return last.snapshot
+
+        snapshot = cls.build(entries)
+        _last_snapshot = _CachedSnapshot(snapshot=snapshot, entry_count=len(entries))
+        return snapshot
+
+    def accounts(self, account_prefixes: Iterable[str]) -> set[str]:
+        """返回匹配任意一个前缀的账户"""
+        accounts: set[str] = set()
+        for prefix in account_prefixes:
+            accounts.update(self.account_trie.find(prefix))
+        return accounts
+
+    def account_postings(
+        self,
+        account: str,
+        begin: datetime.date | None = None,
+        end_exclusive: datetime.date | None = None,
+    ) -> list[PostingRef]:
+        """返回单个账户在 [begin, end_exclusive) 之间的 posting"""
+        refs = self.postings_by_account.get(account)
+        if not refs:
+            return []
+
+        dates = self.dates_by_account[account]
+        lo = 0 if begin is None else bisect_left(dates, begin)
+        hi = len(dates) if end_exclusive is None else bisect_left(dates, end_exclusive)
+        return refs[lo:hi]
+
+    def postings(
+        self,
+        account_prefixes: Iterable[str],
+        begin: datetime.date | None = None,
+        end_exclusive: datetime.date | None = None,
+    ) -> list[PostingRef]:
+        """返回前缀匹配的账户在 [begin, end_exclusive) 之间的 posting, 按账本顺序排列"""
+        result: list[PostingRef] = []
+        for account in self.accounts(account_prefixes):
+            result.extend(self.account_postings(account, begin, end_exclusive))
+
+        result.sort(key=lambda x: (x.date, x.index))
+        return result
+
+    def account_cumulative_units(self, account: str) -> dict[UnitsKey, CumulativeUnits]:
+        """单个账户按 (货币, 成本货币) 分开的累计数量, 第一次查询时构建"""
+        cumulative = self.cumulative_units.get(account)
+        if cumulative is not None:
+            return cumulative
+
+        cumulative = {}
+        for ref in self.postings_by_account.get(account, []):
+            units = ref.posting.units
+            cost = ref.posting.cost
+            key = (units.currency, cost.currency if cost is not None else None)
+
+            series = cumulative.get(key)
+            if series is None:
+                series = cumulative[key] = CumulativeUnits([], [])
+                last = Decimal(0)
+            else:
+                last = series.sums[-1]
+
+            series.dates.append(ref.date)
+            series.sums.append(last + units.number)
+
+        self.cumulative_units[account] = cumulative
+        return cumulative
+
+    def units_before(
+        self,
+        account_prefixes: Iterable[str],
+        end_exclusive: datetime.date | None = None,
+    ) -> dict[UnitsKey, Decimal]:
+        """
+        前缀匹配的账户在 end_exclusive 之前按 (货币, 成本货币) 汇总的数量, 合计为 0 的项不返回
+        每个账户每种货币只需要一次 bisect, 与命中的 posting 数量无关
+        """
+        result: dict[UnitsKey, Decimal] = {}
+        for account in self.accounts(account_prefixes):
+            for key, series in self.account_cumulative_units(account).items():
+                index = len(series.dates) if end_exclusive is None else bisect_left(series.dates, end_exclusive)
+                if index > 0:
+                    result[key] = result.get(key, Decimal(0)) + series.sums[index - 1]
+
+        return {key: number for key, number in result.items() if number != 0}
+
+    def transactions_between(
+        self,
+        begin: datetime.date | None = None,
+        end_exclusive: datetime.date | None = None,
+    ) -> list[data.Transaction]:
+        """返回 [begin, end_exclusive) 之间的交易"""
+        lo = 0 if begin is None else bisect_left(self.transaction_dates, begin)
+        hi = len(self.transactions) if end_exclusive is None else bisect_left(self.transaction_dates, end_exclusive)
+        return self.transactions[lo:hi]
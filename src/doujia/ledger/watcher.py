@@ -0,0 +1,229 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from os import path
+
+from logzero import logger
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+
+_EVENT = struct.Struct("iIII")
+
+
+@dataclass
+class WatchTargets:
+    """
+    需要监听的路径
+    ledger_files 变化时需要强制重新加载, git_paths (HEAD, refs 等) 变化时只需要检查 commit
+    """
+
+    ledger_files: set[str] = field(default_factory=set)
+    git_paths: set[str] = field(default_factory=set)
+
+    def ledger_directories(self) -> set[str]:
+        return {path.dirname(x) for x in self.ledger_files}
+
+    def directories(self) -> set[str]:
+        """inotify 不支持直接监听被 rename 替换的文件, 因此监听它们所在的目录"""
+        result = self.ledger_directories()
+        for git_path in self.git_paths:
+            if not path.isdir(git_path):
+                result.add(path.dirname(git_path))
+                continue
+            for root, _, _ in os.walk(git_path):
+                result.add(root)
+        return result
+
+    def classify(self, changed_path: str) -> str | None:
+        """返回 "ledger", "git" 或 None (无关的变化)"""
+        if changed_path in self.ledger_files:
+            return "ledger"
+        for git_path in self.git_paths:
+            if changed_path == git_path or changed_path.startswith(git_path + os.sep):
+                return "git"
+        if changed_path.endswith(".bean") or changed_path in self.ledger_directories():
+            return "ledger"
+        return None
+
+
+def _load_inotify():
+    if not hasattr(os, "O_CLOEXEC"):
+        return None
+    name = ctypes.util.find_library("c")
+    if name is None:
+        return None
+    try:
+        libc = ctypes.CDLL(name, use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class LedgerWatcher:
+    """
+    监听账本文件与 git HEAD/refs 的变化, 一批连续写入结束 debounce 秒后只触发一次 on_change
+    优先使用 inotify, 不可用时退化为对文件 stat 的轮询
+    """
+
+    def __init__(
+        self,
+        get_targets: Callable[[], WatchTargets],
+        on_change: Callable[[bool], None],
+        debounce: float = 0.5,
+        poll_interval: float = 1.0,
+        use_inotify: bool = True,
+    ):
+        """
+        Args:
+            get_targets: 返回当前需要监听的文件, 每次 on_change 之后会重新获取
+            on_change: 变化稳定后调用, 参数表示是否有账本文件发生变化
+            debounce: 最后一次变化之后等待的秒数
+            poll_interval: 轮询模式下的检查间隔
+        """
+        self._get_targets = get_targets
+        self._on_change = on_change
+        self._debounce = debounce
+        self._poll_interval = poll_interval
+        self._libc = _load_inotify() if use_inotify else None
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._last_stat: dict[str, tuple[int, int] | None] | None = None
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self._libc is not None else "poll"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ledger-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Ledger watcher started in {self.mode} mode")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        fd = None
+        watches: dict[int, str] = {}
+        try:
+            while not self._stop.is_set():
+                targets = self._get_targets()
+                if self._libc is not None and fd is None:
+                    fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+                    if fd < 0:
+                        logger.warning(f"inotify_init1 failed with errno {ctypes.get_errno()}, fallback to polling")
+                        self._libc = None
+                        fd = None
+
+                if fd is not None:
+                    ledger_changed = self._wait_inotify(fd, watches, targets)
+                else:
+                    ledger_changed = self._wait_poll(targets)
+
+                if ledger_changed is None:
+                    continue
+
+                try:
+                    self._on_change(ledger_changed)
+                except Exception as e:
+                    logger.error(f"Failed to handle ledger change: {e!s}")
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def _wait_inotify(self, fd: int, watches: dict[int, str], targets: WatchTargets) -> bool | None:
+        """
+        阻塞直到一批变化结束, 返回是否有账本文件变化; 停止时返回 None
+        fd 在多次调用之间保持打开, on_change 执行期间产生的事件不会丢失
+        """
+        for directory in targets.directories():
+            # 对同一个目录重复 add_watch 会返回相同的 wd
+            wd = self._libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK)
+            if wd >= 0:
+                watches[wd] = directory
+
+        kinds: set[str] = set()
+        deadline = None
+        while not self._stop.is_set():
+            timeout = self._poll_interval if deadline is None else max(deadline - time.monotonic(), 0)
+            readable, _, _ = select.select([fd], [], [], timeout)
+            if readable:
+                for kind in self._read_events(fd, watches, targets):
+                    kinds.add(kind)
+                    deadline = time.monotonic() + self._debounce
+            elif deadline is not None and time.monotonic() >= deadline:
+                return "ledger" in kinds
+        return None
+
+    def _read_events(self, fd: int, watches: dict[int, str], targets: WatchTargets) -> list[str]:
+        try:
+            buffer = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        kinds = []
+        offset = 0
+        while offset + _EVENT.size <= len(buffer):
+            wd, mask, _, name_length = _EVENT.unpack_from(buffer, offset)
+            name = buffer[offset + _EVENT.size : offset + _EVENT.size + name_length].rstrip(b"\0")
+            offset += _EVENT.size + name_length
+
+            directory = watches.get(wd)
+            if directory is None:
+                continue
+            changed_path = path.join(directory, os.fsdecode(name)) if name else directory
+            kind = targets.classify(changed_path)
+            if kind is not None:
+                kinds.append(kind)
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                kinds.append("ledger")
+        return kinds
+
+    def _stat_all(self, targets: WatchTargets) -> dict[str, tuple[int, int] | None]:
+        result: dict[str, tuple[int, int] | None] = {}
+        for file_path in targets.ledger_files | targets.git_paths | targets.ledger_directories():
+            try:
+                stat = os.stat(file_path)
+                result[file_path] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                result[file_path] = None
+        return result
+
+    def _wait_poll(self, targets: WatchTargets) -> bool | None:
+        # 沿用上一次的 stat 结果, on_change 执行期间发生的变化不会丢失; 新增的路径以本次 stat 为基准
+        last = self._last_stat if self._last_stat is not None else self._stat_all(targets)
+        kinds: set[str] = set()
+        deadline = None
+        while not self._stop.wait(self._poll_interval if deadline is None else self._debounce):
+            current = self._stat_all(targets)
+            changed = [x for x in current if x in last and current[x] != last[x]]
+            last = self._last_stat = current
+
+            if changed:
+                kinds.update(targets.classify(x) or "ledger" for x in changed)
+                deadline = time.monotonic() + self._debounce
+            elif deadline is not None and time.monotonic() >= deadline:
+                return "ledger" in kinds
+        return None
@@ -84,3 +84,58 @@ class TransactionProcessor(Generic[Memo, Ret, Directive]):
             result = self.reduce_transaction(result, txn)
 
         return finalize(result)
+
+
+class CompositeProcessor(Generic[Directive]):
+    """组合多个 TransactionProcessor, 对同一个交易序列只遍历一次, 每个交易只查找一次 reducer"""
+
+    def __init__(self):
+        """初始化组合处理器"""
+        self.processors: dict[str, TransactionProcessor] = {}
+        self._dispatch: dict[str, tuple[tuple[str, Reducer], ...]] = {}
+
+    def register(self, name: str, processor: TransactionProcessor):
+        """注册一个处理器
+
+        Args:
+            name: 处理器名称, 对应 reduce_transactions 中 memo 与 finalize 的 key
+            processor: 处理器
+        """
+        self.processors[name] = processor
+        self._dispatch.clear()
+
+    def _handlers(self, entry: Directive) -> tuple[tuple[str, Reducer], ...]:
+        sig = entry.meta["signature"]
+        handlers = self._dispatch.get(sig)
+        if handlers is None:
+            try:
+                handlers = tuple((name, processor.registry[sig][0]) for name, processor in self.processors.items())
+            except KeyError:
+                epr = printer.EntryPrinter(stringify_invalid_types=True)
+                print(epr(entry), file=sys.stderr)
+                raise
+            self._dispatch[sig] = handlers
+        return handlers
+
+    def reduce_transactions(
+        self,
+        init_values: dict[str, Memo],
+        entries: list[Directive],
+        finalize: dict[str, Callable[[Memo], Ret]] | None = None,
+    ) -> dict[str, Ret]:
+        """按顺序把每个交易交给所有处理器
+
+        Args:
+            init_values: 每个处理器的初始值
+            entries: 要处理的交易列表
+            finalize: 每个处理器的 finalize 函数, 未提供时返回 reduce 的结果
+        Returns:
+            每个处理器的最终值
+        """
+        results = dict(init_values)
+        for txn in entries:
+            for name, handler in self._handlers(txn):
+                results[name] = handler(results[name], txn)
+
+        finalize = finalize or {}
+        return {name: finalize[name](memo) if name in finalize else memo for name, memo in results.items()}
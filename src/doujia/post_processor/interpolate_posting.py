@@ -2,9 +2,10 @@ import argparse
 
 from beancount.core.data import Directive, Transaction
 from beancount.core.interpolate import AUTOMATIC_META
-from beancount.loader import load_file
 from beancount.parser.printer import EntryPrinter
 
+from doujia.ledger.cache import load_file
+
 
 def _collect_posting_lines(
     entry: Transaction,  # type: ignore
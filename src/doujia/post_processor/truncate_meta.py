@@ -1,7 +1,8 @@
 import argparse
 
 from beancount.core.data import Balance, Directive, Transaction
-from beancount.loader import load_file
+
+from doujia.ledger.cache import load_file
 
 
 def collect_lines_to_truncate(entries: list[Directive], account: str = "Liabilities:Short:CreditCard:CMB"):  # type: ignore
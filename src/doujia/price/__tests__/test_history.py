@@ -0,0 +1,41 @@
+import datetime
+from decimal import Decimal
+
+from beancount.core.data import Amount
+
+from doujia.price.cache import SymbolPriceCache
+from doujia.price.history import PriceHistoryStore
+
+
+def test_rehydrate_cache_from_history(tmp_path):
+    store = PriceHistoryStore(str(tmp_path / "history" / "prices.sqlite3"))
+
+    cache = SymbolPriceCache()
+    cache.attach_store(store)
+    cache.update(
+        "VOO", Amount(Decimal("500.10"), "USD"), datetime.datetime(2024, 10, 21, 16, 0), datetime.date(2024, 10, 21)
+    )
+    cache.update_batch(
+        {"VOO": Amount(Decimal("501.25"), "USD"), "USDCNY=X": Amount(Decimal("7.1234567"), "CNY")},
+        {"VOO": datetime.date(2024, 10, 22)},
+    )
+
+    # 重启后新的缓存从同一个文件恢复最新价格
+    restored = SymbolPriceCache()
+    restored.attach_store(PriceHistoryStore(store.path))
+
+    voo = restored.get("VOO")
+    assert voo is not None
+    assert voo.price == Amount(Decimal("501.25"), "USD")
+    assert voo.price_date == datetime.date(2024, 10, 22)
+    assert voo.timestamp > datetime.datetime(2024, 10, 22)
+
+    fx = restored.get("USDCNY=X")
+    assert fx is not None
+    assert fx.price.number == Decimal("7.1234567")
+    assert isinstance(fx.price_date, datetime.datetime)
+    assert restored.version == 1
+
+    history = store.history("VOO")
+    assert [x.price.number for x in history] == [Decimal("500.10"), Decimal("501.25")]
+    assert [x.price.number for x in store.history("VOO", since=datetime.datetime(2024, 10, 22))] == [Decimal("501.25")]
@@ -0,0 +1,62 @@
+import datetime
+from decimal import Decimal
+
+import pytz
+from beancount.core.data import Amount
+
+from doujia.price.market_hours import MARKET_HOURS, MarketPhase, RefreshPlanner
+from doujia.price.provider import PriceQuote, PriceSource
+
+
+def _utc(*args: int) -> datetime.datetime:
+    return datetime.datetime(*args, tzinfo=pytz.utc)
+
+
+def _quote(market: str | None) -> PriceQuote:
+    return PriceQuote(Amount(Decimal(1), "USD"), datetime.date(2024, 10, 21), market)
+
+
+def test_market_phase():
+    new_york = MARKET_HOURS["America/New_York"]
+    # 2024-10-21 是周一, 纽约为夏令时 UTC-4
+    assert new_york.phase(_utc(2024, 10, 21, 14, 0)) is MarketPhase.OPEN
+    assert new_york.phase(_utc(2024, 10, 21, 12, 0)) is MarketPhase.EXTENDED
+    assert new_york.phase(_utc(2024, 10, 22, 2, 0)) is MarketPhase.CLOSED
+    assert new_york.phase(_utc(2024, 10, 19, 14, 0)) is MarketPhase.CLOSED
+
+    shanghai = MARKET_HOURS["Asia/Shanghai"]
+    assert shanghai.phase(_utc(2024, 10, 21, 2, 0)) is MarketPhase.OPEN
+    # 午间休市
+    assert shanghai.phase(_utc(2024, 10, 21, 4, 0)) is MarketPhase.CLOSED
+
+    assert MARKET_HOURS["FX"].phase(_utc(2024, 10, 21, 23, 59)) is MarketPhase.OPEN
+    assert MARKET_HOURS["CRYPTO"].phase(_utc(2024, 10, 20, 12, 0)) is MarketPhase.OPEN
+
+
+def test_refresh_planner():
+    planner = RefreshPlanner()
+    voo, maotai, fx, unknown = (
+        PriceSource("yahoo", "VOO"),
+        PriceSource("yahoo", "600519.SS"),
+        PriceSource("yahoo", "CNY=X"),
+        PriceSource("file", "FUND"),
+    )
+    sources = [voo, maotai, fx, unknown]
+
+    # 纽约盘前, 上海已收盘
+    now = _utc(2024, 10, 21, 12, 0)
+    assert planner.plan(sources, now) == sources
+    planner.record(
+        sources,
+        {"VOO": _quote("America/New_York"), "600519.SS": _quote("Asia/Shanghai"), "CNY=X": _quote("FX")},
+        now,
+    )
+
+    now += datetime.timedelta(minutes=1)
+    assert planner.plan(sources, now) == [fx, unknown]
+
+    now += datetime.timedelta(minutes=9)
+    assert planner.plan(sources, now) == [voo, fx, unknown]
+
+    # 周六只刷新不知道市场的来源
+    assert planner.plan(sources, _utc(2024, 10, 26, 14, 0)) == [unknown]
@@ -0,0 +1,66 @@
+import datetime
+from decimal import Decimal
+from typing import TypeVar
+
+import pytest
+from beancount.core import data
+from beancount.core.amount import Amount
+from beancount.core.convert import convert_amount
+from beancount.core.inventory import Inventory
+from beancount.core.prices import build_price_map
+
+from doujia.price.matrix import DailyPriceMatrix
+
+Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
+
+
+def test_matrix_should_match_convert_amount(entries: list[Directive]):
+    """
+    @@@/main.bean
+    2020-01-02 price AAPL 100 USD
+    2020-01-05 price AAPL 110 USD
+    2020-01-03 price USD 7 CNY
+    2020-01-06 price USD 7.1 CNY
+    2020-01-04 price HKD 0.9 CNY
+    2020-01-04 price TENCENT 300 HKD
+    """
+    price_map = build_price_map(entries)
+    begin, end = datetime.date(2020, 1, 1), datetime.date(2020, 1, 8)
+    currencies = ["AAPL", "USD", "HKD", "TENCENT", "CNY"]
+
+    for exact in [True, False]:
+        matrix = DailyPriceMatrix.build(price_map, currencies, "CNY", begin, end, via=["USD", "HKD"], exact=exact)
+
+        for date in matrix.dates:
+            for currency in currencies:
+                expected = convert_amount(Amount(Decimal(1), currency), "CNY", price_map, date, via=["USD", "HKD"])
+                actual = matrix.rate(currency, date)
+                if expected.currency != "CNY":
+                    assert actual is None
+                elif exact:
+                    assert actual == expected.number
+                else:
+                    assert actual == pytest.approx(float(expected.number))
+
+
+def test_matrix_should_value_inventory_for_every_day(entries: list[Directive]):
+    """
+    @@@/main.bean
+    2020-01-02 price AAPL 100 USD
+    2020-01-04 price AAPL 110 USD
+    """
+    price_map = build_price_map(entries)
+    inventory = Inventory()
+    inventory.add_amount(Amount(Decimal(2), "AAPL"))
+    inventory.add_amount(Amount(Decimal(5), "USD"))
+
+    matrix = DailyPriceMatrix.build(
+        price_map, ["AAPL", "USD"], "USD", datetime.date(2020, 1, 2), datetime.date(2020, 1, 5), exact=True
+    )
+    assert list(matrix.value(inventory)) == [Decimal(205), Decimal(205), Decimal(225), Decimal(225)]
+
+    matrix = DailyPriceMatrix.build(
+        price_map, ["AAPL", "USD"], "USD", datetime.date(2020, 1, 1), datetime.date(2020, 1, 2)
+    )
+    with pytest.raises(ValueError):
+        matrix.value(inventory)
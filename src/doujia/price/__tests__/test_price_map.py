@@ -0,0 +1,63 @@
+import datetime
+from decimal import Decimal
+from typing import TypeVar
+
+from beancount.core import data
+from beancount.core.amount import Amount
+from beancount.core.prices import build_price_map, get_price
+
+from doujia.price import price_map as price_map_module
+from doujia.price.cache import symbol_price_cache
+from doujia.price.price_map import OverlayPriceMap, get_last_and_realtime_price_map
+
+Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
+
+
+def test_overlay_should_equal_rebuilt_price_map(entries: list[Directive]):
+    """
+    @@@/main.bean
+    2020-01-01 commodity AAPL
+    2020-01-01 price AAPL 100 USD
+    2020-01-03 price AAPL 110 USD
+    2020-01-03 price USD 7 CNY
+    """
+    base = build_price_map(entries)
+    overlay = OverlayPriceMap(base)
+    overlay.set_price(("AAPL", "USD"), datetime.date(2020, 1, 2), Decimal(105))
+    overlay.set_price(("TSLA", "USD"), datetime.date(2020, 1, 2), Decimal(200))
+
+    new_entries = [
+        *entries,
+        data.Price({}, datetime.date(2020, 1, 2), "AAPL", Amount(Decimal(105), "USD")),
+        data.Price({}, datetime.date(2020, 1, 2), "TSLA", Amount(Decimal(200), "USD")),
+    ]
+    expected = build_price_map(new_entries)
+
+    assert dict(overlay.items()) == dict(expected)
+    assert sorted(overlay.forward_pairs) == sorted(expected.forward_pairs)
+    assert get_price(overlay, ("USD", "AAPL"), datetime.date(2020, 1, 2)) == (
+        datetime.date(2020, 1, 2),
+        Decimal(1) / Decimal(105),
+    )
+    # base 不会被修改
+    assert len(base[("AAPL", "USD")]) == 2
+    assert ("TSLA", "USD") not in base
+
+
+def test_realtime_price_should_not_rebuild_ledger_price_map(entries: list[Directive], mocker):
+    """
+    @@@/main.bean
+    2020-01-01 commodity AAPL
+        price: "USD:yahoo/AAPL"
+    2020-01-01 price AAPL 100 USD
+    2020-01-03 price AAPL 110 USD
+    """
+    spy = mocker.spy(price_map_module, "build_price_map")
+    symbol_price_cache.update("AAPL", Amount(Decimal(120), "USD"), datetime.datetime.now(), datetime.date(2020, 1, 5))
+
+    last_price_map, realtime_price_map = get_last_and_realtime_price_map(entries)
+    get_last_and_realtime_price_map(entries)
+
+    assert spy.call_count == 1
+    assert get_price(realtime_price_map, ("AAPL", "USD")) == (datetime.date(2020, 1, 5), Decimal(120))
+    assert get_price(last_price_map, ("AAPL", "USD")) == (datetime.date(2020, 1, 3), Decimal(110))
@@ -0,0 +1,120 @@
+import datetime
+import threading
+import time
+from decimal import Decimal
+from typing import TypeVar
+
+import pytest
+from beancount.core import data
+from beancount.core.amount import Amount
+from beancount.core.prices import get_price
+from pyfakefs.fake_filesystem import FakeFilesystem
+
+from doujia.price.cache import SymbolPriceCache
+from doujia.price.price_map import build_realtime_price_cache, get_last_and_realtime_price_map, price_providers
+from doujia.price.provider import (
+    FilePriceProvider,
+    PriceProvider,
+    PriceProviderEngine,
+    PriceQuote,
+    PriceSource,
+    parse_price_sources,
+)
+
+Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
+
+
+class _SlowProvider(PriceProvider):
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.release = threading.Event()
+        self.calls = 0
+
+    def fetch(self, symbols: list[str]) -> dict[str, PriceQuote]:
+        self.calls += 1
+        self.release.wait(5)
+        return {x: PriceQuote(Amount(Decimal(1), "USD"), datetime.date(2024, 1, 1)) for x in symbols}
+
+
+class _FailingProvider(PriceProvider):
+    def fetch(self, symbols: list[str]) -> dict[str, PriceQuote]:
+        raise ValueError("boom")
+
+
+def test_parse_price_sources():
+    assert parse_price_sources("USD:pricehist.beanprice.yahoo/VOO") == [PriceSource("yahoo", "VOO")]
+    assert parse_price_sources("CNY:yahoo/CNY=X") == [PriceSource("yahoo", "CNY=X")]
+    assert parse_price_sources("USD:yahoo/VOO,file/VOO http-json/VOO.US") == [
+        PriceSource("yahoo", "VOO"),
+        PriceSource("file", "VOO"),
+        PriceSource("http-json", "VOO.US"),
+    ]
+    assert parse_price_sources("") == []
+
+
+def test_provider_without_fetch_should_not_instantiate():
+    class _NoFetchProvider(PriceProvider):
+        timeout = 1
+
+    with pytest.raises(TypeError):
+        _NoFetchProvider()  # type: ignore[abstract]
+
+
+def test_engine_should_not_wait_for_slow_provider(fs: FakeFilesystem):
+    fs.create_file("/prices.json", contents='{"VOO": {"price": "500.10", "currency": "USD", "date": "2024-10-21"}}')
+    engine = PriceProviderEngine()
+    slow = _SlowProvider(timeout=0.2)
+    engine.register("file", FilePriceProvider("/prices.json"))
+    engine.register("slow", slow)
+    engine.register("failing", _FailingProvider())
+    sources = [
+        PriceSource("file", "VOO"),
+        PriceSource("file", "VWO"),
+        PriceSource("slow", "AAPL"),
+        PriceSource("failing", "TSLA"),
+        PriceSource("unknown", "NVDA"),
+    ]
+    cache = SymbolPriceCache()
+
+    started = time.monotonic()
+    assert list(engine.refresh(sources, cache)) == ["VOO"]
+    assert time.monotonic() - started < 2
+    assert cache.get("VOO").price == Amount(Decimal("500.10"), "USD")
+    assert cache.get("VOO").price_date == datetime.date(2024, 10, 21)
+    assert cache.get("AAPL") is None
+
+    # 上一次超时的请求还没有结束时不会重复提交
+    engine.refresh(sources, cache)
+    assert slow.calls == 1
+
+    slow.release.set()
+    time.sleep(0.1)
+    engine.refresh(sources, cache)
+    assert slow.calls == 2
+    assert cache.get("AAPL") is not None
+
+
+def test_realtime_price_should_use_first_source_with_price(entries: list[Directive], monkeypatch: pytest.MonkeyPatch):
+    """
+    @@@/main.bean
+    2020-01-01 commodity USD
+        price: "CNY:yahoo/CNY=X"
+    2020-01-01 commodity HSETF
+        price: "CNY:yahoo/HSETF.MISSING,file/HSETF"
+    2024-01-01 price USD 7.0 CNY
+    2024-01-01 price HSETF 3.0 CNY
+
+    @@@/prices.json
+    {
+        "CNY=X": {"price": "7.11", "currency": "CNY", "date": "2024-10-21"},
+        "HSETF": {"price": "3.86", "currency": "CNY", "date": "2024-10-21"}
+    }
+    """
+    monkeypatch.setitem(price_providers.providers, "yahoo", FilePriceProvider("/prices.json"))
+    monkeypatch.setitem(price_providers.providers, "file", FilePriceProvider("/prices.json"))
+
+    build_realtime_price_cache(entries)
+    _, realtime_price_map = get_last_and_realtime_price_map(entries)
+
+    assert get_price(realtime_price_map, ("USD", "CNY")) == (datetime.date(2024, 10, 21), Decimal("7.11"))
+    assert get_price(realtime_price_map, ("HSETF", "CNY")) == (datetime.date(2024, 10, 21), Decimal("3.86"))
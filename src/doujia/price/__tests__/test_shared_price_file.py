@@ -0,0 +1,81 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from beancount.core.data import Amount
+
+from doujia.price.cache import SymbolPriceCache
+from doujia.price.price_map import attach_shared_price_cache
+from doujia.price.shared import SHARED_PATH_ENV, SharedPriceFile
+
+
+def test_workers_should_read_prices_written_by_refresher(tmp_path):
+    path = str(tmp_path / "price_cache.mmap")
+    refresher, worker = SymbolPriceCache(), SymbolPriceCache()
+    refresher_file, worker_file = SharedPriceFile(path), SharedPriceFile(path)
+    refresher.attach_shared(refresher_file)
+    worker.attach_shared(worker_file)
+    notified: list[frozenset[str]] = []
+    worker.subscribe(lambda version, changed: notified.append(changed))
+
+    assert refresher.elect_refresher()
+    assert not worker.elect_refresher()
+    assert worker.get("VOO") is None
+
+    day = datetime.date(2024, 10, 21)
+    refresher.update_batch({"VOO": Amount(Decimal("500.10"), "USD")}, {"VOO": day})
+    assert worker.get("VOO").price == Amount(Decimal("500.10"), "USD")
+    assert worker.get("VOO").price_date == day
+    assert worker.version == 1
+    assert notified == [frozenset({"VOO"})]
+
+    # 没有新的写入时不重复合并
+    assert worker.snapshot() is worker.snapshot()
+
+    # refresher 退出后其他进程接替
+    refresher_file.close()
+    assert worker.elect_refresher()
+    worker.update_batch({"VOO": Amount(Decimal("501"), "USD")}, {"VOO": day})
+
+    reader = SymbolPriceCache()
+    reader.attach_shared(SharedPriceFile(path))
+    assert reader.get("VOO").price.number == Decimal("501")
+    worker_file.close()
+
+
+def test_publish_should_fail_when_payload_exceeds_capacity(tmp_path):
+    shared = SharedPriceFile(str(tmp_path / "price_cache.mmap"), capacity=16)
+    cache = SymbolPriceCache()
+    cache.attach_shared(shared)
+    assert cache.elect_refresher()
+
+    # 当选时写入的空快照保留不变
+    cache.update_batch({"VOO": Amount(Decimal("500.10"), "USD")}, {})
+    assert shared.read() == (1, {})
+    shared.close()
+
+
+def test_fava_process_should_attach_shared_file_from_env(tmp_path, monkeypatch: pytest.MonkeyPatch):
+    path = str(tmp_path / "price_cache.mmap")
+    refresher, refresher_file = SymbolPriceCache(), SharedPriceFile(path)
+    refresher.attach_shared(refresher_file)
+    assert refresher.elect_refresher()
+    refresher.update_batch({"VOO": Amount(Decimal("500.10"), "USD")}, {"VOO": datetime.date(2024, 10, 21)})
+
+    reader = SymbolPriceCache()
+    monkeypatch.delenv(SHARED_PATH_ENV, raising=False)
+    attach_shared_price_cache(reader)
+    assert reader.shared is None
+
+    monkeypatch.setenv(SHARED_PATH_ENV, path)
+    attach_shared_price_cache(reader)
+    shared = reader.shared
+    assert shared is not None and not shared.is_refresher
+    assert reader.get("VOO").price == Amount(Decimal("500.10"), "USD")
+
+    # 只挂载一次
+    attach_shared_price_cache(reader)
+    assert reader.shared is shared
+
+    shared.close()
+    refresher_file.close()
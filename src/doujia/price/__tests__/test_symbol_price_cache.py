@@ -0,0 +1,42 @@
+import datetime
+from decimal import Decimal
+
+from beancount.core.data import Amount
+
+from doujia.price.cache import SymbolPriceCache
+
+
+def test_should_notify_only_changed_symbols():
+    cache = SymbolPriceCache()
+    notified: list[tuple[int, frozenset[str]]] = []
+    unsubscribe = cache.subscribe(lambda version, changed: notified.append((version, changed)))
+
+    day = datetime.date(2024, 10, 21)
+    cache.update_batch(
+        {"VOO": Amount(Decimal("500"), "USD"), "VWO": Amount(Decimal("45"), "USD")}, {"VOO": day, "VWO": day}
+    )
+    snapshot = cache.snapshot()
+    assert cache.version == 1
+
+    # 只有 VWO 的价格变化
+    cache.update_batch(
+        {"VOO": Amount(Decimal("500"), "USD"), "VWO": Amount(Decimal("46"), "USD")}, {"VOO": day, "VWO": day}
+    )
+    assert cache.version == 2
+    assert notified == [(1, frozenset({"VOO", "VWO"})), (2, frozenset({"VWO"}))]
+    assert cache.changed_since(1) == {"VWO"}
+    assert cache.changed_since(0) == {"VOO", "VWO"}
+
+    # 相同的价格不递增版本, 但会记录新的获取时间
+    cache.update("VOO", Amount(Decimal("500"), "USD"), datetime.datetime(2030, 1, 1), day)
+    assert cache.version == 2
+    assert cache.get("VOO").timestamp == datetime.datetime(2030, 1, 1)
+
+    # 之前的快照不受后续更新影响
+    assert snapshot["VWO"].price.number == Decimal("45")
+    assert cache.snapshot()["VWO"].price.number == Decimal("46")
+
+    unsubscribe()
+    cache.update("VOO", Amount(Decimal("501"), "USD"), datetime.datetime(2030, 1, 1), day)
+    assert cache.version == 3
+    assert len(notified) == 2
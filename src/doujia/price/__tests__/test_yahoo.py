@@ -0,0 +1,103 @@
+import json
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from doujia.price.yahoo import YahooQuoteClient
+
+
+class _StubYahoo:
+    def __init__(self):
+        self.crumb = "crumb-1"
+        self.requests: list[str] = []
+        self.quote_symbols: list[list[str]] = []
+        self.lock = threading.Lock()
+
+
+@pytest.fixture()
+def stub() -> Iterator[tuple[_StubYahoo, str]]:
+    state = _StubYahoo()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: str, headers: dict[str, str] | None = None):
+            self.send_response(status)
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body.encode())))
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            cookie = self.headers.get("Cookie", "")
+            with state.lock:
+                state.requests.append(url.path)
+                crumb = state.crumb
+
+            if url.path == "/":
+                self._send(200, "<html></html>", {"Set-Cookie": f"A3={crumb}; Path=/"})
+            elif url.path == "/v1/test/getcrumb":
+                self._send(200 if f"A3={crumb}" in cookie else 403, crumb if f"A3={crumb}" in cookie else "")
+            elif url.path == "/v7/finance/quote":
+                query = parse_qs(url.query)
+                if query["crumb"] != [crumb] or f"A3={crumb}" not in cookie:
+                    self._send(401, json.dumps({"finance": {"error": "Invalid Crumb"}}))
+                    return
+
+                symbols = query["symbols"][0].split(",")
+                with state.lock:
+                    state.quote_symbols.append(symbols)
+                result = [{"symbol": x, "regularMarketPrice": {"raw": len(x)}} for x in symbols]
+                self._send(200, json.dumps({"quoteResponse": {"result": result, "error": None}}))
+            else:
+                self._send(404, "")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield state, f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _client(base_url: str) -> YahooQuoteClient:
+    return YahooQuoteClient(
+        home_url=f"{base_url}/",
+        crumb_url=f"{base_url}/v1/test/getcrumb",
+        quote_url=f"{base_url}/v7/finance/quote",
+        chunk_size=3,
+        max_workers=2,
+    )
+
+
+def test_quote_should_reuse_crumb_and_split_chunks(stub: tuple[_StubYahoo, str]):
+    state, base_url = stub
+    client = _client(base_url)
+    symbols = [f"S{i}" for i in range(8)]
+
+    assert [x["symbol"] for x in client.quote(symbols)] == symbols
+    assert [x["symbol"] for x in client.quote(symbols[:2])] == symbols[:2]
+
+    assert sorted(len(x) for x in state.quote_symbols) == [2, 2, 3, 3]
+    assert state.requests.count("/") == 1
+    assert state.requests.count("/v1/test/getcrumb") == 1
+
+
+def test_quote_should_refresh_crumb_after_unauthorized(stub: tuple[_StubYahoo, str]):
+    state, base_url = stub
+    client = _client(base_url)
+
+    assert len(client.quote(["AAPL"])) == 1
+    state.crumb = "crumb-2"
+
+    assert client.quote(["AAPL", "TSLA"])[1]["symbol"] == "TSLA"
+    assert client.crumb() == "crumb-2"
+    assert state.requests.count("/v1/test/getcrumb") == 2
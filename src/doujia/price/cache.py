@@ -1,8 +1,17 @@
+import sqlite3
 import threading
+from collections.abc import Callable
 from dataclasses import dataclass
 from datetime import datetime
+from typing import TYPE_CHECKING
 
 from beancount.core.data import Amount
+from frozendict import frozendict
+from logzero import logger
+
+if TYPE_CHECKING:
+    from doujia.price.history import PriceHistoryStore
+    from doujia.price.shared import SharedPriceFile
 
 
 @dataclass
@@ -12,25 +21,167 @@ class PriceCache:
     price_date: datetime  # actual price date from source
 
 
+# 订阅者收到新的版本号与本次价格发生变化的 symbol
+PriceListener = Callable[[int, frozenset[str]], None]
+
+
 class SymbolPriceCache:
+    """
+    symbol 到最新报价的缓存
+    写入时复制出新的只读快照并替换, 读取不需要加锁; 只有价格或价格日期真正变化时版本号才会递增并通知订阅者
+    """
+
     def __init__(self):
-        self._cache: dict[str, PriceCache] = {}
+        self._cache: frozendict[str, PriceCache] = frozendict()
+        # symbol 最近一次变化时的版本号
+        self._changed_at: dict[str, int] = {}
         self._lock = threading.Lock()
+        self._version = 0
+        self._listeners: list[PriceListener] = []
+        self._store: PriceHistoryStore | None = None
+        self._shared: SharedPriceFile | None = None
+        self._shared_generation = 0
 
-    def get(self, symbol: str) -> PriceCache | None:
+    @property
+    def version(self) -> int:
+        """每次有价格变化后递增, 用于判断依赖价格的计算结果是否过期"""
+        self.sync()
+        return self._version
+
+    def snapshot(self) -> frozendict[str, PriceCache]:
+        """当前所有价格的只读快照, 之后的更新不会影响它"""
+        self.sync()
+        return self._cache
+
+    def changed_since(self, version: int) -> set[str]:
+        """version 之后价格发生过变化的 symbol"""
         with self._lock:
-            return self._cache.get(symbol)
+            return {symbol for symbol, changed_at in self._changed_at.items() if changed_at > version}
 
-    def update(self, symbol: str, price: Amount, timestamp: datetime, price_date: datetime):
+    def subscribe(self, listener: PriceListener) -> Callable[[], None]:
+        """价格变化后在更新的线程中调用 listener, 返回取消订阅的函数"""
         with self._lock:
-            self._cache[symbol] = PriceCache(price=price, timestamp=timestamp, price_date=price_date)
+            self._listeners.append(listener)
+
+        def unsubscribe():
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+
+        return unsubscribe
+
+    def attach_store(self, store: "PriceHistoryStore"):
+        """用 store 中每个 symbol 最新的价格恢复缓存, 之后的每次更新都追加到 store"""
+        latest = store.latest()
+        # 内存中已有的价格更新, 不覆盖
+        self._merge({symbol: cached for symbol, cached in latest.items() if symbol not in self._cache})
+        self._store = store
+
+    @property
+    def shared(self) -> "SharedPriceFile | None":
+        return self._shared
+
+    def attach_shared(self, shared: "SharedPriceFile"):
+        """
+        与其他进程共享价格, 只有 refresher 进程获取价格并写入 shared
+        其他进程在读取时发现 shared 有新的写入就合并到本地, 合并后同样会递增版本并通知订阅者
+        """
+        self._shared = shared
+        self.subscribe(self._publish)
+        self.sync()
+
+    def elect_refresher(self) -> bool:
+        """当前进程是否应该获取价格, 没有共享价格时每个进程都自己获取"""
+        shared = self._shared
+        if shared is None or shared.is_refresher:
+            return True
+
+        # 接替之前的 refresher 前先读取它最后写入的价格
+        self.sync()
+        if not shared.try_become_refresher():
+            return False
+
+        logger.info("Elected as price refresher")
+        self._publish(self._version, frozenset())
+        return True
+
+    def _publish(self, version: int, changed: frozenset[str]):
+        shared = self._shared
+        if shared is None or not shared.is_refresher:
+            return
+
+        if not shared.publish(self._cache):
+            logger.error(f"Shared price cache is full, {len(self._cache)} symbols not published")
+
+    def sync(self):
+        """非 refresher 进程合并 refresher 写入 shared 的价格, shared 没有变化时只读取一次文件头"""
+        shared = self._shared
+        if shared is None or shared.is_refresher or shared.generation() == self._shared_generation:
+            return
+
+        result = shared.read()
+        if result is None:
+            return
+
+        self._shared_generation, quotes = result
+        self._merge(quotes)
+
+    def _merge(self, updated: dict[str, PriceCache]):
+        if not updated:
+            return
+
+        with self._lock:
+            changed = frozenset(
+                symbol
+                for symbol, cached in updated.items()
+                if (old := self._cache.get(symbol)) is None
+                or old.price != cached.price
+                or old.price_date != cached.price_date
+            )
+            self._cache = frozendict({**self._cache, **updated})
+            if not changed:
+                return
+
+            self._version += 1
+            version = self._version
+            for symbol in changed:
+                self._changed_at[symbol] = version
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(version, changed)
+            except Exception as e:
+                logger.error(f"Price listener failed: {e}")
+
+    def _append_to_store(self, quotes: dict[str, PriceCache]):
+        store = self._store
+        if store is None:
+            return
+
+        try:
+            store.append(quotes)
+        except sqlite3.Error as e:
+            logger.error(f"Failed to append price history: {e}")
+
+    def get(self, symbol: str) -> PriceCache | None:
+        self.sync()
+        return self._cache.get(symbol)
+
+    def update(self, symbol: str, price: Amount, timestamp: datetime, price_date: datetime):
+        updated = {symbol: PriceCache(price=price, timestamp=timestamp, price_date=price_date)}
+        self._merge(updated)
+        self._append_to_store(updated)
 
     def update_batch(self, prices: dict[str, Amount], price_dates: dict[str, datetime]):
         now = datetime.now()
-        with self._lock:
-            for symbol, price in prices.items():
-                price_date = price_dates.get(symbol, now)  # fallback to now if no date provided
-                self._cache[symbol] = PriceCache(price=price, timestamp=now, price_date=price_date)
+        updated = {
+            # fallback to now if no date provided
+            symbol: PriceCache(price=price, timestamp=now, price_date=price_dates.get(symbol, now))
+            for symbol, price in prices.items()
+        }
+        self._merge(updated)
+        self._append_to_store(updated)
 
 
 # 全局单例
@@ -0,0 +1,91 @@
+import datetime
+import os
+import sqlite3
+from contextlib import closing
+from decimal import Decimal
+
+from beancount.core.data import Amount
+
+from doujia.price.cache import PriceCache
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quotes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT NOT NULL,
+    number TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    price_date TEXT NOT NULL,
+    fetched_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quotes_symbol ON quotes (symbol, id);
+"""
+
+
+def _parse_date(value: str) -> datetime.date | datetime.datetime:
+    # 来源没有给出日期时 price_date 是获取价格的时间
+    if len(value) > 10:
+        return datetime.datetime.fromisoformat(value)
+    return datetime.date.fromisoformat(value)
+
+
+def price_cache_to_row(quote: PriceCache) -> tuple[str, str, str, str]:
+    """(number, currency, price_date, fetched_at), 数字以字符串保存, 不损失精度"""
+    return str(quote.price.number), quote.price.currency, quote.price_date.isoformat(), quote.timestamp.isoformat()
+
+
+def price_cache_from_row(row: tuple[str, str, str, str]) -> PriceCache:
+    number, currency, price_date, fetched_at = row
+    return PriceCache(
+        price=Amount(Decimal(number), currency),
+        timestamp=datetime.datetime.fromisoformat(fetched_at),
+        price_date=_parse_date(price_date),
+    )
+
+
+class PriceHistoryStore:
+    """
+    只追加的 SQLite 报价记录, 每次获取到的价格都会保存, 不会修改或删除
+    重启时用每个 symbol 最新的一条恢复 SymbolPriceCache, 同时积累日内的价格历史
+    每次操作使用独立的连接, 可以在多个线程中使用
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def append(self, quotes: dict[str, PriceCache]):
+        if not quotes:
+            return
+
+        rows = [(symbol, *price_cache_to_row(quote)) for symbol, quote in quotes.items()]
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT INTO quotes (symbol, number, currency, price_date, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def latest(self) -> dict[str, PriceCache]:
+        """每个 symbol 最后一次记录的价格"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT symbol, number, currency, price_date, fetched_at FROM quotes"
+                " WHERE id IN (SELECT MAX(id) FROM quotes GROUP BY symbol)"
+            ).fetchall()
+        return {row[0]: price_cache_from_row(row[1:]) for row in rows}
+
+    def history(self, symbol: str, since: datetime.datetime | None = None) -> list[PriceCache]:
+        """symbol 按记录顺序的所有价格, since 之前获取的价格不返回"""
+        query = "SELECT number, currency, price_date, fetched_at FROM quotes WHERE symbol = ?"
+        params: list[str] = [symbol]
+        if since is not None:
+            query += " AND fetched_at >= ?"
+            params.append(since.isoformat())
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query + " ORDER BY id", params).fetchall()
+        return [price_cache_from_row(row) for row in rows]
@@ -0,0 +1,167 @@
+import datetime
+import threading
+from collections.abc import Iterable
+from dataclasses import dataclass
+from enum import Enum
+
+import pytz
+
+from doujia.price.provider import PriceQuote, PriceSource
+
+Session = tuple[datetime.time, datetime.time]
+
+
+class MarketPhase(Enum):
+    OPEN = "open"
+    EXTENDED = "extended"
+    CLOSED = "closed"
+
+
+@dataclass(frozen=True)
+class MarketHours:
+    """一个市场在当地时间的交易时段, 不在 weekdays 中的日期休市, 不考虑节假日"""
+
+    timezone: str
+    regular: tuple[Session, ...]
+    # 盘前盘后, 以及收盘后用于拿到收盘价的一小段时间
+    extended: tuple[Session, ...] = ()
+    weekdays: frozenset[int] = frozenset(range(5))
+
+    def phase(self, now: datetime.datetime) -> MarketPhase:
+        local = now.astimezone(pytz.timezone(self.timezone))
+        if local.weekday() not in self.weekdays:
+            return MarketPhase.CLOSED
+
+        current = local.time()
+        if any(begin <= current < end for begin, end in self.regular):
+            return MarketPhase.OPEN
+        if any(begin <= current < end for begin, end in self.extended):
+            return MarketPhase.EXTENDED
+        return MarketPhase.CLOSED
+
+
+def _t(value: str) -> datetime.time:
+    return datetime.time.fromisoformat(value)
+
+
+_ALL_DAY = ((datetime.time.min, datetime.time.max),)
+
+# key 为 Yahoo 报价中的 exchangeTimezoneName, 外汇与加密货币不按交易所时区区分
+MARKET_HOURS: dict[str, MarketHours] = {
+    "America/New_York": MarketHours(
+        "America/New_York",
+        regular=((_t("09:30"), _t("16:00")),),
+        extended=((_t("04:00"), _t("09:30")), (_t("16:00"), _t("20:00"))),
+    ),
+    "America/Toronto": MarketHours(
+        "America/Toronto",
+        regular=((_t("09:30"), _t("16:00")),),
+        extended=((_t("16:00"), _t("16:30")),),
+    ),
+    "Europe/London": MarketHours(
+        "Europe/London",
+        regular=((_t("08:00"), _t("16:30")),),
+        extended=((_t("16:30"), _t("17:00")),),
+    ),
+    "Europe/Berlin": MarketHours(
+        "Europe/Berlin",
+        regular=((_t("09:00"), _t("17:30")),),
+        extended=((_t("08:00"), _t("09:00")), (_t("17:30"), _t("18:00"))),
+    ),
+    "Europe/Paris": MarketHours(
+        "Europe/Paris",
+        regular=((_t("09:00"), _t("17:30")),),
+        extended=((_t("17:30"), _t("18:00")),),
+    ),
+    "Asia/Shanghai": MarketHours(
+        "Asia/Shanghai",
+        regular=((_t("09:30"), _t("11:30")), (_t("13:00"), _t("15:00"))),
+        extended=((_t("09:15"), _t("09:30")), (_t("15:00"), _t("15:30"))),
+    ),
+    "Asia/Hong_Kong": MarketHours(
+        "Asia/Hong_Kong",
+        regular=((_t("09:30"), _t("12:00")), (_t("13:00"), _t("16:00"))),
+        extended=((_t("09:00"), _t("09:30")), (_t("16:00"), _t("16:30"))),
+    ),
+    "Asia/Tokyo": MarketHours(
+        "Asia/Tokyo",
+        regular=((_t("09:00"), _t("11:30")), (_t("12:30"), _t("15:30"))),
+        extended=((_t("15:30"), _t("16:00")),),
+    ),
+    "Asia/Singapore": MarketHours(
+        "Asia/Singapore",
+        regular=((_t("09:00"), _t("12:00")), (_t("13:00"), _t("17:00"))),
+        extended=((_t("08:30"), _t("09:00")), (_t("17:00"), _t("17:30"))),
+    ),
+    "Australia/Sydney": MarketHours(
+        "Australia/Sydney",
+        regular=((_t("10:00"), _t("16:00")),),
+        extended=((_t("07:00"), _t("10:00")), (_t("16:00"), _t("16:30"))),
+    ),
+    "FX": MarketHours("UTC", regular=_ALL_DAY),
+    "CRYPTO": MarketHours("UTC", regular=_ALL_DAY, weekdays=frozenset(range(7))),
+}
+
+
+class RefreshPlanner:
+    """
+    按市场的交易时段决定每次需要刷新的价格来源
+    开盘时每 open_interval 刷新一次, 盘前盘后每 extended_interval 刷新一次, 休市时不刷新
+    symbol 所属的市场从报价中得到, 还没有拿到报价或者市场未知的 symbol 按开盘处理
+    """
+
+    # 定时任务的触发时间会有少量误差, 差这么多也算到期
+    TOLERANCE = datetime.timedelta(seconds=5)
+
+    def __init__(
+        self,
+        open_interval: datetime.timedelta = datetime.timedelta(minutes=1),
+        extended_interval: datetime.timedelta = datetime.timedelta(minutes=10),
+        market_hours: dict[str, MarketHours] = MARKET_HOURS,
+    ):
+        self.open_interval = open_interval
+        self.extended_interval = extended_interval
+        self.market_hours = market_hours
+        self._markets: dict[str, str] = {}
+        self._refreshed_at: dict[str, datetime.datetime] = {}
+        self._lock = threading.Lock()
+
+    def _interval(self, symbol: str, now: datetime.datetime) -> datetime.timedelta | None:
+        hours = self.market_hours.get(self._markets.get(symbol, ""))
+        if hours is None:
+            return self.open_interval
+
+        phase = hours.phase(now)
+        if phase is MarketPhase.OPEN:
+            return self.open_interval
+        if phase is MarketPhase.EXTENDED:
+            return self.extended_interval
+        return None
+
+    def plan(self, sources: Iterable[PriceSource], now: datetime.datetime) -> list[PriceSource]:
+        """到期需要刷新的来源, 从未刷新过的来源总是到期"""
+        due: list[PriceSource] = []
+        with self._lock:
+            for source in sources:
+                refreshed_at = self._refreshed_at.get(source.symbol)
+                if refreshed_at is None:
+                    due.append(source)
+                    continue
+
+                interval = self._interval(source.symbol, now)
+                if interval is not None and now - refreshed_at + self.TOLERANCE >= interval:
+                    due.append(source)
+        return due
+
+    def record(self, sources: Iterable[PriceSource], quotes: dict[str, PriceQuote], now: datetime.datetime):
+        """记录一次刷新, 没有拿到报价的来源同样按间隔重试"""
+        with self._lock:
+            for source in sources:
+                self._refreshed_at[source.symbol] = now
+                quote = quotes.get(source.symbol)
+                if quote is not None and quote.market is not None:
+                    self._markets[source.symbol] = quote.market
+
+
+# 全局单例
+price_refresh_planner = RefreshPlanner()
@@ -0,0 +1,170 @@
+import datetime
+from collections.abc import Iterable, Mapping, Sequence
+from decimal import Decimal
+
+import numpy as np
+from beancount.core.inventory import Inventory
+from beancount.core.number import ONE
+from beancount.core.prices import PriceMap
+
+PricePair = tuple[str, str]
+
+
+def _rate_series(
+    price_map: PriceMap,
+    base_quote: PricePair,
+    ordinals: np.ndarray,
+    dtype,
+) -> tuple[np.ndarray, np.ndarray] | None:
+    """
+    返回每一天 get_price(price_map, base_quote, date) 的结果与是否存在价格
+    与 beancount.core.prices.get_price 的查找规则一致
+    """
+    base, quote = base_quote
+    if base == quote:
+        return np.full(len(ordinals), ONE if dtype is object else 1.0, dtype=dtype), np.ones(len(ordinals), bool)
+
+    try:
+        prices = price_map[base_quote]
+    except KeyError:
+        prices = price_map.get((quote, base), None)
+        if not prices:
+            return None
+
+    if not prices:
+        return None
+
+    price_ordinals = np.fromiter((x[0].toordinal() for x in prices), dtype=np.int64, count=len(prices))
+    rates = np.array([x[1] for x in prices], dtype=object)
+    if dtype is not object:
+        rates = rates.astype(dtype)
+
+    index = np.searchsorted(price_ordinals, ordinals, side="right") - 1
+    known = index >= 0
+    return rates[np.maximum(index, 0)], known
+
+
+class DailyPriceMatrix:
+    """
+    按天前向填充的折算价格矩阵
+    values[i, j] 是 1 单位 currencies[i] 在 begin_date + j 天折算为 target_currency 的价格,
+    折算规则与 convert_amount(..., via=via) 一致: 先直接折算, 失败后依次尝试通过 via 中的货币中转
+    exact 为 True 时保存 Decimal, 否则保存 float64
+    """
+
+    def __init__(
+        self,
+        currencies: Sequence[str],
+        target_currency: str,
+        begin_date: datetime.date,
+        values: np.ndarray,
+        known: np.ndarray,
+    ):
+        self.currencies = list(currencies)
+        self.target_currency = target_currency
+        self.begin_date = begin_date
+        self.values = values
+        self.known = known
+        self._index = {currency: i for i, currency in enumerate(self.currencies)}
+
+    @classmethod
+    def build(
+        cls,
+        price_map: PriceMap,
+        currencies: Iterable[str],
+        target_currency: str,
+        begin_date: datetime.date,
+        end_date: datetime.date,
+        via: Sequence[str] = (),
+        exact: bool = False,
+    ) -> "DailyPriceMatrix":
+        """构建 [begin_date, end_date] 之间每一天的价格"""
+        currencies = list(dict.fromkeys(currencies))
+        days = max((end_date - begin_date).days + 1, 0)
+        ordinals = np.arange(begin_date.toordinal(), begin_date.toordinal() + days, dtype=np.int64)
+        dtype = object if exact else np.float64
+        zero = Decimal(0) if exact else 0.0
+
+        values = np.full((len(currencies), days), zero, dtype=dtype)
+        known = np.zeros((len(currencies), days), dtype=bool)
+
+        for i, currency in enumerate(currencies):
+            direct = _rate_series(price_map, (currency, target_currency), ordinals, dtype)
+            if direct is not None:
+                values[i], known[i] = direct
+
+            for implied_currency in via:
+                if known[i].all():
+                    break
+                if implied_currency == target_currency:
+                    continue
+
+                first = _rate_series(price_map, (currency, implied_currency), ordinals, dtype)
+                if first is None:
+                    continue
+                second = _rate_series(price_map, (implied_currency, target_currency), ordinals, dtype)
+                if second is None:
+                    continue
+
+                mask = ~known[i] & first[1] & second[1]
+                values[i, mask] = first[0][mask] * second[0][mask]
+                known[i] |= mask
+
+        return cls(currencies, target_currency, begin_date, values, known)
+
+    @property
+    def days(self) -> int:
+        return self.values.shape[1]
+
+    @property
+    def dates(self) -> list[datetime.date]:
+        return [self.begin_date + datetime.timedelta(days=i) for i in range(self.days)]
+
+    def day_index(self, date: datetime.date) -> int:
+        index = (date - self.begin_date).days
+        if not 0 <= index < self.days:
+            raise IndexError(f"{date} is out of the price matrix")
+        return index
+
+    def rates(self, currency: str) -> np.ndarray:
+        return self.values[self._index[currency]]
+
+    def rate(self, currency: str, date: datetime.date) -> Decimal | float | None:
+        i = self._index[currency]
+        j = self.day_index(date)
+        return self.values[i, j] if self.known[i, j] else None
+
+    def holdings_of(self, inventory: Inventory | Mapping[str, Decimal]) -> np.ndarray:
+        """把 inventory 转换为与 currencies 对应的数量向量"""
+        exact = self.values.dtype == object
+        holdings = np.full(len(self.currencies), Decimal(0) if exact else 0.0, dtype=self.values.dtype)
+
+        items = (
+            ((x.units.currency, x.units.number) for x in inventory.get_positions())
+            if isinstance(inventory, Inventory)
+            else inventory.items()
+        )
+        for currency, number in items:
+            holdings[self._index[currency]] += number if exact else float(number)
+        return holdings
+
+    def value(self, inventory: Inventory | Mapping[str, Decimal]) -> np.ndarray:
+        """持仓不变时每一天的市值"""
+        return self.value_holdings(self.holdings_of(inventory)[:, np.newaxis])
+
+    def value_holdings(self, holdings: np.ndarray) -> np.ndarray:
+        """
+        holdings 的形状为 (currencies, days) 或 (currencies, 1), 返回每一天的市值
+        持有无法折算的货币时抛出 ValueError
+        """
+        held = holdings != 0
+        missing = held & ~self.known
+        if missing.any():
+            i, j = np.argwhere(missing)[0]
+            date = self.begin_date + datetime.timedelta(days=int(j))
+            raise ValueError(f"can't convert {self.currencies[i]} to {self.target_currency} at {date}")
+
+        zero = Decimal(0) if self.values.dtype == object else 0.0
+        if not self.currencies:
+            return np.full(self.days, zero, dtype=self.values.dtype)
+        return np.where(held, holdings * self.values, zero).sum(axis=0)
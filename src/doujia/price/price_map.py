@@ -1,86 +1,212 @@
-from beancount.core.data import Directive, Price
+import datetime
+import os
+import threading
+from bisect import bisect_left
+from decimal import Decimal
+from typing import NamedTuple
+
+from beancount.core.data import Directive
 from beancount.core.getters import get_commodity_directives
+from beancount.core.number import ONE, ZERO
 from beancount.core.prices import PriceMap, build_price_map, get_price
+from logzero import logger
 
-from doujia.price.yahoo import get_realtime_prices, update_price_cache
+from doujia.ledger.snapshot import LedgerSnapshot
+from doujia.price.cache import SymbolPriceCache, symbol_price_cache
+from doujia.price.provider import PriceProviderEngine, get_price_sources
+from doujia.price.shared import SHARED_PATH_ENV, SharedPriceFile
+from doujia.price.yahoo import YahooPriceProvider, get_realtime_prices
 
+PricePair = tuple[str, str]
+
+# 全局单例, 其他 provider 由配置注册
+price_providers = PriceProviderEngine()
+price_providers.register("yahoo", YahooPriceProvider())
+
+_shared_lock = threading.Lock()
+
+
+class OverlayPriceMap(PriceMap):
+    """
+    在账本的 PriceMap 之上叠加少量价格
+    自身只保存被修改过的 pair, 其余 pair 直接读取 base, 不会复制或修改 base
+    beancount 的 get_price / convert_amount 等函数通过 [] / get / in 访问, 因此会依次查询两层
+    """
+
+    __slots__ = ("base",)
+
+    def __init__(self, base: PriceMap):
+        super().__init__()
+        self.base = base
+        self.forward_pairs = base.forward_pairs
+
+    def __getitem__(self, key: PricePair):
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        return self.base[key]
+
+    def __contains__(self, key) -> bool:
+        return dict.__contains__(self, key) or key in self.base
+
+    def get(self, key: PricePair, default=None):
+        if dict.__contains__(self, key):
+            return dict.__getitem__(self, key)
+        return self.base.get(key, default)
+
+    def _merged(self) -> dict:
+        return {**self.base, **dict(dict.items(self))}
+
+    def __iter__(self):
+        return iter(self._merged())
+
+    def __len__(self) -> int:
+        return len(self._merged())
+
+    def keys(self):
+        return self._merged().keys()
+
+    def values(self):
+        return self._merged().values()
+
+    def items(self):
+        return self._merged().items()
+
+    def set_price(self, base_quote: PricePair, date: datetime.date, number: Decimal):
+        """插入或替换某一天的价格, 同时更新反向的 pair, 与把 Price entry 加入账本后重新 build_price_map 一致"""
+        base, quote = base_quote
+        if base_quote not in self and (quote, base) not in self:
+            self.forward_pairs = [*self.forward_pairs, base_quote]
+
+        self._set(base_quote, date, number)
+        if number != ZERO:
+            self._set((quote, base), date, ONE / number)
+
+    def _set(self, pair: PricePair, date: datetime.date, number: Decimal):
+        prices = list(self.get(pair, []))
+        index = bisect_left(prices, date, key=lambda x: x[0])
+        if index < len(prices) and prices[index][0] == date:
+            prices[index] = (date, number)
+        else:
+            prices.insert(index, (date, number))
+        self[pair] = prices
+
+    def truncate(self, pair: PricePair, end_date: datetime.date):
+        """删除 end_date 及之后的价格"""
+        prices = self.get(pair)
+        if prices is None:
+            return
+        self[pair] = prices[: bisect_left(prices, end_date, key=lambda x: x[0])]
+
+
+class _LedgerPrices(NamedTuple):
+    entries: list[Directive]  # type: ignore
+    entry_count: int
+    # commodity 到 price 元数据中所有 symbol 的映射, 按来源的顺序排列
+    symbols: dict[str, list[str]]
+    price_map: PriceMap
+
+
+_last_ledger_prices: _LedgerPrices | None = None
+
+
+def _get_ledger_prices(entries: list[Directive] | LedgerSnapshot) -> _LedgerPrices:  # type: ignore
+    """账本中的价格只在 entries 变化时重新构建"""
+    global _last_ledger_prices
+
+    if isinstance(entries, LedgerSnapshot):
+        entries = entries.entries
+
+    last = _last_ledger_prices
+    if last is not None and last.entries is entries and last.entry_count == len(entries):
+        return last
 
-def get_last_and_realtime_price_map(entries: list[Directive]):  # type: ignore
     commodity_map = get_commodity_directives(entries)
-    symbols = _get_yahoo_symbols(commodity_map)
-    last_price_map = build_price_map(entries)
-    realtime_price_map: PriceMap = _build_realtime_price_map(entries, symbols)
+    _last_ledger_prices = _LedgerPrices(
+        entries=entries,
+        entry_count=len(entries),
+        symbols={
+            currency: [x.symbol for x in sources] for currency, sources in get_price_sources(commodity_map).items()
+        },
+        price_map=build_price_map(entries),
+    )
+    return _last_ledger_prices
+
+
+def get_last_and_realtime_price_map(entries: list[Directive] | LedgerSnapshot):  # type: ignore
+    ledger_prices = _get_ledger_prices(entries)
+    symbols = ledger_prices.symbols
+    realtime_price_map = _build_realtime_price_map(ledger_prices.price_map, symbols)
 
     latest_date = None
     for pair in realtime_price_map.forward_pairs:
         if pair[0] not in symbols:
             continue
 
-        for price_date, _ in realtime_price_map[pair]:
-            if not latest_date or price_date > latest_date:
-                latest_date = price_date
+        prices = realtime_price_map[pair]
+        if prices and (not latest_date or prices[-1][0] > latest_date):
+            latest_date = prices[-1][0]
 
+    last_price_map = OverlayPriceMap(ledger_prices.price_map)
     if latest_date is not None:
         for pair in last_price_map.forward_pairs:
             if pair[0] not in symbols:
                 continue
 
-            last_price_map[pair] = [
-                (price_date, price) for price_date, price in last_price_map[pair] if price_date < latest_date
-            ]
-            reversed_pair = (pair[1], pair[0])
-            last_price_map[reversed_pair] = [
-                (price_date, price) for price_date, price in last_price_map[reversed_pair] if price_date < latest_date
-            ]
+            last_price_map.truncate(pair, latest_date)
+            last_price_map.truncate((pair[1], pair[0]), latest_date)
 
     return last_price_map, realtime_price_map
 
 
 def build_realtime_price_cache(entries: list[Directive]):
     commodity_map = get_commodity_directives(entries)
-    symbols = _get_yahoo_symbols(commodity_map)
-    update_price_cache(list(symbols.values()))
-
-
-def _get_yahoo_symbols(commodity_map):
-    symbols = dict()
-    for currency, commodity in commodity_map.items():
-        if "price" not in commodity.meta or not isinstance(commodity.meta["price"], str):
+    sources = get_price_sources(commodity_map)
+    price_providers.refresh(x for currency_sources in sources.values() for x in currency_sources)
+
+
+def attach_shared_price_cache(cache: SymbolPriceCache = symbol_price_cache):
+    """
+    Fava 扩展运行在单独的进程中, 不会调用 setup_shared_price_cache
+    设置了 PRICE_CACHE_SHARED_PATH 时在第一次读取实时价格前挂载服务写入的共享文件, 只读取不参与刷新
+    """
+    path = os.environ.get(SHARED_PATH_ENV)
+    if not path or cache.shared is not None:
+        return
+
+    with _shared_lock:
+        if cache.shared is not None:
+            return
+
+        try:
+            shared = SharedPriceFile(path)
+        except OSError as e:
+            logger.error(f"Failed to open shared price cache {path}: {e}")
+            return
+        cache.attach_shared(shared)
+
+
+def _build_realtime_price_map(price_map: PriceMap, symbols: dict[str, list[str]]) -> OverlayPriceMap:
+    attach_shared_price_cache()
+    symbol_to_price = get_realtime_prices([x for currency_symbols in symbols.values() for x in currency_symbols])
+    realtime_price_map = OverlayPriceMap(price_map)
+
+    for currency, currency_symbols in symbols.items():
+        # 多个来源时使用第一个有价格的来源
+        cached_price = next((symbol_to_price[x] for x in currency_symbols if x in symbol_to_price), None)
+        if cached_price is None:
             continue
 
-        if "=X" in commodity.meta["price"]:
-            continue
-
-        if "price" in commodity.meta and "yahoo/" in commodity.meta["price"]:
-            symbols[currency] = commodity.meta["price"].split("/")[-1]
-    return symbols
-
-
-def _build_realtime_price_map(entries: list[Directive], symbols: dict):  # type: ignore
-    symbol_to_price = get_realtime_prices(list(symbols.values()))
-    new_entries = entries.copy()
-
-    for currency, symbol in symbols.items():
-        if symbol not in symbol_to_price:
-            continue
-
-        cached_price = symbol_to_price[symbol]
         symbol_price = cached_price.price
 
+        # 账本中已经有当天的价格时以账本为准
         existed_price = get_price(
-            build_price_map(entries),
+            price_map,
             (currency, symbol_price.currency),
             date=cached_price.price_date,
         )
         if existed_price and existed_price[0] == cached_price.price_date:
             continue
 
-        price = Price(
-            date=cached_price.price_date,
-            meta=None,
-            currency=currency,
-            amount=symbol_price,
-        )
-        new_entries.append(price)
+        realtime_price_map.set_price((currency, symbol_price.currency), cached_price.price_date, symbol_price.number)
 
-    return build_price_map(new_entries)
+    return realtime_price_map
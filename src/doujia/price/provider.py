@@ -0,0 +1,179 @@
+import datetime
+import json
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from decimal import Decimal
+from typing import NamedTuple
+
+import requests
+from beancount.core.data import Amount
+from logzero import logger
+
+from doujia.price.cache import SymbolPriceCache, symbol_price_cache
+
+
+class PriceQuote(NamedTuple):
+    price: Amount
+    price_date: datetime.date
+    # 报价所属的市场, 用于按交易时段安排刷新, 见 market_hours.MARKET_HOURS
+    market: str | None = None
+
+
+class PriceSource(NamedTuple):
+    """commodity price 元数据中的一个来源, 例如 USD:pricehist.beanprice.yahoo/VOO 对应 (yahoo, VOO)"""
+
+    provider: str
+    symbol: str
+
+
+def parse_price_sources(value: str) -> list[PriceSource]:
+    """
+    解析 bean-price 格式的 price 元数据, 多个来源用逗号或空白分隔, 按顺序返回
+    provider 取模块路径的最后一段, 因此 yahoo 与 pricehist.beanprice.yahoo 都对应 yahoo
+    """
+    sources: list[PriceSource] = []
+    for part in re.split(r"[\s,]+", value.strip()):
+        # 去掉报价货币前缀
+        currency, sep, rest = part.partition(":")
+        if sep and "/" not in currency:
+            part = rest
+        module, _, symbol = part.partition("/")
+        if module and symbol:
+            sources.append(PriceSource(provider=module.split(".")[-1], symbol=symbol))
+    return sources
+
+
+def get_price_sources(commodity_map: dict) -> dict[str, list[PriceSource]]:
+    """每个 commodity 的价格来源, 没有 price 元数据的 commodity 不返回"""
+    result: dict[str, list[PriceSource]] = {}
+    for currency, commodity in commodity_map.items():
+        value = commodity.meta.get("price") if commodity.meta else None
+        if not isinstance(value, str):
+            continue
+
+        sources = parse_price_sources(value)
+        if sources:
+            result[currency] = sources
+    return result
+
+
+def _parse_quote(value: dict) -> PriceQuote:
+    return PriceQuote(
+        price=Amount(Decimal(str(value["price"])), value["currency"]),
+        price_date=datetime.date.fromisoformat(value["date"]),
+    )
+
+
+class PriceProvider(ABC):
+    """价格来源, fetch 返回 symbol 到报价的映射, 取不到价格的 symbol 不返回, 没有实现 fetch 的子类不能实例化"""
+
+    # 单次 fetch 允许的最长时间, 超时的结果会被丢弃
+    timeout: float = 30
+
+    @abstractmethod
+    def fetch(self, symbols: list[str]) -> dict[str, PriceQuote]: ...
+
+
+class FilePriceProvider(PriceProvider):
+    """
+    从本地 JSON 文件读取价格, 每次 fetch 重新读取文件
+    格式为 {"VOO": {"price": "500.1", "currency": "USD", "date": "2024-10-21"}}
+    """
+
+    def __init__(self, path: str, timeout: float = 5):
+        self.path = path
+        self.timeout = timeout
+
+    def fetch(self, symbols: list[str]) -> dict[str, PriceQuote]:
+        with open(self.path, encoding="utf-8") as f:
+            values = json.load(f)
+
+        return {symbol: _parse_quote(values[symbol]) for symbol in symbols if symbol in values}
+
+
+class HttpJsonPriceProvider(PriceProvider):
+    """请求 url_template.format(symbol=symbol), 返回与 FilePriceProvider 中单个 symbol 相同格式的 JSON"""
+
+    def __init__(self, url_template: str, timeout: float = 10):
+        self.url_template = url_template
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def fetch(self, symbols: list[str]) -> dict[str, PriceQuote]:
+        quotes: dict[str, PriceQuote] = {}
+        for symbol in symbols:
+            response = self._session.get(self.url_template.format(symbol=symbol), timeout=self.timeout)
+            if response.status_code == 404:
+                continue
+            response.raise_for_status()
+            quotes[symbol] = _parse_quote(response.json())
+        return quotes
+
+
+class PriceProviderEngine:
+    """
+    按 price 元数据把 symbol 分给注册的 provider, 各 provider 在线程池中并发获取价格
+    每个 provider 有自己的超时时间, 慢的或失败的 provider 只会缺少自己的价格, 不会拖慢其他 provider
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self.providers: dict[str, PriceProvider] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="price-provider")
+        # 上一次超时仍在运行的请求, 完成之前不再提交同一个 provider
+        self._running: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, provider: PriceProvider):
+        with self._lock:
+            self.providers[name] = provider
+
+    def fetch(self, sources: Iterable[PriceSource]) -> dict[str, PriceQuote]:
+        """获取所有已注册 provider 的价格, 未注册的 provider 直接忽略"""
+        symbols_by_provider: dict[str, list[str]] = {}
+        for source in sources:
+            if source.provider not in self.providers:
+                continue
+            symbols = symbols_by_provider.setdefault(source.provider, [])
+            if source.symbol not in symbols:
+                symbols.append(source.symbol)
+
+        started = time.monotonic()
+        futures: dict[str, Future] = {}
+        with self._lock:
+            for name, symbols in symbols_by_provider.items():
+                running = self._running.get(name)
+                if running is not None and not running.done():
+                    logger.warning(f"price provider {name} is still running, skipped")
+                    continue
+                futures[name] = self._executor.submit(self.providers[name].fetch, symbols)
+
+        quotes: dict[str, PriceQuote] = {}
+        for name, future in futures.items():
+            remains = self.providers[name].timeout - (time.monotonic() - started)
+            try:
+                quotes.update(future.result(timeout=max(remains, 0)))
+            except FutureTimeoutError:
+                logger.error(f"price provider {name} timed out")
+                with self._lock:
+                    self._running[name] = future
+            except Exception as e:
+                logger.error(f"price provider {name} failed: {e}")
+
+        return quotes
+
+    def refresh(
+        self, sources: Iterable[PriceSource], cache: SymbolPriceCache = symbol_price_cache
+    ) -> dict[str, PriceQuote]:
+        """获取价格并写入 cache, 返回获取到的报价"""
+        quotes = self.fetch(sources)
+        if quotes:
+            cache.update_batch(
+                {symbol: quote.price for symbol, quote in quotes.items()},
+                {symbol: quote.price_date for symbol, quote in quotes.items()},
+            )
+        return quotes
@@ -0,0 +1,110 @@
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+from collections.abc import Mapping
+
+from doujia.price.cache import PriceCache
+from doujia.price.history import price_cache_from_row, price_cache_to_row
+
+# magic, seq, generation, length
+_HEADER = struct.Struct("<8sQQQ")
+_MAGIC = b"DJPRICE1"
+_SEQ_OFFSET = 8
+_GENERATION_OFFSET = 16
+_READ_RETRIES = 100
+
+# 共享文件的路径, 不经过 setup_shared_price_cache 的进程 (例如 Fava) 通过它找到服务写入的文件
+SHARED_PATH_ENV = "PRICE_CACHE_SHARED_PATH"
+
+
+class SharedPriceFile:
+    """
+    多个进程共享的价格缓存, 保存在 mmap 的文件中
+    只有抢到文件锁的进程 (refresher) 写入, 其他进程直接读取映射的内存, 不需要 IPC
+    写入前后各递增一次 seq (seqlock), 读取时 seq 为奇数或前后不一致说明读到了一半的写入, 需要重读
+    generation 在每次写入后递增, 读取方只在 generation 变化时才解析内容
+    """
+
+    def __init__(self, path: str, capacity: int = 1024 * 1024):
+        self.path = path
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._lock_fd: int | None = None
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            size = _HEADER.size + capacity
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    @property
+    def is_refresher(self) -> bool:
+        return self._lock_fd is not None
+
+    def try_become_refresher(self) -> bool:
+        """尝试成为唯一写入的进程, 锁随进程退出释放, 之后其他进程可以接替"""
+        with self._lock:
+            if self._lock_fd is not None:
+                return True
+
+            fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                return False
+
+            self._lock_fd = fd
+            return True
+
+    def generation(self) -> int:
+        magic, _, generation, _ = _HEADER.unpack_from(self._mmap, 0)
+        return generation if magic == _MAGIC else 0
+
+    def publish(self, quotes: Mapping[str, PriceCache]) -> bool:
+        """写入全部价格, 超过容量时不写入并返回 False"""
+        payload = json.dumps({symbol: price_cache_to_row(quote) for symbol, quote in quotes.items()}).encode()
+        if len(payload) > self.capacity:
+            return False
+
+        with self._lock:
+            magic, seq, generation, _ = _HEADER.unpack_from(self._mmap, 0)
+            if magic != _MAGIC:
+                seq, generation = 0, 0
+
+            struct.pack_into("<Q", self._mmap, _SEQ_OFFSET, seq + 1)
+            self._mmap[_HEADER.size : _HEADER.size + len(payload)] = payload
+            _HEADER.pack_into(self._mmap, 0, _MAGIC, seq + 1, generation + 1, len(payload))
+            struct.pack_into("<Q", self._mmap, _SEQ_OFFSET, seq + 2)
+        return True
+
+    def read(self) -> tuple[int, dict[str, PriceCache]] | None:
+        """返回 (generation, 价格), 还没有写入过时返回 None"""
+        for _ in range(_READ_RETRIES):
+            magic, seq, generation, length = _HEADER.unpack_from(self._mmap, 0)
+            if magic != _MAGIC:
+                return None
+            if seq % 2 == 1:
+                continue
+
+            payload = self._mmap[_HEADER.size : _HEADER.size + min(length, self.capacity)]
+            if struct.unpack_from("<Q", self._mmap, _SEQ_OFFSET)[0] != seq:
+                continue
+
+            rows = json.loads(payload)
+            return generation, {symbol: price_cache_from_row(row) for symbol, row in rows.items()}
+
+        return None
+
+    def close(self):
+        with self._lock:
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+        self._mmap.close()
@@ -1,10 +1,14 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import pytz
 import requests
+import requests.adapters
 from beancount.core.data import Amount, Decimal
 
 from doujia.price.cache import PriceCache, symbol_price_cache
+from doujia.price.provider import PriceProvider, PriceQuote
 
 ACCEPT = "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7"  # noqa: E501
 USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/128.0.0.0 Safari/537.36"  # noqa: E501
@@ -18,39 +22,94 @@ YAHOO_HEADERS = {
 }
 
 
-def _get_crumb():
-    session = requests.Session()
-    session.get("https://finance.yahoo.com", headers=YAHOO_HEADERS)
-
-    crumb_response = session.get("https://query2.finance.yahoo.com/v1/test/getcrumb", headers=YAHOO_HEADERS)
-    if crumb_response.status_code == 200 and crumb_response.text:
-        return (crumb_response.text, session)
+class YahooQuoteClient:
+    """
+    长期使用的 Yahoo 报价客户端, 复用 Session 的连接池, crumb 与 cookie 缓存到收到 401 / 403 为止
+    symbols 按 chunk_size 分批, 多批并发请求
+    """
 
-    return None
+    def __init__(
+        self,
+        home_url: str = "https://finance.yahoo.com",
+        crumb_url: str = "https://query2.finance.yahoo.com/v1/test/getcrumb",
+        quote_url: str = "https://query1.finance.yahoo.com/v7/finance/quote",
+        chunk_size: int = 50,
+        max_workers: int = 4,
+        timeout: float = 10,
+    ):
+        self.home_url = home_url
+        self.crumb_url = crumb_url
+        self.quote_url = quote_url
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        self._session = requests.Session()
+        self._session.headers.update(YAHOO_HEADERS)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        self._crumb: str | None = None
+        self._lock = threading.Lock()
+
+    def crumb(self) -> str:
+        """返回缓存的 crumb, 没有时先访问首页拿到 cookie 再获取"""
+        with self._lock:
+            if self._crumb is None:
+                self._session.get(self.home_url, timeout=self.timeout)
+                response = self._session.get(self.crumb_url, timeout=self.timeout)
+                if response.status_code != 200 or not response.text:
+                    raise ValueError(f"failed to get crumb, status: {response.status_code}")
+                self._crumb = response.text
+
+            return self._crumb
+
+    def _invalidate(self, crumb: str):
+        with self._lock:
+            # 其他线程可能已经换了新的 crumb
+            if self._crumb == crumb:
+                self._crumb = None
+                self._session.cookies.clear()
+
+    def _quote_chunk(self, symbols: list[str], retry: bool = True) -> list[dict]:
+        crumb = self.crumb()
+        params = {
+            "lang": "en-US",
+            "region": "US",
+            "corsDomain": "finance.yahoo.com",
+            "fields": FIELDS,
+            "formatted": "true",
+            "symbols": ",".join(symbols),
+            "crumb": crumb,
+        }
+        response = self._session.get(self.quote_url, params=params, timeout=self.timeout)
+        if response.status_code in (401, 403) and retry:
+            # crumb 或 cookie 过期, 重新获取后再试一次
+            self._invalidate(crumb)
+            return self._quote_chunk(symbols, retry=False)
+
+        data = response.json()
+        if "quoteResponse" not in data:
+            raise ValueError(f"no quoteResponse in {data}")
+        return data["quoteResponse"]["result"]
+
+    def quote(self, symbols: list[str]) -> list[dict]:
+        """按 symbols 的顺序返回所有分批请求的 quote 结果"""
+        chunks = [symbols[i : i + self.chunk_size] for i in range(0, len(symbols), self.chunk_size)]
+        if len(chunks) <= 1:
+            return [x for chunk in chunks for x in self._quote_chunk(chunk)]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            return [x for results in executor.map(self._quote_chunk, chunks) for x in results]
+
+
+# 全局单例
+yahoo_quote_client = YahooQuoteClient()
 
 
 def request_yahoo_finance(symbols: list[str]):
-    (crumb, session) = _get_crumb()
-
-    params = {
-        "lang": "en-US",
-        "region": "US",
-        "corsDomain": "finance.yahoo.com",
-        "fields": FIELDS,
-        "formatted": "true",
-        "symbols": ",".join(symbols),
-        "crumb": crumb,
-    }
-
-    url = "https://query1.finance.yahoo.com/v7/finance/quote"
-    resp = session.get(url, params=params, headers=YAHOO_HEADERS)
-
-    data = resp.json()
-
-    if "quoteResponse" not in data:
-        raise ValueError(f"no quoteResponse in {data}")
-
-    return data
+    return {"quoteResponse": {"result": yahoo_quote_client.quote(symbols), "error": None}}
 
 
 def get_realtime_prices(symbols: list[str]) -> dict[str, PriceCache]:
@@ -71,47 +130,57 @@ def get_realtime_prices(symbols: list[str]) -> dict[str, PriceCache]:
     return prices
 
 
-def update_price_cache(symbols: list[str]):
-    """
-    从Yahoo Finance获取最新价格并更新缓存
-    """
-    if not symbols:
-        return
-
-    for attempt in range(3):
-        try:
-            resp = request_yahoo_finance(symbols)
-            break
-        except ValueError as e:
-            if attempt == 2:
-                raise e
-
-    prices = {}
-    price_dates = {}
-    for result in resp["quoteResponse"]["result"]:
-        symbol = result["symbol"]
-
-        # Get exchange timezone
-        if "exchangeTimezoneName" not in result:
-            exchange_tz = pytz.utc
-        else:
-            exchange_tz = pytz.timezone(result["exchangeTimezoneName"])
-
-        if result["hasPrePostMarketData"] and result["marketState"] == "PRE" and "preMarketPrice" in result:
-            price = result["preMarketPrice"]["raw"]
-            time = result["preMarketTime"]["raw"]
-        else:
-            if "regularMarketPrice" not in result:
-                print(f"no regularMarketPrice in {result}, symbol: {symbol}")
-                continue
-            price = result["regularMarketPrice"]["raw"]
-            time = result["regularMarketTime"]["raw"]
-
-        # Convert timestamp to exchange timezone
-        time = datetime.fromtimestamp(time, tz=pytz.UTC).astimezone(exchange_tz).date()
-        price = Amount(Decimal(price), result["currency"])
-        prices[symbol] = price
-        price_dates[symbol] = time
-
-    # 更新缓存
-    symbol_price_cache.update_batch(prices, price_dates)
+def _market_of(result: dict) -> str | None:
+    # 外汇与加密货币不随交易所的交易时段
+    if result.get("quoteType") == "CURRENCY":
+        return "FX"
+    if result.get("quoteType") == "CRYPTOCURRENCY":
+        return "CRYPTO"
+    return result.get("exchangeTimezoneName")
+
+
+class YahooPriceProvider(PriceProvider):
+    """通过 Yahoo Finance 获取报价, 盘前时段优先使用盘前价格"""
+
+    def __init__(self, timeout: float = 30):
+        self.timeout = timeout
+
+    def fetch(self, symbols: list[str]) -> dict[str, PriceQuote]:
+        if not symbols:
+            return {}
+
+        for attempt in range(3):
+            try:
+                resp = request_yahoo_finance(symbols)
+                break
+            except ValueError as e:
+                if attempt == 2:
+                    raise e
+
+        quotes: dict[str, PriceQuote] = {}
+        for result in resp["quoteResponse"]["result"]:
+            symbol = result["symbol"]
+
+            # Get exchange timezone
+            if "exchangeTimezoneName" not in result:
+                exchange_tz = pytz.utc
+            else:
+                exchange_tz = pytz.timezone(result["exchangeTimezoneName"])
+
+            if result["hasPrePostMarketData"] and result["marketState"] == "PRE" and "preMarketPrice" in result:
+                price = result["preMarketPrice"]["raw"]
+                time = result["preMarketTime"]["raw"]
+            else:
+                if "regularMarketPrice" not in result:
+                    print(f"no regularMarketPrice in {result}, symbol: {symbol}")
+                    continue
+                price = result["regularMarketPrice"]["raw"]
+                time = result["regularMarketTime"]["raw"]
+
+            # Convert timestamp to exchange timezone
+            time = datetime.fromtimestamp(time, tz=pytz.UTC).astimezone(exchange_tz).date()
+            quotes[symbol] = PriceQuote(
+                price=Amount(Decimal(price), result["currency"]), price_date=time, market=_market_of(result)
+            )
+
+        return quotes
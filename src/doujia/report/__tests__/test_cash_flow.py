@@ -0,0 +1,94 @@
+from datetime import date
+from pathlib import Path
+from typing import TypeVar
+
+import beangrow.returns as returnslib
+import pytest
+from beancount.core import data
+from beangrow.reports import compute_returns_table
+
+from doujia.extensions.portfolio_logic import extract_beangrow_config
+from doujia.report.cash_flow import CashFlowStore
+from doujia.report.investment import _get_calendar_intervals, _get_cumulative_intervals, cumulative_returns
+
+Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
+
+
+def test_cash_flow_store_should_match_truncate_and_merge(entries: list[Directive]):
+    """
+    @@@/main.bean
+    2018-01-01 commodity AAPL
+    2018-01-01 commodity TENCENT
+    2018-01-01 open Assets:Stock:Current
+    2018-01-01 open Assets:Stock:AAPL
+    2018-01-01 open Assets:Stock:TENCENT
+    2018-01-01 open Income:Dividends:AAPL
+    2018-01-01 open Income:PnL
+
+    2018-01-01 price HKD      0.13 USD
+    2018-03-01 price AAPL       40 USD
+    2018-03-01 price TENCENT   350 HKD
+
+    2018-03-05 * "Buy AAPL"
+        Assets:Stock:AAPL      100 AAPL {40 USD}
+        Assets:Stock:Current -4,000 USD
+
+    2018-06-12 * "Buy TENCENT"
+        Assets:Stock:TENCENT   100 TENCENT {360 HKD}
+        Assets:Stock:Current  -36,000 HKD
+
+    2019-01-01 * "Buy AAPL"
+        Assets:Stock:AAPL       10 AAPL {41 USD}
+        Assets:Stock:Current   -410 USD
+
+    2019-02-18 * "Dividend"
+        Income:Dividends:AAPL  -80 USD
+        Assets:Stock:Current    80 USD
+
+    2020-03-20 * "Sell AAPL"
+        Assets:Stock:AAPL      -60 AAPL {40 USD} @ 60 USD
+        Assets:Stock:Current  3,600 USD
+        Income:PnL           -1,200 USD
+
+    2020-11-10 price TENCENT   560 HKD
+    2021-01-05 price AAPL      130 USD
+
+    @@@/beangrow.pbtxt
+    investments {
+        investment {
+            currency: "AAPL"
+            asset_account: "Assets:Stock:AAPL"
+            cash_accounts: "Assets:Stock:Current"
+            dividend_accounts: "Income:Dividends:AAPL"
+        }
+        investment {
+            currency: "TENCENT"
+            asset_account: "Assets:Stock:TENCENT"
+            cash_accounts: "Assets:Stock:Current"
+        }
+    }
+    groups {
+        group {
+            name: "All"
+            investment: "Assets:*"
+            currency: "USD"
+        }
+    }
+    """
+    begin_date, end_date = date(2018, 1, 1), date(2021, 3, 15)
+    pricer, _, account_data_map = extract_beangrow_config(entries, Path("/beangrow.pbtxt"), end_date, dict())
+    account_datas = list(account_data_map.values())
+
+    intervals = _get_calendar_intervals(begin_date, end_date) + _get_cumulative_intervals(begin_date, end_date)
+    store = CashFlowStore(pricer, account_datas, [x for _, date1, date2 in intervals for x in (date1, date2)])
+
+    extra = [(None, None), (None, date(2019, 1, 1)), (date(2019, 1, 2), None), (date(2018, 3, 5), date(2020, 3, 20))]
+    for date1, date2 in [(date1, date2) for _, date1, date2 in intervals] + extra:
+        expected = returnslib.truncate_and_merge_cash_flows(pricer, account_datas, date1, date2)
+        assert store.cash_flows(date1, date2) == expected, (date1, date2)
+
+    table = cumulative_returns(pricer, account_datas, begin_date, end_date, "USD")
+    expected = compute_returns_table(pricer, "USD", account_datas, _get_cumulative_intervals(begin_date, end_date))
+    assert table.header == expected.header
+    for row, expected_row in zip(table.rows[:3], expected.rows, strict=True):
+        assert row == pytest.approx(expected_row, abs=1e-7)
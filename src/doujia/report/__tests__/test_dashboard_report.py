@@ -0,0 +1,103 @@
+from datetime import date
+from pathlib import Path
+from typing import TypeVar
+
+from beancount.core import data
+from beancount.core.inventory import Inventory
+
+from doujia.extensions.portfolio_logic import extract_beangrow_config
+from doujia.report.dashboard import gen_dashboard_data
+from doujia.report.nav import gen_nav_index_data
+from doujia.report.nav_vector import gen_nav_index_data_vectorized
+from doujia.report.pnl import gen_pnl_data
+from doujia.report.util import inventory_processor, split_transactions
+
+Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
+
+
+def test_dashboard_should_match_separate_reports(entries: list[Directive]):
+    """
+    @@@/main.bean
+    2020-01-01 commodity TENCENT
+    2020-01-01 commodity AAPL
+    2020-01-01 open Assets:Stock:Current
+    2020-01-01 open Assets:Stock:AAPL
+    2020-01-01 open Assets:Stock:TENCENT
+    2020-01-01 open Income:Dividends:AAPL
+    2020-01-01 open Income:PnL
+    2020-01-01 open Expenses:Fee
+
+    2021-01-01 price HKD      0.13 USD
+    2021-01-01 price AAPL      100 USD
+    2021-01-10 price TENCENT   300 HKD
+
+    2021-01-05 * "Buy AAPL"
+        Assets:Stock:AAPL      100 AAPL {100 USD}
+        Assets:Stock:Current -10,000 USD
+
+    2021-01-12 * "Buy TENCENT"
+        Assets:Stock:TENCENT   10 TENCENT {310 HKD}
+        Assets:Stock:Current  -3,100 HKD
+
+    2021-01-15 price AAPL      104 USD
+
+    2021-01-18 * "Dividend"
+        Income:Dividends:AAPL  -50 USD
+        Assets:Stock:Current    50 USD
+
+    2021-01-25 * "Sell AAPL"
+        Assets:Stock:AAPL      -40 AAPL {100 USD} @ 110 USD
+        Assets:Stock:Current   4,395 USD
+        Expenses:Fee              5 USD
+        Income:PnL            -400 USD
+
+    2021-02-10 price TENCENT   320 HKD
+
+    @@@/beangrow.pbtxt
+    investments {
+        investment {
+            currency: "AAPL"
+            asset_account: "Assets:Stock:AAPL"
+            cash_accounts: "Assets:Stock:Current"
+            dividend_accounts: "Income:Dividends:AAPL"
+        }
+        investment {
+            currency: "TENCENT"
+            asset_account: "Assets:Stock:TENCENT"
+            cash_accounts: "Assets:Stock:Current"
+        }
+    }
+    groups {
+        group {
+            name: "All"
+            investment: "Assets:*"
+            currency: "USD"
+        }
+    }
+    """
+    begin_date, end_date = date(2021, 1, 10), date(2021, 3, 1)
+    pricer, _, account_data_map = extract_beangrow_config(entries, Path("/beangrow.pbtxt"), end_date, dict())
+    account_datas = list(account_data_map.values())
+    aapl_prices = list(pricer.price_map[("AAPL", "USD")])
+
+    dashboard = gen_dashboard_data(account_datas, pricer.price_map, "USD", begin_date=begin_date, end_date=end_date)
+
+    assert dashboard.nav == gen_nav_index_data_vectorized(
+        account_datas, pricer.price_map, "USD", begin_date=begin_date, end_date=end_date
+    )
+    expected_nav = gen_nav_index_data(
+        account_datas, pricer.price_map.copy(), "USD", begin_date=begin_date, end_date=end_date
+    )
+    assert [d for d, _ in dashboard.nav] == [d for d, _ in expected_nav]
+    for (_, actual_index), (_, expected_index) in zip(dashboard.nav, expected_nav, strict=True):
+        assert abs(actual_index - expected_index) < 1e-9
+
+    assert dashboard.pnl == gen_pnl_data(
+        account_datas, pricer.price_map, "USD", begin_date=begin_date, end_date=end_date
+    )
+
+    before, after = split_transactions(account_datas, begin_date)
+    assert dashboard.holdings == inventory_processor.reduce_transactions(
+        inventory_processor.reduce_transactions(Inventory(), before), after
+    )
+    assert pricer.price_map[("AAPL", "USD")] == aapl_prices
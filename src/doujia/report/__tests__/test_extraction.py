@@ -0,0 +1,81 @@
+from datetime import date
+from pathlib import Path
+from typing import TypeVar
+
+import beangrow.config as configlib
+from beancount.core import data, getters
+from beangrow import investments
+
+from doujia.report.extraction import BeangrowExtractor
+
+Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
+
+
+def test_truncated_extraction_should_equal_direct_extraction(entries: list[Directive], mocker):
+    """
+    @@@/main.bean
+    2020-01-01 commodity AAPL
+    2020-01-01 open Assets:Stock:Current
+    2020-01-01 open Assets:Stock:AAPL
+    2020-01-01 open Income:Dividends:AAPL
+    2020-01-01 open Income:PnL
+
+    2021-02-01 * "Buy AAPL"
+        Assets:Stock:AAPL      100 AAPL {100 USD}
+        Assets:Stock:Current -10,000 USD
+
+    2021-05-01 * "Dividend"
+        Income:Dividends:AAPL   -50 USD
+        Assets:Stock:Current     50 USD
+
+    2021-08-01 * "Sell AAPL"
+        Assets:Stock:AAPL      -40 AAPL {100 USD} @ 120 USD
+        Assets:Stock:Current   4,800 USD
+        Income:PnL            -800 USD
+
+    2021-12-31 close Assets:Stock:AAPL
+
+    @@@/beangrow.pbtxt
+    investments {
+        investment {
+            currency: "AAPL"
+            asset_account: "Assets:Stock:AAPL"
+            cash_accounts: "Assets:Stock:Current"
+            dividend_accounts: "Income:Dividends:AAPL"
+        }
+    }
+    groups {
+        group {
+            name: "All"
+            investment: "Assets:*"
+            currency: "USD"
+        }
+    }
+    """
+    extractor = BeangrowExtractor()
+    config = configlib.read_config("/beangrow.pbtxt", [], getters.get_accounts(entries))
+    spy = mocker.spy(investments, "extract")
+
+    for end_date in [
+        date(2021, 1, 1),
+        date(2021, 2, 2),
+        date(2021, 5, 1),
+        date(2021, 9, 1),
+        date(2021, 12, 31),
+        date(2022, 1, 1),
+    ]:
+        _, account_data_map = extractor.extract(entries, {}, Path("/beangrow.pbtxt"), end_date)
+        expected = investments.extract(entries, {}, config, end_date, False, "")
+
+        assert account_data_map.keys() == expected.keys()
+        for account, account_data in expected.items():
+            actual = account_data_map[account]
+            assert actual.transactions == account_data.transactions
+            assert actual.cash_flows == account_data.cash_flows
+            assert actual.balance == account_data.balance
+            assert actual.cost_currency == account_data.cost_currency
+            assert actual.close == account_data.close
+            assert actual.catmap == account_data.catmap
+
+    # 1 次完整提取 + 6 次用于对比的直接提取
+    assert spy.call_count == 7
@@ -0,0 +1,112 @@
+from datetime import date
+from pathlib import Path
+from typing import TypeVar
+
+from beancount.core import data
+from pytest_mock import MockerFixture
+
+from doujia.extensions.portfolio_logic import extract_beangrow_config
+from doujia.report import nav_checkpoint
+from doujia.report.extraction import truncate_account_data
+from doujia.report.nav_checkpoint import NavCheckpoints
+from doujia.report.nav_vector import gen_nav_index_data_vectorized
+
+Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
+
+
+def _load(entries: list[Directive], end_date: date):
+    pricer, _, account_data_map = extract_beangrow_config(entries, Path("/beangrow.pbtxt"), end_date, dict())
+    return pricer.price_map, list(account_data_map.values())
+
+
+def test_nav_checkpoint_should_resume_from_last_transaction(entries: list[Directive], mocker: MockerFixture):
+    """
+    @@@/main.bean
+    2020-01-01 commodity TENCENT
+    2020-01-01 commodity AAPL
+    2020-01-01 open Assets:Stock:Current
+    2020-01-01 open Assets:Stock:AAPL
+    2020-01-01 open Assets:Stock:TENCENT
+    2020-01-01 open Income:Dividends:AAPL
+    2020-01-01 open Income:PnL
+
+    2021-01-01 price HKD      0.13 USD
+    2021-01-20 price HKD      0.12 USD
+    2021-01-01 price AAPL      100 USD
+    2021-01-10 price TENCENT   300 HKD
+
+    2021-01-05 * "Buy AAPL"
+        Assets:Stock:AAPL      100 AAPL {100 USD}
+        Assets:Stock:Current -10,000 USD
+
+    2021-01-12 * "Buy TENCENT"
+        Assets:Stock:TENCENT   10 TENCENT {310 HKD}
+        Assets:Stock:Current  -3,100 HKD
+
+    2021-01-15 price AAPL      104 USD
+
+    2021-01-18 * "Dividend"
+        Income:Dividends:AAPL  -50 USD
+        Assets:Stock:Current    50 USD
+
+    2021-01-25 * "Sell AAPL"
+        Assets:Stock:AAPL      -40 AAPL {100 USD} @ 110 USD
+        Assets:Stock:Current   4,400 USD
+        Income:PnL            -400 USD
+
+    2021-02-10 price TENCENT   320 HKD
+
+    @@@/beangrow.pbtxt
+    investments {
+        investment {
+            currency: "AAPL"
+            asset_account: "Assets:Stock:AAPL"
+            cash_accounts: "Assets:Stock:Current"
+            dividend_accounts: "Income:Dividends:AAPL"
+        }
+        investment {
+            currency: "TENCENT"
+            asset_account: "Assets:Stock:TENCENT"
+            cash_accounts: "Assets:Stock:Current"
+        }
+    }
+    groups {
+        group {
+            name: "All"
+            investment: "Assets:*"
+            currency: "USD"
+        }
+    }
+    """
+    price_map, account_datas = _load(entries, date(2021, 3, 1))
+    # 账本更新前只有 2021-01-20 之前的交易
+    old_account_datas = [x for x in (truncate_account_data(x, date(2021, 1, 20)) for x in account_datas) if x]
+
+    checkpoints = NavCheckpoints()
+    spy = mocker.spy(nav_checkpoint, "new_vector_nav_memo")
+
+    def gen(account_datas: list, end_date: date):
+        actual = checkpoints.gen_nav_index_data(account_datas, price_map, "USD", end_date=end_date)
+        expected = gen_nav_index_data_vectorized(account_datas, price_map, "USD", end_date=end_date)
+        assert actual == expected
+        return spy.call_args.kwargs["processed"]
+
+    assert gen(old_account_datas, date(2021, 1, 22)) == 0
+    # 只追加日期
+    assert gen(old_account_datas, date(2021, 2, 1)) == 3
+    # 追加交易
+    assert gen(account_datas, date(2021, 3, 1)) == 3
+    assert gen(account_datas, date(2021, 3, 1)) == 4
+
+    # checkpoint 之前的交易变化时重新计算
+    first = account_datas[0]
+    transaction = first.transactions[0]
+    posting = transaction.postings[0]
+    changed = transaction._replace(
+        postings=[
+            posting._replace(units=posting.units._replace(number=posting.units.number * 2)),
+            *transaction.postings[1:],
+        ]
+    )
+    changed_account_datas = [first._replace(transactions=[changed, *first.transactions[1:]]), *account_datas[1:]]
+    assert gen(changed_account_datas, date(2021, 3, 1)) == 0
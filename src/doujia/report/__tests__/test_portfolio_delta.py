@@ -0,0 +1,66 @@
+from doujia.report.portfolio.delta import portfolio_delta
+
+
+def _holding(name: str, value: str) -> dict:
+    return {"name": name, "realtime_market_value": [value, "USD"], "position": "10"}
+
+
+def _portfolio(groups: list[dict], value: str) -> dict:
+    return {"groups": groups, "realtime_market_value": [value, "USD"], "index": 0.1}
+
+
+def test_portfolio_delta_should_only_contain_changed_fields():
+    old = _portfolio(
+        [
+            {
+                "name": "US",
+                "realtime_market_value": ["300", "USD"],
+                "holdings": [_holding("VOO", "200"), _holding("VWO", "100")],
+            },
+            {"name": "CN", "realtime_market_value": ["100", "USD"], "holdings": [_holding("HSETF", "100")]},
+        ],
+        "400",
+    )
+    new = _portfolio(
+        [
+            {
+                "name": "US",
+                "realtime_market_value": ["310", "USD"],
+                "holdings": [_holding("VOO", "200"), _holding("VWO", "110")],
+            },
+            {"name": "CN", "realtime_market_value": ["100", "USD"], "holdings": [_holding("HSETF", "100")]},
+        ],
+        "410",
+    )
+
+    assert portfolio_delta(old, old) == {}
+    assert portfolio_delta(old, new) == {
+        "fields": {"realtime_market_value": ["410", "USD"]},
+        "groups": {
+            "items": {
+                "US": {
+                    "fields": {"realtime_market_value": ["310", "USD"]},
+                    "holdings": {"items": {"VWO": {"realtime_market_value": ["110", "USD"]}}},
+                }
+            }
+        },
+    }
+
+
+def test_portfolio_delta_should_report_order_and_composition_changes():
+    old = _portfolio([{"name": "US", "holdings": [_holding("VOO", "200"), _holding("VWO", "100")]}], "300")
+    reordered = _portfolio([{"name": "US", "holdings": [_holding("VWO", "300"), _holding("VOO", "200")]}], "500")
+    assert portfolio_delta(old, reordered) == {
+        "fields": {"realtime_market_value": ["500", "USD"]},
+        "groups": {
+            "items": {
+                "US": {
+                    "holdings": {"items": {"VWO": {"realtime_market_value": ["300", "USD"]}}, "order": ["VWO", "VOO"]}
+                }
+            }
+        },
+    }
+
+    # 持仓的组成变化时需要完整的结果
+    sold = _portfolio([{"name": "US", "holdings": [_holding("VOO", "200")]}], "200")
+    assert portfolio_delta(old, sold) is None
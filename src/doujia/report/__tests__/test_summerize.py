@@ -1,5 +1,6 @@
 import datetime
 
+import pytest
 from beancount.core.data import Directive
 from beancount.core.inventory import Inventory
 from beancount.core.prices import build_price_map
@@ -262,3 +263,90 @@ def test_amount_affected_by_price_up(
         90,
         "CNY",
     )
+
+
+def test_overlapping_and_cumulative_ranges(entries: list[Directive]):  # type: ignore # 区间重叠, 起点相同或为空时逐个区间计算的结果一致
+    """
+    @@@/main.bean
+    2021-01-01 open Assets:Checking
+    2021-01-01 open Expenses:Groceries
+    2021-01-01 open Expenses:Rent
+
+    2021-01-01 *
+        Expenses:Groceries  100.00 USD
+        Assets:Checking
+
+    2021-01-05 *
+        Expenses:Rent  1000.00 USD
+        Assets:Checking
+
+    2021-01-09 *
+        Expenses:Groceries  -30.00 USD
+        Assets:Checking
+
+    2021-01-15 *
+        Expenses:Groceries  50.00 CNY
+        Assets:Checking
+    """
+    d = datetime.date
+    ranges = [
+        (d(2021, 1, 1), d(2021, 1, 2)),
+        (d(2021, 1, 1), d(2021, 1, 9)),
+        (d(2021, 1, 1), d(2021, 1, 16)),
+        (d(2021, 1, 5), d(2021, 1, 10)),
+        (d(2021, 1, 3), d(2021, 1, 15)),
+        (d(2021, 1, 10), d(2021, 1, 3)),
+        (None, d(2021, 1, 6)),
+        (d(2021, 1, 9), None),
+        (d(2021, 1, 1), d(2021, 1, 9)),
+    ]
+
+    cash_flow_amounts = sum_inventory_between(entries, ["Expenses"], ranges)
+
+    assert [x.inventory for x in cash_flow_amounts] == [
+        _I("100 USD"),
+        _I("1100 USD"),
+        _I("1070 USD, 50 CNY"),
+        _I("970 USD"),
+        _I("970 USD"),
+        _I(""),
+        _I("1100 USD"),
+        _I("-30 USD, 50 CNY"),
+        _I("1100 USD"),
+    ]
+    assert [(x.start_inclusive, x.end_exclusive) for x in cash_flow_amounts] == ranges
+
+
+def test_multiple_ranges_should_match_single_range(entries: list[Directive]):  # type: ignore # 多个区间通过价格矩阵折算, 结果与逐个区间一致
+    """
+    @@@/main.bean
+    2021-01-01 open Assets:Cash
+    2021-01-01 open Assets:Stock
+
+    2021-01-01 price HKD 0.9 CNY
+    2021-01-02 price TENCENT 300 HKD
+    2021-01-03 *
+        Assets:Stock 10 TENCENT {300 HKD}
+        Assets:Cash -3000 HKD
+
+    2021-01-06 price TENCENT 320 HKD
+    2021-01-08 price HKD 0.85 CNY
+    2021-01-09 *
+        Assets:Cash 7 USD
+        Assets:Cash -49 CNY
+    2021-01-10 price USD 7 CNY
+    """
+    d = datetime.date
+    price_map = build_price_map(entries)
+    date_range = [(d(2021, 1, 1), d(2021, 1, x)) for x in [2, 4, 7, 9, 12]]
+
+    amounts = sum_single_amount_between(entries, price_map, ["Assets"], date_range, "CNY")
+
+    assert [x.amount for x in amounts] == [0, 0, 180, 170, 170]
+    assert amounts == [sum_single_amount_between(entries, price_map, ["Assets"], [x], "CNY")[0] for x in date_range]
+
+    # 缺少价格时与逐个区间的结果一样无法折算
+    with pytest.raises(AssertionError):
+        sum_single_amount_between(entries, price_map, ["Assets"], [(d(2021, 1, 1), d(2021, 1, 10))], "CNY")
+    with pytest.raises(AssertionError):
+        sum_single_amount_between(entries, price_map, ["Assets"], [*date_range, (d(2021, 1, 1), d(2021, 1, 10))], "CNY")
@@ -0,0 +1,129 @@
+from datetime import date
+from pathlib import Path
+from typing import TypeVar
+
+import beangrow.returns as returnslib
+import numpy as np
+import pytest
+from beancount.core import data
+
+from doujia.extensions.portfolio_logic import extract_beangrow_config
+from doujia.report.investment import _get_calendar_intervals, _get_cumulative_intervals
+from doujia.report.xirr import ReturnsProblem, compute_returns_batch, solve_xirr
+
+Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
+
+
+def test_solve_xirr():
+    rates = solve_xirr(
+        [np.array([-1000.0, 1100.0]), np.array([-100.0, -100.0, 250.0]), np.array([]), np.array([100.0])],
+        [np.array([-1.0, 0.0]), np.array([-2.0, -1.0, 0.0]), np.array([]), np.array([-1.0])],
+    )
+
+    assert rates[0] == pytest.approx(0.1)
+    assert 100 * (1 + rates[1]) ** 2 + 100 * (1 + rates[1]) == pytest.approx(250)
+    assert rates[2] == 0
+    # 只有流入时没有正的根, 与 fsolve 一样逼近 -100%
+    assert rates[3] == pytest.approx(-1)
+
+
+def test_compute_returns_batch_should_match_beangrow(entries: list[Directive]):
+    """
+    @@@/main.bean
+    2018-01-01 commodity AAPL
+    2018-01-01 commodity TENCENT
+    2018-01-01 open Assets:Stock:Current
+    2018-01-01 open Assets:Stock:AAPL
+    2018-01-01 open Assets:Stock:TENCENT
+    2018-01-01 open Income:Dividends:AAPL
+    2018-01-01 open Income:PnL
+
+    2018-01-01 price HKD      0.13 USD
+    2018-03-01 price AAPL       40 USD
+    2018-03-01 price TENCENT   350 HKD
+
+    2018-03-05 * "Buy AAPL"
+        Assets:Stock:AAPL      100 AAPL {40 USD}
+        Assets:Stock:Current -4,000 USD
+
+    2018-06-12 * "Buy TENCENT"
+        Assets:Stock:TENCENT   100 TENCENT {360 HKD}
+        Assets:Stock:Current  -36,000 HKD
+
+    2019-02-15 price AAPL       42 USD
+    2019-02-18 * "Dividend"
+        Income:Dividends:AAPL  -80 USD
+        Assets:Stock:Current    80 USD
+
+    2019-08-20 * "Buy AAPL"
+        Assets:Stock:AAPL       50 AAPL {52 USD}
+        Assets:Stock:Current -2,600 USD
+
+    2019-12-31 price TENCENT   390 HKD
+
+    2020-02-18 * "Dividend"
+        Income:Dividends:AAPL  -90 USD
+        Assets:Stock:Current    90 USD
+
+    2020-03-20 * "Sell AAPL"
+        Assets:Stock:AAPL      -60 AAPL {40 USD} @ 60 USD
+        Assets:Stock:Current  3,600 USD
+        Income:PnL           -1,200 USD
+
+    2020-11-10 price TENCENT   560 HKD
+    2021-01-05 price AAPL      130 USD
+    2021-03-01 price TENCENT   620 HKD
+
+    @@@/beangrow.pbtxt
+    investments {
+        investment {
+            currency: "AAPL"
+            asset_account: "Assets:Stock:AAPL"
+            cash_accounts: "Assets:Stock:Current"
+            dividend_accounts: "Income:Dividends:AAPL"
+        }
+        investment {
+            currency: "TENCENT"
+            asset_account: "Assets:Stock:TENCENT"
+            cash_accounts: "Assets:Stock:Current"
+        }
+    }
+    groups {
+        group {
+            name: "All"
+            investment: "Assets:*"
+            currency: "USD"
+        }
+        group {
+            name: "AAPL"
+            investment: "Assets:Stock:AAPL"
+            currency: "USD"
+        }
+        group {
+            name: "TENCENT"
+            investment: "Assets:Stock:TENCENT"
+            currency: "HKD"
+        }
+    }
+    """
+    begin_date, end_date = date(2018, 1, 1), date(2021, 3, 15)
+    pricer, groups, account_data_map = extract_beangrow_config(entries, Path("/beangrow.pbtxt"), end_date, dict())
+
+    problems = []
+    for group in groups:
+        adlist = [account_data_map[name] for name in group.investment if name in account_data_map]
+        intervals = _get_calendar_intervals(begin_date, end_date) + _get_cumulative_intervals(begin_date, end_date)
+        for _, date1, date2 in intervals:
+            cash_flows = returnslib.truncate_and_merge_cash_flows(pricer, adlist, date1, date2)
+            problems.append(ReturnsProblem(cash_flows, group.currency, date2))
+
+    results = compute_returns_batch(problems, pricer)
+
+    assert len(results) == len(problems)
+    for problem, result in zip(problems, results, strict=True):
+        expected = returnslib.compute_returns(problem.flows, pricer, problem.target_currency, problem.end_date)
+        assert result.total == pytest.approx(expected.total, abs=1e-7)
+        assert result.exdiv == pytest.approx(expected.exdiv, abs=1e-7)
+        assert result.div == pytest.approx(expected.div, abs=1e-7)
+        assert result[:4] == expected[:4]
+        assert result.flows == expected.flows
@@ -4,46 +4,28 @@ from typing import TypeVar
 
 from beancount.core import data
 from beancount.core.convert import convert_amount
-from beancount.core.inventory import Inventory
 from beancount.core.prices import PriceMap
 
+from doujia.ledger.snapshot import LedgerSnapshot
+
 Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
 DataPoint = tuple[datetime.date, Decimal]
 
 
 def balance_at(
-    entries: list[Directive],
+    entries: list[Directive] | LedgerSnapshot,
     at_date: datetime.date,
     account_prefixes: list[str],
     target_currency: str,
     price_map: PriceMap,
 ) -> Decimal:
     """统计特定账户在 end 日期之前的 balance, 不包括 end_exclude 这一天"""
-    inventory = Inventory()
-
-    for txn in entries:
-        if not isinstance(txn, data.Transaction):
-            continue
-
-        if txn.date >= at_date:
-            continue
-
-        for posting in txn.postings:
-            founds = False
-            for prefix in account_prefixes:
-                if posting.account.startswith(prefix):
-                    founds = True
-                    break
-            if founds:
-                inventory.add_position(posting)
-
-    if len(inventory) == 0:
-        return Decimal(0)
+    units = LedgerSnapshot.of(entries).units_before(account_prefixes, end_exclusive=at_date)
 
     result = Decimal(0)
-    for posting in inventory:
+    for (currency, _), number in units.items():
         amount = convert_amount(
-            posting.units,
+            data.Amount(number, currency),
             target_currency,
             price_map,
             date=at_date,
@@ -0,0 +1,79 @@
+import copy
+from bisect import bisect_left
+from collections.abc import Iterable
+from datetime import date
+
+import beangrow.returns as returnslib
+from beancount.core.inventory import Inventory
+from beancount.core.position import Position
+from beangrow.investments import AccountData, CashFlow, Cat, compute_balance_at
+
+
+class CashFlowStore:
+    """
+    一组 AccountData 的现金流索引, cash_flows 的结果与 returnslib.truncate_and_merge_cash_flows 一致
+    现金流按日期排序, 截取区间只需要 bisect; 构建时记录每个区间边界之前的持仓, 市值在第一次用到时计算并缓存
+    """
+
+    def __init__(
+        self,
+        pricer: returnslib.Pricer,
+        account_datas: list[AccountData],
+        boundaries: Iterable[date] = (),
+    ):
+        self.pricer = pricer
+        self.account_datas = account_datas
+        self._dates = [[flow.date for flow in ad.cash_flows] for ad in account_datas]
+        # (账户序号, 日期) -> 该日期之前的持仓
+        self._balances: dict[tuple[int, date], Inventory] = {}
+        # (账户序号, 日期) -> 持仓在该日期的市值, 没有持仓时为 None
+        self._values: dict[tuple[int, date], Position | None] = {}
+
+        dates = sorted(set(boundaries))
+        for i, ad in enumerate(account_datas):
+            balance = Inventory()
+            transactions = ad.transactions
+            index = 0
+            for boundary in dates:
+                while index < len(transactions) and transactions[index].date < boundary:
+                    for posting in transactions[index].postings:
+                        if posting.meta["category"] is Cat.ASSET:
+                            balance.add_position(posting)
+                    index += 1
+                self._balances[(i, boundary)] = copy.copy(balance)
+
+    def _value(self, index: int, at: date) -> Position | None:
+        key = (index, at)
+        if key in self._values:
+            return self._values[key]
+
+        balance = self._balances.get(key)
+        if balance is None:
+            balance = compute_balance_at(self.account_datas[index].transactions, at)
+
+        value = None
+        if not balance.is_empty():
+            value = balance.reduce(self.pricer.get_value, at).get_only_position()
+        self._values[key] = value
+        return value
+
+    def cash_flows(self, date_start: date | None, date_end: date | None) -> list[CashFlow]:
+        """[date_start, date_end) 之间的现金流, 期初持仓作为流入, 期末持仓作为流出"""
+        cash_flows: list[CashFlow] = []
+        for i, ad in enumerate(self.account_datas):
+            if date_start is not None:
+                value = self._value(i, date_start)
+                if value:
+                    cash_flows.append(CashFlow(date_start, -value.units, False, "open", ad.account))
+
+            lo = 0 if date_start is None else bisect_left(self._dates[i], date_start)
+            hi = len(self._dates[i]) if date_end is None else bisect_left(self._dates[i], date_end)
+            cash_flows.extend(ad.cash_flows[lo:hi])
+
+            if date_end is not None:
+                value = self._value(i, date_end)
+                if value:
+                    cash_flows.append(CashFlow(date_end, value.units, False, "close", ad.account))
+
+        cash_flows.sort(key=lambda item: item[0])
+        return cash_flows
@@ -1,10 +1,11 @@
-from datetime import date
+from datetime import date, timedelta
 from decimal import Decimal
 from typing import TypeVar
 
 from beancount.core import data
 from beancount.core.inventory import Inventory
 
+from doujia.ledger.snapshot import LedgerSnapshot
 from doujia.price.price_map import get_last_and_realtime_price_map
 from doujia.report.util import balance_at
 
@@ -13,21 +14,18 @@ Transaction = TypeVar("Transaction", bound=data.Transaction)  # type: ignore
 
 
 def _filter_transactions(
-    entries: list[Directive],
+    snapshot: LedgerSnapshot,
     account_prefix: str,
     begin_date: date,
     end_date: date,
 ) -> list[Transaction]:
     """筛选指定时间范围内的相关账户交易"""
     transactions = []
-    for entry in entries:
-        if isinstance(entry, data.Transaction):
-            if entry.date < begin_date or entry.date > end_date:
-                continue
-            for posting in entry.postings:
-                if posting.account.startswith(account_prefix):
-                    transactions.append(entry)
-                    break
+    last_index = None
+    for ref in snapshot.postings([account_prefix], begin_date, end_date + timedelta(days=1)):
+        if ref.index != last_index:
+            transactions.append(ref.transaction)
+            last_index = ref.index
     return transactions
 
 
@@ -83,7 +81,7 @@ def _generate_balance_timeline(
 
 
 def gen_cumulative_balances(
-    entries: list[Directive],
+    entries: list[Directive] | LedgerSnapshot,
     account_prefix: str,
     begin_date: date,
     end_date_inclusive: date | None = None,
@@ -92,8 +90,9 @@ def gen_cumulative_balances(
     if end_date_inclusive is None:
         end_date_inclusive = date.today()
 
-    transactions = _filter_transactions(entries, account_prefix, begin_date, end_date_inclusive)
-    _, price_map = get_last_and_realtime_price_map(entries)
+    snapshot = LedgerSnapshot.of(entries)
+    transactions = _filter_transactions(snapshot, account_prefix, begin_date, end_date_inclusive)
+    _, price_map = get_last_and_realtime_price_map(snapshot.entries)
     inventory = Inventory()
 
     return _generate_balance_timeline(
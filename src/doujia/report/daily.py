@@ -6,9 +6,9 @@ from typing import NamedTuple
 
 from beancount.core import getters
 from beancount.core.data import Directive
-from beancount.loader import load_file
 from logzero import logger
 
+from doujia.ledger.cache import load_file
 from doujia.price.price_map import get_last_and_realtime_price_map
 from doujia.report.pushover import Pushover
 from doujia.report.summerize import calc_xirr, sum_single_amount_between
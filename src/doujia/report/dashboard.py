@@ -0,0 +1,62 @@
+import copy
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+
+from beancount.core.inventory import Inventory
+from beancount.core.prices import PriceMap
+from beangrow.investments import AccountData
+
+from doujia.portfolio.processor import CompositeProcessor
+from doujia.report.nav_vector import begin_vector_nav_memo, finalize_vector_nav, vector_nav_processor
+from doujia.report.pnl import PnL, finalize_pnl, new_pnl_memo, pnl_processor
+from doujia.report.util import inventory_processor, prepare_inventory_and_transactions
+
+dashboard_processor = CompositeProcessor()
+dashboard_processor.register("nav", vector_nav_processor)
+dashboard_processor.register("pnl", pnl_processor)
+dashboard_processor.register("holdings", inventory_processor)
+
+
+@dataclass
+class Dashboard:
+    nav: list[tuple[date, Decimal]]
+    pnl: PnL
+    holdings: Inventory
+
+
+def gen_dashboard_data(
+    account_datas: list[AccountData],
+    price_map: PriceMap,
+    target_currency: str,
+    fill_gap_days: bool = True,
+    begin_date: date | None = None,
+    end_date: date | None = None,
+) -> Dashboard:
+    """
+    遍历一次交易同时得到 nav, pnl 与期末持仓, 分别与 gen_nav_index_data_vectorized / gen_pnl_data 的结果一致
+    nav 把交易隐含的价格写入自己的 overlay, 不会影响 pnl 使用的 price_map
+    """
+    if end_date is None:
+        end_date = date.today()
+
+    inventory, transactions = prepare_inventory_and_transactions(account_datas, begin_date)
+
+    result = dashboard_processor.reduce_transactions(
+        {
+            "nav": begin_vector_nav_memo(
+                price_map,
+                target_currency,
+                copy.copy(inventory),
+                transactions,
+                begin_date,
+                end_date,
+                fill_gap_days,
+            ),
+            "pnl": new_pnl_memo(copy.copy(inventory), price_map, target_currency, end_date),
+            "holdings": inventory,
+        },
+        transactions,
+        finalize={"nav": finalize_vector_nav, "pnl": finalize_pnl},
+    )
+    return Dashboard(nav=result["nav"], pnl=result["pnl"], holdings=result["holdings"])
@@ -0,0 +1,139 @@
+import datetime
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, NamedTuple, TypeVar
+
+import beangrow.config as configlib
+from beancount.core import data, getters
+from beangrow import investments
+from beangrow.config_pb2 import Config
+
+from doujia.ledger.snapshot import LedgerSnapshot
+
+Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
+AccountDataMap = dict[investments.Account, investments.AccountData]
+
+
+class BeangrowExtraction(NamedTuple):
+    config: Config  # type: ignore
+    account_data_map: AccountDataMap
+
+
+class _FullExtraction(NamedTuple):
+    config: Config  # type: ignore
+    account_data_map: AccountDataMap
+    # investments.extract 只在 end_date 早于最后一条 entry 时截断
+    last_date: datetime.date
+
+
+def _file_hash(config_path: Path | str) -> str:
+    with open(config_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def truncate_account_data(account_data: investments.AccountData, end_date: datetime.date):
+    """
+    返回只包含 end_date 之前交易的 AccountData, 与 investments.extract 传入 end_date 的结果一致
+    end_date 之前没有交易时返回 None
+    """
+    transactions = [x for x in account_data.transactions if x.date < end_date]
+    if not transactions:
+        return None
+    if len(transactions) == len(account_data.transactions):
+        return account_data
+
+    cash_flows = [x for x in account_data.cash_flows if x.date < end_date]
+    cost_currencies = {x.amount.currency for x in cash_flows}
+    if cost_currencies == {x.amount.currency for x in account_data.cash_flows}:
+        cost_currency = account_data.cost_currency
+    else:
+        cost_currency = cost_currencies.pop() if cost_currencies else None
+
+    seen_accounts = {posting.account for entry in transactions for posting in entry.postings}
+    close = account_data.close if account_data.close is not None and account_data.close.date < end_date else None
+
+    return account_data._replace(
+        cost_currency=cost_currency,
+        close=close,
+        cash_flows=cash_flows,
+        transactions=transactions,
+        balance=investments.compute_balance_at(transactions),
+        catmap={k: v for k, v in account_data.catmap.items() if k in seen_accounts},
+    )
+
+
+class BeangrowExtractor:
+    """
+    共享的 beangrow 提取结果
+    每个 (账本, 配置文件内容) 只对全部 entries 执行一次 investments.extract,
+    不同的 end_date 通过截断完整结果得到, 账本变化后所有结果失效
+    """
+
+    def __init__(self, max_truncated: int = 32):
+        self._max_truncated = max_truncated
+        self._snapshot: LedgerSnapshot | None = None
+        self._full: dict[str, _FullExtraction] = {}
+        self._truncated: OrderedDict[tuple[str, datetime.date], AccountDataMap] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def extract(
+        self,
+        entries: list[Directive] | LedgerSnapshot,  # type: ignore
+        dcontext: Any,
+        config_path: Path | str,
+        end_date: datetime.date,
+    ) -> BeangrowExtraction:
+        """与 read_config + investments.extract(entries, dcontext, config, end_date, False, "") 结果一致"""
+        snapshot = LedgerSnapshot.of(entries)
+        config_hash = _file_hash(config_path)
+
+        with self._lock:
+            if snapshot is not self._snapshot:
+                self._snapshot = snapshot
+                self._full.clear()
+                self._truncated.clear()
+
+            full = self._full.get(config_hash)
+            if full is None:
+                full = self._extract_full(snapshot, dcontext, config_path)
+                self._full[config_hash] = full
+
+            if end_date >= full.last_date:
+                return BeangrowExtraction(full.config, full.account_data_map)
+
+            key = (config_hash, end_date)
+            account_data_map = self._truncated.get(key)
+            if account_data_map is None:
+                account_data_map = {}
+                for account, account_data in full.account_data_map.items():
+                    truncated = truncate_account_data(account_data, end_date)
+                    if truncated is not None:
+                        account_data_map[account] = truncated
+
+                self._truncated[key] = account_data_map
+                if len(self._truncated) > self._max_truncated:
+                    self._truncated.popitem(last=False)
+            else:
+                self._truncated.move_to_end(key)
+
+            return BeangrowExtraction(full.config, account_data_map)
+
+    def _extract_full(self, snapshot: LedgerSnapshot, dcontext: Any, config_path: Path | str) -> _FullExtraction:
+        entries = snapshot.entries
+        accounts = getters.get_accounts(entries)
+        config = configlib.read_config(str(config_path), [], accounts)
+
+        account_data_map = investments.extract(entries, dcontext, config, datetime.date.max, False, "")
+        return _FullExtraction(config, account_data_map, entries[-1].date if entries else datetime.date.min)
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = None
+            self._full.clear()
+            self._truncated.clear()
+
+
+# 全局单例
+beangrow_extractor = BeangrowExtractor()
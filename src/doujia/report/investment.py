@@ -1,50 +1,37 @@
 from dataclasses import dataclass
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 from pathlib import Path
 
-import beangrow.config as configlib
 import beangrow.returns as returnslib
 import yaml
-from beancount.core import getters
-from beancount.core.data import Directive, Transaction
+from beancount.core.data import Directive
 from beancount.core.inventory import Inventory
 from beangrow import investments
-from beangrow.config_pb2 import Config
 from beangrow.investments import CashFlow
-from beangrow.reports import compute_returns_table
+from beangrow.reports import Table
 from matplotlib.dates import relativedelta
 
+from doujia.ledger.snapshot import LedgerSnapshot
+from doujia.report.cash_flow import CashFlowStore
+from doujia.report.extraction import beangrow_extractor
 from doujia.report.nav import gen_nav_index_data
 from doujia.report.portfolio.data import (
     InvestmentHolding,
 )
-
-
-def _extract_beangrow_config(
-    entries: list[Directive],  # type: ignore
-    beangrow_config_path: Path,
-) -> Config:  # type: ignore
-    accounts = getters.get_accounts(entries)
-    return configlib.read_config(str(beangrow_config_path), [], accounts)
+from doujia.report.xirr import ReturnsProblem, compute_returns, compute_returns_batch
 
 
 def get_investment_holdings(
-    entries: list[Directive],  # type: ignore
+    entries: list[Directive] | LedgerSnapshot,  # type: ignore
     beangrow_config_path: Path,
     investment_config_path: Path,
     options_map: dict,
     end_date: datetime.date,
 ) -> list[InvestmentHolding]:
-    beangrow_config: Config = _extract_beangrow_config(entries, beangrow_config_path)  # type: ignore
-
-    account_data_map = investments.extract(
-        entries,
-        options_map["dcontext"],
-        beangrow_config,
-        end_date,
-        False,
-        "",
+    snapshot = LedgerSnapshot.of(entries)
+    beangrow_config, account_data_map = beangrow_extractor.extract(
+        snapshot, options_map["dcontext"], beangrow_config_path, end_date
     )
 
     with open(investment_config_path, encoding="utf-8") as f:
@@ -80,15 +67,8 @@ def get_investment_holdings(
         cash_config = investment_config["cash"]
         inventory = Inventory()
         for account_name in cash_config["account"]:
-            for entry in entries:
-                if not isinstance(entry, Transaction):
-                    continue
-                if entry.date > end_date:
-                    continue
-
-                for posting in entry.postings:
-                    if posting.account == account_name:
-                        inventory.add_position(posting)
+            for ref in snapshot.account_postings(account_name, end_exclusive=end_date + timedelta(days=1)):
+                inventory.add_position(ref.posting)
 
         for group in results:
             if group.name == cash_config["group"]:
@@ -201,6 +181,18 @@ def _get_cumulative_intervals(begin_date: date, end_date: date) -> list[tuple[st
     return result
 
 
+def _interval_returns(
+    pricer: returnslib.Pricer,
+    target_currency: str,
+    account_data: list[investments.AccountData],
+    intervals: list[tuple[str, date, date]],
+) -> list[returnslib.Returns]:
+    """所有区间共用一个 CashFlowStore, IRR 在一次 compute_returns_batch 中求解"""
+    store = CashFlowStore(pricer, account_data, [x for _, date1, date2 in intervals for x in (date1, date2)])
+    problems = [ReturnsProblem(store.cash_flows(date1, date2), target_currency, date2) for _, date1, date2 in intervals]
+    return compute_returns_batch(problems, pricer)
+
+
 def _compute_returns_series(
     pricer: returnslib.Pricer,
     target_currency: str,
@@ -209,10 +201,10 @@ def _compute_returns_series(
 ) -> list[list[tuple[date, float]]]:
     series = [[], [], [], []]
 
+    interval_returns = _interval_returns(pricer, target_currency, account_data, intervals)
+
     found = False
-    for _, date1, date2 in intervals:
-        cash_flows = returnslib.truncate_and_merge_cash_flows(pricer, account_data, date1, date2)
-        returns = returnslib.compute_returns(cash_flows, pricer, target_currency, date2)
+    for (_, _, date2), returns in zip(intervals, interval_returns, strict=True):
         if returns.total != 0:
             found = True
 
@@ -253,16 +245,20 @@ def cumulative_returns(
         target_currency=target_currency,
     )
 
-    table = compute_returns_table(
-        pricer,
-        target_currency,
-        account_data,
-        _get_cumulative_intervals(start_date, end_date),
+    # 与 beangrow.reports.compute_returns_table 的结构一致
+    intervals = _get_cumulative_intervals(start_date, end_date)
+    returns = _interval_returns(pricer, target_currency, account_data, intervals)
+    table = Table(
+        ["Return"] + [name for name, _, _ in intervals],
+        [
+            ["Total"] + [x.total for x in returns],
+            ["Ex-div"] + [x.exdiv for x in returns],
+            ["Div"] + [x.div for x in returns],
+        ],
     )
 
     table.rows.append(["Nav"])
 
-    intervals = _get_cumulative_intervals(start_date, end_date)
     for _, date1, date2 in intervals:
         begin_nav_index = None
         end_nav_index = None
@@ -301,7 +297,7 @@ def irr_summary(
 ) -> IrrSummary:
     cash_flows = returnslib.truncate_and_merge_cash_flows(pricer, adlist, start_date, end_date)
 
-    returns = returnslib.compute_returns(cash_flows, pricer, target_currency, end_date)
+    returns = compute_returns(cash_flows, pricer, target_currency, end_date)
 
     return IrrSummary(
         target_currency=target_currency,
@@ -11,7 +11,7 @@ from beangrow.investments import AccountData, Cat
 from logzero import logger
 
 from doujia.portfolio.processor import TransactionProcessor
-from doujia.report.util import balance_at, prepare_inventory_and_transactions
+from doujia.report.util import balance_at, balance_between, prepare_inventory_and_transactions
 
 Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
 Transaction = TypeVar("Transaction", bound=data.Transaction)  # type: ignore
@@ -38,25 +38,20 @@ class NavMemo:
     fill_gap_days: bool
 
 
-def _finalize_nav(memo: NavMemo) -> list[tuple[date, Decimal]]:
+def finalize_nav(memo: NavMemo) -> list[tuple[date, Decimal]]:
     close_inventory(memo, close_date=memo.end_date)
 
     return [(d, nav.index) for d, nav in sorted(memo.history.items())]
 
 
-def gen_nav_index_data(
-    account_datas: list[AccountData],
+def new_nav_memo(
+    inventory: Inventory,
     price_map: PriceMap,
     target_currency: str,
-    fill_gap_days: bool = True,
-    begin_date: date | None = None,
-    end_date: date | None = None,
-):
-    if end_date is None:
-        end_date = date.today()
-
-    inventory, transactions = prepare_inventory_and_transactions(account_datas, begin_date)
-
+    fill_gap_days: bool,
+    begin_date: date | None,
+    end_date: date,
+) -> NavMemo:
     begin_units = Decimal(0)
     for postion in inventory:
         amount = convert_amount(
@@ -73,29 +68,47 @@ def gen_nav_index_data(
     if begin_units > 0:
         history[begin_date] = Nav(index=Decimal(1), units=begin_units)
 
+    return NavMemo(
+        price_map=price_map,
+        target_currency=target_currency,
+        inventory=inventory,
+        units=begin_units,
+        index=Decimal(1),
+        history=history,
+        fill_gap_days=fill_gap_days,
+        last_date=begin_date,
+        end_date=end_date,
+    )
+
+
+def gen_nav_index_data(
+    account_datas: list[AccountData],
+    price_map: PriceMap,
+    target_currency: str,
+    fill_gap_days: bool = True,
+    begin_date: date | None = None,
+    end_date: date | None = None,
+):
+    if end_date is None:
+        end_date = date.today()
+
+    inventory, transactions = prepare_inventory_and_transactions(account_datas, begin_date)
+
     return nav_processor.reduce_transactions(
-        NavMemo(
-            price_map=price_map,
-            target_currency=target_currency,
-            inventory=inventory,
-            units=begin_units,
-            index=Decimal(1),
-            history=history,
-            fill_gap_days=fill_gap_days,
-            last_date=begin_date,
-            end_date=end_date,
-        ),
+        new_nav_memo(inventory, price_map, target_currency, fill_gap_days, begin_date, end_date),
         transactions,
-        finalize=_finalize_nav,
+        finalize=finalize_nav,
     )
 
 
 def update_price(price_map: PriceMap, currency_pair: tuple[str, str], new_price: Decimal, date: date):
-    prices = price_map.get(currency_pair, [])
+    # 复制后再修改, price_map 中的列表可能与其它请求共享
+    prices = list(price_map.get(currency_pair, []))
     insert_idx = 0
     for idx, (price_date, _) in enumerate(prices):
         if price_date == date:
             prices[idx] = (date, new_price)
+            price_map[currency_pair] = prices
             return
         if price_date < date:
             insert_idx = idx + 1
@@ -106,7 +119,8 @@ def update_price(price_map: PriceMap, currency_pair: tuple[str, str], new_price:
     price_map[currency_pair] = prices
 
 
-def update_price_from_transaction(price_map: PriceMap, transaction: Transaction):
+def transaction_implied_price(transaction: Transaction) -> tuple[tuple[str, str], Decimal] | None:
+    """根据交易中资产与现金的数量计算成交价, 数量过小时返回 None"""
     inventory = Inventory()
     asset_currency = None
     cash_currency = None
@@ -121,7 +135,7 @@ def update_price_from_transaction(price_map: PriceMap, transaction: Transaction)
     total_assets = inventory.get_currency_units(asset_currency)
     total_cash = inventory.get_currency_units(cash_currency)
     if abs(total_assets.number) < 0.01 or abs(total_cash.number) < 0.01:
-        return
+        return None
 
     price = Decimal(0) - total_cash.number / total_assets.number
     logger.debug(
@@ -131,6 +145,15 @@ def update_price_from_transaction(price_map: PriceMap, transaction: Transaction)
 price: {price}
 """
     )
+    return (asset_currency, cash_currency), price
+
+
+def update_price_from_transaction(price_map: PriceMap, transaction: Transaction):
+    implied_price = transaction_implied_price(transaction)
+    if implied_price is None:
+        return
+
+    (asset_currency, cash_currency), price = implied_price
     update_price(price_map, (asset_currency, cash_currency), price, transaction.date)
     update_price(
         price_map,
@@ -163,20 +186,21 @@ def fill_gap_days(memo: NavMemo, up_to_date_exclude: date):
     if memo.last_date is None or memo.last_date >= up_to_date_exclude:
         return memo
 
-    last_date = memo.last_date
-    while last_date < up_to_date_exclude:
-        logger.debug(f"fill_gap_days: {last_date}")
-        last_date += timedelta(days=1)
-        pre_units = memo.units
-        if abs(pre_units) < 0.01:  # 已经清仓的情况
-            memo.last_date = last_date
-            continue
+    first_date = memo.last_date + timedelta(days=1)
+    logger.debug(f"fill_gap_days: {first_date} ~ {up_to_date_exclude}")
 
-        pre_balance = balance_at(memo.inventory, memo.price_map, memo.target_currency, last_date)
-        post_index = pre_balance.number / pre_units
+    pre_units = memo.units
+    if abs(pre_units) < 0.01:  # 已经清仓的情况
+        memo.last_date = up_to_date_exclude
+        return
+
+    # 区间内没有交易, inventory 与 units 都不变, 一次性计算所有日期的 balance
+    balances = balance_between(memo.inventory, memo.price_map, memo.target_currency, first_date, up_to_date_exclude)
+    for offset, balance in enumerate(balances):
+        post_index = balance / pre_units
         memo.index = post_index
-        memo.history[last_date] = Nav(index=post_index, units=pre_units)
-        memo.last_date = last_date
+        memo.history[first_date + timedelta(days=offset)] = Nav(index=post_index, units=pre_units)
+    memo.last_date = up_to_date_exclude
 
 
 def reduce_asset_transaction(memo: NavMemo, transaction: Transaction) -> NavMemo:
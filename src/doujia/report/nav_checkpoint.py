@@ -0,0 +1,169 @@
+import copy
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import date
+from decimal import Decimal
+from typing import Any, NamedTuple, TypeVar
+
+from beancount.core import data
+from beancount.core.inventory import Inventory
+from beancount.core.prices import PriceMap
+from beangrow.investments import AccountData
+
+from doujia.report.nav_vector import (
+    BALANCE_VIA,
+    CASH_VIA,
+    begin_units,
+    finalize_vector_nav,
+    flush_gaps,
+    new_vector_nav_memo,
+    vector_nav_processor,
+)
+from doujia.report.util import prepare_inventory_and_transactions
+
+Transaction = TypeVar("Transaction", bound=data.Transaction)  # type: ignore
+
+
+class _Checkpoint(NamedTuple):
+    # 已处理交易中与 nav 计算相关的内容
+    transaction_keys: list[tuple]
+    # last_date 及之前与这些交易相关的价格
+    price_key: int
+    inventory: Inventory
+    units: float
+    index: float
+    last_date: date
+    history: dict[date, float]
+
+
+def _transaction_key(transaction: Transaction) -> tuple:
+    return (
+        transaction.date,
+        transaction.meta["signature"],
+        tuple((x.account, x.units, x.cost, x.price, x.meta["category"]) for x in transaction.postings),
+    )
+
+
+def _price_key(price_map: PriceMap, currencies: set[str], until: date) -> int:
+    """currencies 之间在 until 及之前的价格, 价格变化后 checkpoint 中补齐的 history 不再可信"""
+    prices = []
+    for (base, quote), pair_prices in price_map.items():
+        if base in currencies and quote in currencies:
+            index = bisect_right(pair_prices, until, key=lambda x: x[0])
+            prices.append(((base, quote), tuple(pair_prices[:index])))
+    return hash(tuple(sorted(prices, key=lambda x: x[0])))
+
+
+class NavCheckpoints:
+    """
+    保存每个投资组合 nav 计算的中间状态 (finalize 之前的 memo 与 history)
+    新的请求从 checkpoint 继续, 只处理之后新增的交易与日期;
+    checkpoint 之前的交易或价格变化时才从头计算
+    """
+
+    def __init__(self, max_checkpoints: int = 64):
+        self._max_checkpoints = max_checkpoints
+        self._checkpoints: OrderedDict[Any, _Checkpoint] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def gen_nav_index_data(
+        self,
+        account_datas: list[AccountData],
+        price_map: PriceMap,
+        target_currency: str,
+        fill_gap_days: bool = True,
+        begin_date: date | None = None,
+        end_date: date | None = None,
+    ) -> list[tuple[date, Decimal]]:
+        """与 nav_vector.gen_nav_index_data_vectorized 结果一致"""
+        if end_date is None:
+            end_date = date.today()
+
+        inventory, transactions = prepare_inventory_and_transactions(account_datas, begin_date)
+        transaction_keys = [_transaction_key(x) for x in transactions]
+
+        currencies = {target_currency, *BALANCE_VIA, *CASH_VIA}
+        currencies.update(x.units.currency for x in inventory)
+        currencies.update(x.units.currency for transaction in transactions for x in transaction.postings)
+
+        key = (tuple(x.account for x in account_datas), target_currency, fill_gap_days, begin_date)
+        with self._lock:
+            checkpoint = self._checkpoints.get(key)
+            if checkpoint is not None:
+                self._checkpoints.move_to_end(key)
+
+        processed = 0
+        if checkpoint is not None and self._is_valid(checkpoint, transaction_keys, price_map, currencies, end_date):
+            processed = len(checkpoint.transaction_keys)
+            memo = new_vector_nav_memo(
+                price_map,
+                target_currency,
+                copy.copy(checkpoint.inventory),
+                transactions,
+                processed=processed,
+                units=checkpoint.units,
+                index=checkpoint.index,
+                last_date=checkpoint.last_date,
+                history=dict(checkpoint.history),
+                end_date=end_date,
+                fill_gap_days=fill_gap_days,
+            )
+        else:
+            units = begin_units(inventory, price_map, target_currency, begin_date)
+            memo = new_vector_nav_memo(
+                price_map,
+                target_currency,
+                inventory,
+                transactions,
+                processed=0,
+                units=float(units),
+                index=1.0,
+                last_date=begin_date,
+                history={begin_date: 1.0} if units > 0 else {},
+                end_date=end_date,
+                fill_gap_days=fill_gap_days,
+            )
+
+        memo = vector_nav_processor.reduce_transactions(memo, transactions[processed:])
+
+        if memo.last_date is not None and memo.last_date <= end_date:
+            flush_gaps(memo)
+            checkpoint = _Checkpoint(
+                transaction_keys=transaction_keys,
+                price_key=_price_key(price_map, currencies, memo.last_date),
+                inventory=copy.copy(memo.inventory),
+                units=memo.units,
+                index=memo.index,
+                last_date=memo.last_date,
+                history=dict(memo.history),
+            )
+            with self._lock:
+                self._checkpoints[key] = checkpoint
+                self._checkpoints.move_to_end(key)
+                if len(self._checkpoints) > self._max_checkpoints:
+                    self._checkpoints.popitem(last=False)
+
+        return finalize_vector_nav(memo)
+
+    @staticmethod
+    def _is_valid(
+        checkpoint: _Checkpoint,
+        transaction_keys: list[tuple],
+        price_map: PriceMap,
+        currencies: set[str],
+        end_date: date,
+    ) -> bool:
+        count = len(checkpoint.transaction_keys)
+        if checkpoint.last_date > end_date or transaction_keys[:count] != checkpoint.transaction_keys:
+            return False
+
+        return _price_key(price_map, currencies, checkpoint.last_date) == checkpoint.price_key
+
+    def clear(self):
+        with self._lock:
+            self._checkpoints.clear()
+
+
+# 全局单例
+nav_checkpoints = NavCheckpoints()
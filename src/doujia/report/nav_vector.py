@@ -0,0 +1,366 @@
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal
+from typing import TypeVar
+
+import numpy as np
+from beancount.core import data
+from beancount.core.convert import convert_amount
+from beancount.core.inventory import Inventory
+from beancount.core.number import ONE, ZERO
+from beancount.core.prices import PriceMap
+from beangrow.investments import AccountData, Cat
+
+from doujia.portfolio.processor import TransactionProcessor
+from doujia.price.matrix import DailyPriceMatrix
+from doujia.price.price_map import OverlayPriceMap
+from doujia.report.nav import (
+    sum_cash_from_transaction,
+    transaction_implied_price,
+    update_inventory_from_transaction,
+)
+from doujia.report.util import prepare_inventory_and_transactions
+
+Transaction = TypeVar("Transaction", bound=data.Transaction)  # type: ignore
+
+# 与 nav.balance_at / nav 中现金折算使用的中转货币保持一致
+BALANCE_VIA = ["HKD", "CNY", "USD"]
+CASH_VIA = ["USD", "HKD", "CNY"]
+
+vector_nav_processor = TransactionProcessor()
+
+
+@dataclass
+class _Gap:
+    """[first_day, last_day] 之间没有交易, 持仓与 units 不变"""
+
+    first_day: int
+    last_day: int
+    units: float
+    holdings: np.ndarray
+
+
+@dataclass
+class VectorNavMemo:
+    # 包含全部交易隐含价格, 只用于计算补齐日期的 balance
+    matrix: DailyPriceMatrix
+    # 按交易顺序写入隐含价格, 用于交易当天的折算, 与 nav 中的 memo.price_map 一致
+    price_map: OverlayPriceMap
+    target_currency: str
+    inventory: Inventory
+    units: float
+    index: float
+    end_date: date
+    last_date: date | None
+    fill_gap_days: bool
+    history: dict[date, float] = field(default_factory=dict)
+    gaps: list[_Gap] = field(default_factory=list)
+
+    def day(self, at_date: date) -> int:
+        return self.matrix.day_index(at_date)
+
+    def balance(self, at_date: date) -> float:
+        # 同一货币的多个 lot 先合并数量, 每种货币只折算一次
+        units: dict[str, Decimal] = {}
+        for position in self.inventory.get_positions():
+            units[position.units.currency] = units.get(position.units.currency, ZERO) + position.units.number
+
+        balance = 0.0
+        for currency, number in units.items():
+            if number != ZERO:
+                balance += float(number) * self.convert(data.Amount(ONE, currency), at_date, via=BALANCE_VIA)
+        return balance
+
+    def convert(self, amount: data.Amount, at_date: date, via: list[str] = CASH_VIA) -> float:
+        converted = convert_amount(amount, self.target_currency, self.price_map, date=at_date, via=via)
+        if converted.currency != self.target_currency:
+            raise ValueError(f"can't convert {amount} to {self.target_currency} at {at_date}")
+        return float(converted.number)
+
+
+def _set_implied_price(price_map: OverlayPriceMap, transaction: Transaction):
+    """与 nav.update_price_from_transaction 一致"""
+    implied_price = transaction_implied_price(transaction)
+    if implied_price is not None:
+        pair, price = implied_price
+        price_map.set_price(pair, transaction.date, price)
+
+
+def fill_gap_days(memo: VectorNavMemo, up_to_date_exclude: date):
+    """与 nav.fill_gap_days 一致, 只记录区间, 每一天的 index 在 finalize 时一次性计算"""
+    if not memo.fill_gap_days:
+        return
+
+    if memo.last_date is None or memo.last_date >= up_to_date_exclude:
+        return
+
+    if abs(memo.units) >= 0.01:
+        memo.gaps.append(
+            _Gap(
+                first_day=memo.day(memo.last_date) + 1,
+                last_day=memo.day(up_to_date_exclude),
+                units=memo.units,
+                holdings=memo.matrix.holdings_of(memo.inventory),
+            )
+        )
+        memo.index = memo.balance(up_to_date_exclude) / memo.units
+
+    memo.last_date = up_to_date_exclude
+
+
+def reduce_asset_transaction(memo: VectorNavMemo, transaction: Transaction) -> VectorNavMemo:
+    fill_gap_days(memo, transaction.date)
+    _set_implied_price(memo.price_map, transaction)
+
+    pre_balance = memo.balance(transaction.date)
+    if abs(memo.units) < 0.01:
+        pre_index = memo.index
+        pre_units = pre_balance / pre_index
+    else:
+        pre_units = memo.units
+        pre_index = pre_balance / pre_units
+
+    amount = memo.convert(sum_cash_from_transaction(transaction), transaction.date)
+    memo.index = pre_index
+    memo.units = pre_units + amount / pre_index
+    memo.history[transaction.date] = memo.index
+    memo.last_date = transaction.date
+
+    update_inventory_from_transaction(memo.inventory, transaction)
+    return memo
+
+
+def reduce_close_saving(memo: VectorNavMemo, transaction: Transaction) -> VectorNavMemo:
+    fill_gap_days(memo, transaction.date)
+
+    pre_balance = memo.balance(transaction.date)
+
+    dividend_inventory = Inventory()
+    cash_inventory = Inventory()
+    for posting in transaction.postings:
+        if posting.meta["category"] == Cat.DIVIDEND:
+            dividend_inventory.add_amount(posting.units)
+        elif posting.meta["category"] == Cat.CASH:
+            cash_inventory.add_amount(posting.units)
+
+    dividend_amount = memo.convert(dividend_inventory.get_only_position().units, transaction.date)
+    cash_amount = memo.convert(cash_inventory.get_only_position().units, transaction.date)
+
+    post_index = (pre_balance - dividend_amount) / memo.units
+    memo.units = memo.units - cash_amount / post_index
+    memo.index = post_index
+    memo.history[transaction.date] = memo.index
+    memo.last_date = transaction.date
+
+    update_inventory_from_transaction(memo.inventory, transaction)
+    return memo
+
+
+def reduce_dividend_transaction(memo: VectorNavMemo, transaction: Transaction) -> VectorNavMemo:
+    fill_gap_days(memo, transaction.date)
+
+    inventory = Inventory()
+    for posting in transaction.postings:
+        if posting.meta["category"] == Cat.CASH:
+            inventory.add_amount(posting.units)
+
+    cash_amount = memo.convert(inventory.get_only_position().units, transaction.date)
+    pre_balance = memo.balance(transaction.date)
+
+    post_index = (pre_balance + cash_amount) / memo.units
+    memo.units = memo.units - cash_amount / post_index
+    memo.index = post_index
+
+    if abs(pre_balance - memo.units * memo.index) >= 0.0001:
+        raise ValueError("Inconsistent balance after dividend adjustment")
+
+    memo.history[transaction.date] = memo.index
+    memo.last_date = transaction.date
+    return memo
+
+
+def flush_gaps(memo: VectorNavMemo):
+    """一次性计算已记录区间内每一天的 index 并写入 history, 交易当天的结果覆盖同一天的补齐结果"""
+    if not memo.gaps:
+        return
+
+    days = np.concatenate([np.arange(x.first_day, x.last_day + 1) for x in memo.gaps])
+    lengths = [x.last_day - x.first_day + 1 for x in memo.gaps]
+    holdings = np.repeat(np.stack([x.holdings for x in memo.gaps], axis=1), lengths, axis=1)
+    units = np.repeat([x.units for x in memo.gaps], lengths)
+
+    held = holdings != 0
+    if (held & ~memo.matrix.known[:, days]).any():
+        raise ValueError(f"can't convert holdings to {memo.target_currency}")
+
+    balances = np.where(held, holdings * memo.matrix.values[:, days], 0.0).sum(axis=0)
+    dates = memo.matrix.dates
+    history = dict(zip([dates[x] for x in days], (balances / units).tolist(), strict=True))
+    history.update(memo.history)
+
+    memo.history = history
+    memo.gaps = []
+
+
+def finalize_vector_nav(memo: VectorNavMemo) -> list[tuple[date, Decimal]]:
+    fill_gap_days(memo, memo.end_date)
+
+    pre_balance = memo.balance(memo.end_date)
+    if abs(pre_balance) >= 0.01:
+        memo.index = pre_balance / memo.units
+    memo.history[memo.end_date] = memo.index
+
+    flush_gaps(memo)
+    return [(d, Decimal(repr(index))) for d, index in sorted(memo.history.items())]
+
+
+def begin_units(inventory: Inventory, price_map: PriceMap, target_currency: str, begin_date: date | None) -> Decimal:
+    units = Decimal(0)
+    for postion in inventory:
+        amount = convert_amount(
+            postion.units,
+            target_currency=target_currency,
+            price_map=price_map,
+            date=begin_date,
+            via=CASH_VIA,
+        )
+        assert amount.currency == target_currency
+        units += amount.number
+    return units
+
+
+def new_vector_nav_memo(
+    price_map: PriceMap,
+    target_currency: str,
+    inventory: Inventory,
+    transactions: list[Transaction],
+    processed: int,
+    units: float,
+    index: float,
+    last_date: date | None,
+    history: dict[date, float],
+    end_date: date,
+    fill_gap_days: bool,
+) -> VectorNavMemo:
+    """
+    inventory / units / index / history 是处理完 transactions[:processed] 之后的状态,
+    价格矩阵只覆盖 last_date 之后的日期, 已处理交易隐含的价格重新写入 overlay
+    """
+    # 补齐的日期不会与交易在同一天, 因此可以预先写入全部交易隐含的价格
+    all_prices = OverlayPriceMap(price_map)
+    processed_prices = OverlayPriceMap(price_map)
+    currencies = [x.units.currency for x in inventory]
+    for i, transaction in enumerate(transactions):
+        handler, _ = vector_nav_processor.registry.get(transaction.meta["signature"], (None, None))
+        if handler is reduce_asset_transaction:
+            _set_implied_price(all_prices, transaction)
+            if i < processed:
+                _set_implied_price(processed_prices, transaction)
+        if i >= processed:
+            currencies.extend(x.units.currency for x in transaction.postings if x.meta["category"] == Cat.ASSET)
+
+    pending = transactions[processed:]
+    first_date = min(x for x in [last_date, pending[0].date if pending else None, end_date] if x)
+    matrix_end_date = max(end_date, pending[-1].date) if pending else end_date
+    matrix = DailyPriceMatrix.build(
+        all_prices, currencies, target_currency, first_date, matrix_end_date, via=BALANCE_VIA
+    )
+
+    return VectorNavMemo(
+        matrix=matrix,
+        price_map=processed_prices,
+        target_currency=target_currency,
+        inventory=inventory,
+        units=units,
+        index=index,
+        end_date=end_date,
+        last_date=last_date,
+        fill_gap_days=fill_gap_days,
+        history=history,
+    )
+
+
+def begin_vector_nav_memo(
+    price_map: PriceMap,
+    target_currency: str,
+    inventory: Inventory,
+    transactions: list[Transaction],
+    begin_date: date | None,
+    end_date: date,
+    fill_gap_days: bool,
+) -> VectorNavMemo:
+    """从 begin_date 开始计算的 memo, inventory 是 begin_date 之前的持仓"""
+    units = begin_units(inventory, price_map, target_currency, begin_date)
+    return new_vector_nav_memo(
+        price_map,
+        target_currency,
+        inventory,
+        transactions,
+        processed=0,
+        units=float(units),
+        index=1.0,
+        last_date=begin_date,
+        history={begin_date: 1.0} if units > 0 else {},
+        end_date=end_date,
+        fill_gap_days=fill_gap_days,
+    )
+
+
+def gen_nav_index_data_vectorized(
+    account_datas: list[AccountData],
+    price_map: PriceMap,
+    target_currency: str,
+    fill_gap_days: bool = True,
+    begin_date: date | None = None,
+    end_date: date | None = None,
+) -> list[tuple[date, Decimal]]:
+    """
+    与 nav.gen_nav_index_data 结果一致 (float 精度) 的向量化实现
+    每一天的持仓与价格保存为数组, 补齐的日期在最后一次性计算; 交易隐含的价格写入 overlay, 不会修改 price_map
+    """
+    if end_date is None:
+        end_date = date.today()
+
+    inventory, transactions = prepare_inventory_and_transactions(account_datas, begin_date)
+
+    memo = begin_vector_nav_memo(
+        price_map, target_currency, inventory, transactions, begin_date, end_date, fill_gap_days
+    )
+    return vector_nav_processor.reduce_transactions(memo, transactions, finalize=finalize_vector_nav)
+
+
+vector_nav_processor.register(
+    categories_list=[
+        [Cat.ASSET, Cat.CASH],
+        [Cat.ASSET, Cat.CASH, Cat.EXPENSES],
+        [Cat.ASSET, Cat.CASH, Cat.INCOME],
+        [Cat.ASSET, Cat.CASH, Cat.EXPENSES, Cat.INCOME],
+    ],
+    description="基础的资产买卖交易",
+    func=reduce_asset_transaction,
+)
+
+vector_nav_processor.register(
+    categories_list=[
+        [Cat.ASSET, Cat.CASH, Cat.DIVIDEND],
+    ],
+    description="存款到期",
+    func=reduce_close_saving,
+)
+
+vector_nav_processor.register(
+    categories_list=[
+        [Cat.CASH, Cat.DIVIDEND],
+        [Cat.CASH, Cat.DIVIDEND, Cat.EXPENSES],
+    ],
+    description="除息",
+    func=reduce_dividend_transaction,
+)
+
+vector_nav_processor.register(
+    categories_list=[
+        [Cat.ASSET, Cat.DIVIDEND],
+    ],
+    description="合股",
+    func=lambda memo, _: memo,
+)
@@ -42,7 +42,7 @@ class PnlMemo:
     end_date: date
 
 
-def _finalize_pnl(memo: PnlMemo) -> PnL:
+def finalize_pnl(memo: PnlMemo) -> PnL:
     unrealized_pnl = _get_unrealized_pnl(memo.inventory, memo.price_map, memo.target_currency, memo.end_date)
 
     return PnL(
@@ -55,6 +55,19 @@ def _finalize_pnl(memo: PnlMemo) -> PnL:
     )
 
 
+def new_pnl_memo(inventory: Inventory, price_map: PriceMap, target_currency: str, end_date: date) -> PnlMemo:
+    return PnlMemo(
+        price_map=price_map,
+        target_currency=target_currency,
+        inventory=inventory,
+        realized_pnl=Decimal("0"),
+        fee=Decimal("0"),
+        dividend=Decimal("0"),
+        dividend_tax=Decimal("0"),
+        end_date=end_date,
+    )
+
+
 def gen_pnl_data(
     account_datas: list[AccountData],
     price_map: PriceMap,
@@ -68,18 +81,9 @@ def gen_pnl_data(
     inventory, transactions = prepare_inventory_and_transactions(account_datas, begin_date)
 
     return pnl_processor.reduce_transactions(
-        PnlMemo(
-            price_map=price_map,
-            target_currency=target_currency,
-            inventory=inventory,
-            realized_pnl=Decimal("0"),
-            fee=Decimal("0"),
-            dividend=Decimal("0"),
-            dividend_tax=Decimal("0"),
-            end_date=end_date,
-        ),
+        new_pnl_memo(inventory, price_map, target_currency, end_date),
         transactions,
-        finalize=_finalize_pnl,
+        finalize=finalize_pnl,
     )
 
 
@@ -65,3 +65,11 @@ class InvestmentHolding:
     name: str
     inventory: Inventory
     expected_ratio: float
+
+
+@dataclass
+class GroupPositions:
+    """投资组合组中每个投资标的的总持仓与总成本, 只随账本变化, 价格变化时不需要重新计算"""
+
+    group: InvestmentHolding
+    positions: dict[str, TotalPositionWithCost]
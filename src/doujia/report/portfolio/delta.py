@@ -0,0 +1,57 @@
+def _changed_fields(old: dict, new: dict, nested: str | None) -> dict:
+    return {key: value for key, value in new.items() if key != nested and old.get(key) != value}
+
+
+def _by_name(items: list[dict]) -> dict[str, dict]:
+    return {item["name"]: item for item in items}
+
+
+def _items_delta(old_items: list[dict], new_items: list[dict], nested: str | None) -> dict | None:
+    """按 name 对齐的列表差异, 组成不同时返回 None"""
+    old_by_name, new_by_name = _by_name(old_items), _by_name(new_items)
+    if old_by_name.keys() != new_by_name.keys():
+        return None
+
+    delta: dict = {}
+    changed: dict[str, dict] = {}
+    for name, new in new_by_name.items():
+        old = old_by_name[name]
+        if nested is None:
+            item_delta = _changed_fields(old, new, None)
+        else:
+            item_delta = _portfolio_level_delta(old, new, nested, None)
+            if item_delta is None:
+                return None
+        if item_delta:
+            changed[name] = item_delta
+
+    if changed:
+        delta["items"] = changed
+    # 市值变化后排序可能变化
+    order = [item["name"] for item in new_items]
+    if order != [item["name"] for item in old_items]:
+        delta["order"] = order
+    return delta
+
+
+def _portfolio_level_delta(old: dict, new: dict, nested: str, child_nested: str | None) -> dict | None:
+    items_delta = _items_delta(old[nested], new[nested], child_nested)
+    if items_delta is None:
+        return None
+
+    delta: dict = {}
+    fields = _changed_fields(old, new, nested)
+    if fields:
+        delta["fields"] = fields
+    if items_delta:
+        delta[nested] = items_delta
+    return delta
+
+
+def portfolio_delta(old: dict, new: dict) -> dict | None:
+    """
+    两次 Portfolio 序列化结果之间的差异, 只包含变化的字段, 没有变化时为空 dict
+    组与持仓按 name 对齐, 格式为 {"fields": {...}, "groups": {"items": {name: 组的差异}, "order": [...]}}
+    组的差异中持仓的格式相同, 位于 "holdings" 下; 组或持仓的组成不同时返回 None, 需要发送完整的结果
+    """
+    return _portfolio_level_delta(old, new, "groups", "holdings")
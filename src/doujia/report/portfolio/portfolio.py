@@ -1,6 +1,4 @@
 from collections import defaultdict
-from dataclasses import dataclass
-from decimal import Decimal
 from math import sqrt
 
 from beancount.core.convert import get_cost
@@ -8,7 +6,13 @@ from beancount.core.data import Amount, D, Directive
 from beancount.core.inventory import Inventory
 
 from doujia.price.price_map import get_last_and_realtime_price_map
-from doujia.report.portfolio.data import HoldingGroup, InvestmentHolding, Portfolio
+from doujia.report.portfolio.data import (
+    GroupPositions,
+    HoldingGroup,
+    InvestmentHolding,
+    Portfolio,
+    TotalPositionWithCost,
+)
 from doujia.report.portfolio.holding import create_holding
 from doujia.report.portfolio.stat import fill_stat_fields
 
@@ -17,9 +21,21 @@ def calc_portfolio_ratio_report(
     entries: list[Directive],  # type: ignore
     investment_groups: list[InvestmentHolding],
     target_currency: str,
+) -> list[HoldingGroup]:
+    return _value_portfolio_groups(entries, group_positions(investment_groups), target_currency)
+
+
+def group_positions(investment_groups: list[InvestmentHolding]) -> list[GroupPositions]:
+    return [GroupPositions(group, _group_position_by_commodity(group.inventory)) for group in investment_groups]
+
+
+def _value_portfolio_groups(
+    entries: list[Directive],  # type: ignore
+    positions: list[GroupPositions],
+    target_currency: str,
 ) -> list[HoldingGroup]:
     last_price_map, realtime_price_map = get_last_and_realtime_price_map(entries)
-    portofolio_groups = _create_portfolio_groups(investment_groups, last_price_map, realtime_price_map, target_currency)
+    portofolio_groups = _create_portfolio_groups(positions, last_price_map, realtime_price_map, target_currency)
     fill_stat_fields(portofolio_groups, target_currency)
 
     portofolio_groups.sort(
@@ -32,17 +48,17 @@ def calc_portfolio_ratio_report(
 
 
 def _create_portfolio_groups(
-    investment_groups: list[InvestmentHolding],
+    positions: list[GroupPositions],
     last_price_map,
     realtime_price_map,
     target_currency: str,
 ):
     portofolio_groups = []
-    for group in investment_groups:
-        portofolio_group = _create_portfolio_group(group, target_currency)
+    for group_position in positions:
+        portofolio_group = _create_portfolio_group(group_position.group, target_currency)
         _add_portfolios_to_group(
             portofolio_group,
-            group.inventory,
+            group_position.positions,
             last_price_map,
             realtime_price_map,
             target_currency,
@@ -69,13 +85,11 @@ def _create_portfolio_group(group: InvestmentHolding, target_currency: str):
 
 def _add_portfolios_to_group(
     portofolio_group: HoldingGroup,
-    inventory: Inventory,
+    commodity_total_positions: dict[str, TotalPositionWithCost],
     last_price_map,
     realtime_price_map,
     target_currency: str,
 ):
-    commodity_total_positions = _group_position_by_commodity(inventory)
-
     for commodity, total_position in commodity_total_positions.items():
         position = total_position.units
         total_cost = total_position.cost
@@ -92,16 +106,6 @@ def _add_portfolios_to_group(
     portofolio_group.holdings.sort(key=lambda h: h.realtime_market_value.number, reverse=True)
 
 
-@dataclass
-class TotalPositionWithCost:
-    """
-    总持仓和总成本
-    """
-
-    units: Decimal
-    cost: Amount
-
-
 def _group_position_by_commodity(
     inventory: Inventory,
 ) -> dict[str, TotalPositionWithCost]:
@@ -133,7 +137,16 @@ def create_portfolio_report(
     investment_groups: list[InvestmentHolding],
     target_currency: str,
 ) -> Portfolio:
-    portfolio_groups = calc_portfolio_ratio_report(entries, investment_groups, target_currency)
+    return value_portfolio(entries, group_positions(investment_groups), target_currency)
+
+
+def value_portfolio(
+    entries: list[Directive],  # type: ignore
+    positions: list[GroupPositions],
+    target_currency: str,
+) -> Portfolio:
+    """按当前价格计算 positions 的市值与盈亏, 持仓不变时可以复用同一个 positions"""
+    portfolio_groups = _value_portfolio_groups(entries, positions, target_currency)
 
     total_unrealized_pnl = D(0)
     total_realtime_market_value = D(0)
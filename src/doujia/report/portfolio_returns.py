@@ -2,8 +2,8 @@ from collections import namedtuple
 
 from beancount.core.convert import convert_amount
 from beancount.core.data import Transaction
-from beancount.loader import load_file
 
+from doujia.ledger.cache import load_file
 from doujia.price.price_map import get_last_and_realtime_price_map
 
 Cashflow = namedtuple("Cashflow", ["date", "amount"])
@@ -1,18 +1,21 @@
+import copy
 import datetime
+from bisect import bisect_left, bisect_right
 from decimal import Decimal
 from pathlib import Path
 from typing import NamedTuple
 
-import beangrow.config as configlib
 import beangrow.returns as returnslib
-from beancount.core import convert, getters
-from beancount.core.data import Directive, Transaction
+from beancount.core import convert
+from beancount.core.data import Directive
 from beancount.core.inventory import Inventory
-from beangrow import investments
-from beangrow.config_pb2 import Config
 from frozendict import frozendict
 
+from doujia.ledger.snapshot import LedgerSnapshot
+from doujia.price.matrix import DailyPriceMatrix
 from doujia.price.price_map import get_last_and_realtime_price_map
+from doujia.report.extraction import beangrow_extractor
+from doujia.report.xirr import compute_returns
 
 EMPTY_MAP = frozendict()
 
@@ -30,25 +33,41 @@ class PeriodAmount(NamedTuple):
     currency: str
 
 
-def _sum_inventory_between(
-    entries: list[Directive],  # type: ignore
+def _sweep_inventories(
+    snapshot: LedgerSnapshot,
     account_prefix_list: list[str],
-    date_range: tuple[datetime.date, datetime.date],
-) -> Inventory:
-    result = Inventory()
-    for entry in entries:
-        if isinstance(entry, Transaction) and date_range[0] <= entry.date < date_range[1]:
-            for posting in entry.postings:
-                founds = False
-                for account_prefix in account_prefix_list:
-                    if posting.account.startswith(account_prefix):
-                        founds = True
-                        break
-
-                if founds:
-                    result.add_position(posting)
-
-    return result
+    date_range: list[tuple[datetime.date, datetime.date]],
+) -> list[Inventory]:
+    """
+    所有区间的边界排序后把时间轴切分为互不重叠的小段, posting 只遍历一次并累加到所在的小段,
+    相同起点的区间按终点从小到大累加小段得到, 因此 (begin, t_i) 这样逐渐增长的区间只需要累加一遍
+    """
+    ranges = [(x[0] or datetime.date.min, x[1] or datetime.date.max) for x in date_range]
+    boundaries = sorted({d for x in ranges for d in x})
+
+    segments = [Inventory() for _ in boundaries]
+    for ref in snapshot.postings(account_prefix_list, boundaries[0], boundaries[-1]):
+        segments[bisect_right(boundaries, ref.date) - 1].add_position(ref.posting)
+
+    ends_by_start: dict[datetime.date, set[datetime.date]] = {}
+    for start, end in ranges:
+        ends_by_start.setdefault(start, set()).add(end)
+
+    result: dict[tuple[datetime.date, datetime.date], Inventory] = {}
+    for start, ends in ends_by_start.items():
+        inventory = Inventory()
+        i = bisect_left(boundaries, start)
+        for end in sorted(ends):
+            if end <= start:
+                result[(start, end)] = Inventory()
+                continue
+
+            while boundaries[i] < end:
+                inventory.add_inventory(segments[i])
+                i += 1
+            result[(start, end)] = copy.copy(inventory)
+
+    return [result[x] for x in ranges]
 
 
 def _get_only_amount_number(inventory: Inventory, expect_currency: str) -> Decimal:
@@ -61,24 +80,79 @@ def _get_only_amount_number(inventory: Inventory, expect_currency: str) -> Decim
 
 
 def sum_inventory_between(
-    entries: list[Directive],  # type: ignore
+    entries: list[Directive] | LedgerSnapshot,  # type: ignore
     account_prefix_list: list[str],
     date_range: list[tuple[datetime.date, datetime.date]],
 ) -> list[PeriodInventory]:
-    return [(PeriodInventory(x[0], x[1], _sum_inventory_between(entries, account_prefix_list, x))) for x in date_range]
+    if not date_range:
+        return []
+
+    inventories = _sweep_inventories(LedgerSnapshot.of(entries), account_prefix_list, date_range)
+    return [PeriodInventory(x[0], x[1], y) for x, y in zip(date_range, inventories, strict=True)]
 
 
 def sum_single_amount_between(
-    entries: list[Directive],  # type: ignore
+    entries: list[Directive] | LedgerSnapshot,  # type: ignore
     price_map: dict,  # type: ignore
     account_prefix_list: list[str],
     date_range: list[tuple[datetime.date, datetime.date]],
     target_currency: str,
 ) -> list[PeriodAmount]:
-    return [
-        convert_period_inventory(x, price_map, target_currency)
-        for x in sum_inventory_between(entries, account_prefix_list, date_range)
-    ]
+    period_inventories = sum_inventory_between(entries, account_prefix_list, date_range)
+    if len(period_inventories) <= 1:
+        return [convert_period_inventory(x, price_map, target_currency) for x in period_inventories]
+
+    return convert_period_inventories(period_inventories, price_map, target_currency)
+
+
+def convert_period_inventories(
+    period_inventories: list[PeriodInventory], price_map: dict, target_currency: str
+) -> list[PeriodAmount]:
+    """
+    与逐个调用 convert_period_inventory 一致, 所有期末日期的价格通过 DailyPriceMatrix 一次性查出
+    convert_position 通过持仓的成本货币中转, 因此每种成本货币构建一个矩阵; 缺少价格的期间仍然逐个折算
+    """
+    at_dates = [x.end_exclusive - datetime.timedelta(days=1) for x in period_inventories]
+
+    currencies_by_cost: dict[str | None, set[str]] = {}
+    for period_inventory in period_inventories:
+        for position in period_inventory.inventory:
+            cost_currency = position.cost.currency if position.cost else None
+            currencies_by_cost.setdefault(cost_currency, set()).add(position.units.currency)
+
+    matrices = {
+        cost_currency: DailyPriceMatrix.build(
+            price_map,
+            currencies,
+            target_currency,
+            min(at_dates),
+            max(at_dates),
+            via=() if cost_currency is None else (cost_currency,),
+            exact=True,
+        )
+        for cost_currency, currencies in currencies_by_cost.items()
+    }
+
+    result: list[PeriodAmount] = []
+    for period_inventory, at_date in zip(period_inventories, at_dates, strict=True):
+        amount = Decimal(0)
+        for position in period_inventory.inventory:
+            matrix = matrices[position.cost.currency if position.cost else None]
+            rate = matrix.rate(position.units.currency, at_date)
+            if rate is None:
+                result.append(convert_period_inventory(period_inventory, price_map, target_currency))
+                break
+            amount += position.units.number * rate
+        else:
+            result.append(
+                PeriodAmount(
+                    start_inclusive=period_inventory.start_inclusive,
+                    end_exclusive=period_inventory.end_exclusive,
+                    amount=amount,
+                    currency=target_currency,
+                )
+            )
+    return result
 
 
 def convert_period_inventory(period_inventory: PeriodInventory, price_map: dict, target_currency: str) -> PeriodAmount:
@@ -98,14 +172,6 @@ def convert_period_inventory(period_inventory: PeriodInventory, price_map: dict,
     )
 
 
-def _extract_beangrow_config(
-    entries: list[Directive],  # type: ignore
-    beangrow_config_path: Path,
-) -> Config:  # type: ignore
-    accounts = getters.get_accounts(entries)
-    return configlib.read_config(str(beangrow_config_path), [], accounts)
-
-
 def calc_xirr(
     entries: list[Directive],  # type: ignore
     beangrow_config_path: Path,
@@ -113,20 +179,13 @@ def calc_xirr(
     end_date: datetime.date,
     currency: str,
 ) -> Decimal:
-    config: Config = _extract_beangrow_config(entries, beangrow_config_path)  # type: ignore
+    config, account_data_map = beangrow_extractor.extract(
+        entries, options_map["dcontext"], beangrow_config_path, end_date
+    )
     _, price_map = get_last_and_realtime_price_map(entries)
 
     pricer = returnslib.Pricer(price_map)
 
-    account_data_map = investments.extract(
-        entries,
-        options_map["dcontext"],
-        config,
-        end_date,
-        False,
-        "",
-    )
-
     group = None
     for group in config.groups.group:
         if group.name == "All":
@@ -136,7 +195,7 @@ def calc_xirr(
         adlist = [account_data_map[name] for name in group.investment if name in account_data_map]
 
         truncated_cash_flows = returnslib.truncate_and_merge_cash_flows(pricer, adlist, None, date_end=end_date)
-        irr = returnslib.compute_returns(truncated_cash_flows, pricer, currency, end_date).total
+        irr = compute_returns(truncated_cash_flows, pricer, currency, end_date).total
     else:
         irr = Decimal(0)
 
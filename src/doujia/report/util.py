@@ -9,6 +9,7 @@ from beancount.core.prices import PriceMap
 from beangrow.investments import AccountData, Cat
 
 from doujia.portfolio.processor import TransactionProcessor
+from doujia.price.matrix import DailyPriceMatrix
 
 Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
 Transaction = TypeVar("Transaction", bound=data.Transaction)  # type: ignore
@@ -84,6 +85,25 @@ def prepare_inventory_and_transactions(
     return begin_inventory, after_begin_transactions
 
 
+def balance_between(
+    inventory: Inventory, price_map: PriceMap, target_currency: str, begin_date: date, end_date: date
+) -> list[Decimal]:
+    """
+    inventory 不变时 [begin_date, end_date] 每一天的 balance, 与逐日调用 balance_at 一致
+    所有日期的价格通过 DailyPriceMatrix 一次性查出
+    """
+    matrix = DailyPriceMatrix.build(
+        price_map,
+        [x.units.currency for x in inventory.get_positions()],
+        target_currency,
+        begin_date,
+        end_date,
+        via=["HKD", "CNY", "USD"],
+        exact=True,
+    )
+    return list(matrix.value(inventory))
+
+
 def balance_at(inventory: Inventory, price_map: PriceMap, target_currency: str, at_date: date) -> data.Amount:
     balance = data.Amount(Decimal(0), target_currency)
     for posting in inventory.get_positions():
@@ -0,0 +1,160 @@
+from datetime import date
+from typing import NamedTuple
+
+import beangrow.returns as returnslib
+import numpy as np
+from beangrow.investments import CashFlow
+
+# Newton 迭代的最大次数与相对步长精度
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-12
+
+# 牛顿法失败时在 1 + r ∈ [1e-4, 1e2] 的网格上寻找变号区间再二分
+_BRACKET_BASES = np.geomspace(1e-4, 1e2, 601)
+_BISECT_ITERATIONS = 200
+
+
+class ReturnsProblem(NamedTuple):
+    """一次 compute_returns 的输入, 每组 / 每个区间一个"""
+
+    flows: list[CashFlow]
+    target_currency: str
+    end_date: date
+
+
+def _npv(rates: np.ndarray, cash_flows: np.ndarray, years: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """每一行的净现值与对 r 的导数, 要求 1 + r > 0"""
+    base = 1.0 + rates[:, None]
+    discounted = cash_flows * base**-years
+    return discounted.sum(axis=1), (-years * discounted / base).sum(axis=1)
+
+
+def _bracket_root(cash_flows: np.ndarray, years: np.ndarray, estimated: float) -> float:
+    """在网格上找到离初始值最近的变号区间并二分, 找不到时返回 nan"""
+    with np.errstate(all="ignore"):
+        values = (cash_flows[None, :] * _BRACKET_BASES[:, None] ** -years[None, :]).sum(axis=1)
+    changes = np.flatnonzero(np.isfinite(values[:-1]) & np.isfinite(values[1:]) & (values[:-1] * values[1:] <= 0))
+    if len(changes) == 0:
+        return float("nan")
+
+    index = changes[np.argmin(np.abs(_BRACKET_BASES[changes] - (1.0 + estimated)))]
+    low, high = _BRACKET_BASES[index], _BRACKET_BASES[index + 1]
+    low_value = values[index]
+    for _ in range(_BISECT_ITERATIONS):
+        middle = (low + high) / 2
+        value = (cash_flows * middle**-years).sum()
+        if value == 0 or high - low <= TOLERANCE * middle:
+            return middle - 1.0
+        if (value < 0) == (low_value < 0):
+            low, low_value = middle, value
+        else:
+            high = middle
+    return (low + high) / 2 - 1.0
+
+
+def solve_xirr(cash_flows: list[np.ndarray], years: list[np.ndarray]) -> np.ndarray:
+    """
+    一次求解多组现金流的 XIRR, years 是每笔现金流相对结束日期的年数 (通常为负)
+    与 beangrow.returns.compute_irr 使用相同的目标函数和初始值, 所有行同时做 Newton 迭代,
+    不收敛的行在变号区间上二分, 仍然失败时结果为 nan
+    """
+    count = len(cash_flows)
+    width = max((len(x) for x in cash_flows), default=0)
+    # 补齐的现金流为 0, 不影响净现值与导数
+    flows_matrix = np.zeros((count, width))
+    years_matrix = np.zeros((count, width))
+    for i, (flows, flow_years) in enumerate(zip(cash_flows, years, strict=True)):
+        flows_matrix[i, : len(flows)] = flows
+        years_matrix[i, : len(flow_years)] = flow_years
+
+    estimated = 0.2 * np.sign(flows_matrix.sum(axis=1))
+    rates = estimated.copy()
+    converged = np.zeros(count, bool)
+    failed = np.zeros(count, bool)
+    with np.errstate(all="ignore"):
+        for _ in range(MAX_ITERATIONS):
+            npv, slope = _npv(rates, flows_matrix, years_matrix)
+            converged |= npv == 0
+            failed |= ~converged & (~np.isfinite(npv) | ~np.isfinite(slope) | (slope == 0))
+            active = ~converged & ~failed
+            if not active.any():
+                break
+
+            candidate = rates - np.where(active, npv / np.where(slope == 0, 1.0, slope), 0.0)
+            # 越过 r = -1 时改为向 -1 走一半
+            candidate = np.where(candidate > -1.0, candidate, (rates - 1.0) / 2)
+            converged |= active & (np.abs(candidate - rates) <= TOLERANCE * (1.0 + np.abs(rates)))
+            rates = candidate
+
+    for i in np.flatnonzero(~converged):
+        rates[i] = _bracket_root(flows_matrix[i], years_matrix[i], estimated[i])
+
+    return rates
+
+
+def _flows_and_years(
+    flows: list[CashFlow],
+    pricer: returnslib.Pricer,
+    target_currency: str,
+    end_date: date,
+) -> tuple[np.ndarray, np.ndarray]:
+    """与 compute_irr 相同的换算: 按现金流当天的价格换算为 target_currency"""
+    amounts = [float(pricer.convert_amount(x.amount, target_currency, date=x.date).number) for x in flows]
+    return np.array(amounts), np.array([(x.date - end_date).days / 365 for x in flows])
+
+
+def compute_returns_batch(problems: list[ReturnsProblem], pricer: returnslib.Pricer) -> list[returnslib.Returns]:
+    """批量计算 beangrow.returns.compute_returns, 所有问题的总收益与除息收益在一次 solve_xirr 中求解"""
+    cash_flows: list[np.ndarray] = []
+    years: list[np.ndarray] = []
+    sorted_flows: list[list[CashFlow]] = []
+    for problem in problems:
+        flows = sorted(problem.flows, key=lambda cf: cf.date)
+        flows_exdiv = [flow for flow in flows if not flow.is_dividend]
+        sorted_flows.append(flows)
+        for x in (flows, flows_exdiv):
+            amounts, flow_years = _flows_and_years(x, pricer, problem.target_currency, problem.end_date)
+            cash_flows.append(amounts)
+            years.append(flow_years)
+
+    rates = solve_xirr(cash_flows, years)
+
+    results: list[returnslib.Returns] = []
+    for i, (problem, flows) in enumerate(zip(problems, sorted_flows, strict=True)):
+        if not flows:
+            results.append(returnslib.Returns("?", date.today(), date.today(), 0, 0, 0, 0, []))
+            continue
+
+        irr, irr_exdiv = rates[2 * i].item(), rates[2 * i + 1].item()
+        # 没有找到根时退回 beangrow 的 fsolve, 保证结果与原来一致
+        if np.isnan(irr):
+            irr = returnslib.compute_irr(flows, pricer, problem.target_currency, problem.end_date)
+        if np.isnan(irr_exdiv):
+            flows_exdiv = [flow for flow in flows if not flow.is_dividend]
+            irr_exdiv = returnslib.compute_irr(flows_exdiv, pricer, problem.target_currency, problem.end_date)
+
+        first_date, last_date = flows[0].date, flows[-1].date
+        results.append(
+            returnslib.Returns(
+                "?",
+                first_date,
+                last_date,
+                (last_date - first_date).days / 365,
+                irr,
+                irr_exdiv,
+                irr - irr_exdiv,
+                flows,
+            )
+        )
+
+    return results
+
+
+def compute_returns(
+    flows: list[CashFlow],
+    pricer: returnslib.Pricer,
+    target_currency: str,
+    end_date: date,
+) -> returnslib.Returns:
+    """单个问题的 compute_returns_batch"""
+    return compute_returns_batch([ReturnsProblem(flows, target_currency, end_date)], pricer)[0]
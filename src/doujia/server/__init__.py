@@ -1,7 +1,6 @@
 import os
 
-from flask import Flask
-
+from doujia.server.app import FlaskApp
 from doujia.server.bootstrap.scheduler import setup_scheduler
 from doujia.server.bootstrap.setup_app import (
     init_data,
@@ -9,14 +8,19 @@ from doujia.server.bootstrap.setup_app import (
     setup_controller,
     setup_corbado,
     setup_cors,
+    setup_holding_stream,
     setup_hsbc,
+    setup_ledger_watcher,
     setup_logger,
+    setup_price_history,
+    setup_result_cache,
+    setup_shared_price_cache,
 )
 
 
 def create_app(test_config=None):
     # create and configure the app
-    app = Flask(__name__, instance_relative_config=True)
+    app = FlaskApp(__name__, instance_relative_config=True)
     os.makedirs(app.instance_path, exist_ok=True)
 
     setup_app_config(app, test_config)
@@ -26,7 +30,12 @@ def create_app(test_config=None):
     setup_cors(app)
     setup_controller(app)
     setup_hsbc(app)
+    setup_result_cache(app)
+    setup_holding_stream(app)
+    setup_price_history(app)
+    setup_shared_price_cache(app)
 
     init_data(app)
+    setup_ledger_watcher(app)
 
     return app
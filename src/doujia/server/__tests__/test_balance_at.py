@@ -0,0 +1,44 @@
+import dataclasses
+
+from beancount import loader
+
+from doujia.ledger.inventory_checkpoint import InventoryCheckpoints
+from doujia.ledger.snapshot import LedgerSnapshot
+from doujia.server.app import FlaskApp
+
+LEDGER = """
+2020-01-01 open Assets:Cash
+2020-01-01 open Assets:Stock
+
+2020-01-15 *
+    Assets:Stock 10 AAPL {100 USD}
+    Assets:Cash -1000 USD
+
+2020-03-02 *
+    Assets:Stock 5 AAPL {120 USD}
+    Assets:Cash -600 USD
+"""
+
+
+def test_balance_at_should_return_inventory_by_account(app: FlaskApp, client):
+    entries, _, options_map = loader.load_string(LEDGER)
+    snapshot = LedgerSnapshot.build(entries, options_map)
+    app.ledger_state = dataclasses.replace(
+        app.ledger_state,
+        version=app.ledger_state.version + 1000,
+        entries=entries,
+        snapshot=snapshot,
+        inventory_checkpoints=InventoryCheckpoints.build(snapshot),
+    )
+
+    response = client.get("/balance/at?date=2020-03-02&prefix=Assets:Stock")
+    assert response.status_code == 200
+    [stock] = response.json
+    assert stock["account"] == "Assets:Stock"
+    assert [(x["number"], x["currency"], x["cost"]["number"]) for x in stock["positions"]] == [("10", "AAPL", "100")]
+
+    response = client.get("/balance/at?date=2020-03-03&prefix=Assets:Cash&prefix=Assets:Stock")
+    assert [x["account"] for x in response.json] == ["Assets:Cash", "Assets:Stock"]
+    assert len(response.json[1]["positions"]) == 2
+
+    assert client.get("/balance/at?prefix=Assets").status_code == 400
@@ -0,0 +1,48 @@
+import datetime
+from decimal import Decimal
+
+from beancount.core.data import Amount
+
+from doujia.price.cache import symbol_price_cache
+from doujia.server.app import FlaskApp
+from doujia.server.controller import balance
+from doujia.server.task.ledger import reload_ledger
+
+
+def test_balance_should_be_cached_until_ledger_or_price_changed(app: FlaskApp, client, mocker):
+    spy = mocker.spy(balance, "balance_at")
+
+    first = client.get("/balance/current")
+    second = client.get("/balance/current")
+    assert first.status_code == 200
+    assert second.get_data() == first.get_data()
+    assert spy.call_count == 1
+
+    # 价格没有变化时不会使缓存失效
+    prices = {"CACHED_RESULT": Amount(Decimal("1.5"), "USD")}
+    price_dates = {"CACHED_RESULT": datetime.date(2024, 1, 1)}
+    symbol_price_cache.update_batch(prices, price_dates)
+    client.get("/balance/current")
+    assert spy.call_count == 2
+
+    symbol_price_cache.update_batch(prices, price_dates)
+    client.get("/balance/current")
+    assert spy.call_count == 2
+
+    symbol_price_cache.update_batch({"CACHED_RESULT": Amount(Decimal("1.6"), "USD")}, price_dates)
+    client.get("/balance/current")
+    assert spy.call_count == 3
+
+    reload_ledger(app, force=True)
+    client.get("/balance/current")
+    assert spy.call_count == 4
+
+
+def test_cache_key_should_include_query_args(client, mocker):
+    spy = mocker.spy(balance, "gen_cumulative_balances")
+
+    client.get("/balance/cumulative?account_prefix=Expenses:")
+    client.get("/balance/cumulative?account_prefix=Income:")
+    client.get("/balance/cumulative?account_prefix=Income:&__debug__user__=1")
+
+    assert spy.call_count == 2
@@ -0,0 +1,77 @@
+import dataclasses
+import datetime
+import json
+from decimal import Decimal
+
+from beancount import loader
+from beancount.core.data import Amount
+from beancount.core.inventory import Inventory
+
+from doujia.ledger.snapshot import LedgerSnapshot
+from doujia.price.cache import symbol_price_cache
+from doujia.report.portfolio.data import InvestmentHolding
+from doujia.server.app import FlaskApp
+
+LEDGER = """
+2020-01-01 commodity USD
+2020-01-01 commodity STREAMA
+    price: "USD:yahoo/STREAMA"
+2020-01-01 commodity STREAMB
+    price: "USD:yahoo/STREAMB"
+
+2020-01-02 price STREAMA 100 USD
+2020-01-02 price STREAMB 50 USD
+"""
+
+
+def _parse(chunk: bytes) -> tuple[str, dict]:
+    lines = chunk.decode().strip().split("\n")
+    return lines[0].removeprefix("event: "), json.loads(lines[1].removeprefix("data: "))
+
+
+def test_holding_stream_should_push_market_value_delta(app: FlaskApp, client, mocker):
+    entries, _, options_map = loader.load_string(LEDGER)
+    app.ledger_state = dataclasses.replace(
+        app.ledger_state,
+        version=app.ledger_state.version + 1000,
+        entries=entries,
+        snapshot=LedgerSnapshot.build(entries, options_map),
+    )
+    get_investment_holdings = mocker.patch(
+        "doujia.server.logic.holding_stream.get_investment_holdings",
+        return_value=[
+            InvestmentHolding("Stock", Inventory.from_string("10 STREAMA {80 USD}, 20 STREAMB {40 USD}"), 1.0)
+        ],
+    )
+    today = datetime.date.today()
+    symbol_price_cache.update_batch(
+        {"STREAMA": Amount(Decimal("110"), "USD"), "STREAMB": Amount(Decimal("55"), "USD")},
+        {"STREAMA": today, "STREAMB": today},
+    )
+
+    response = client.get("/portfolio/holding/stream")
+    assert response.mimetype == "text/event-stream"
+    chunks = iter(response.response)
+
+    event, data = _parse(next(chunks))
+    assert event == "snapshot"
+    assert data["realtime_market_value"] == ["2200", "USD"]
+
+    # 只有 STREAMB 的价格变化
+    symbol_price_cache.update_batch(
+        {"STREAMA": Amount(Decimal("110"), "USD"), "STREAMB": Amount(Decimal("60"), "USD")},
+        {"STREAMA": today, "STREAMB": today},
+    )
+    event, data = _parse(next(chunks))
+    assert event == "delta"
+    assert data["fields"]["realtime_market_value"] == ["2300", "USD"]
+    holdings = data["groups"]["items"]["Stock"]["holdings"]["items"]
+    assert holdings["STREAMB"]["realtime_price"] == ["60", "USD"]
+    # STREAMA 只有占比变化
+    assert list(holdings["STREAMA"]) == ["realtime_ratio"]
+
+    # 价格变化时不重新计算持仓
+    assert get_investment_holdings.call_count == 1
+
+    response.close()
+    assert app.holding_stream._clients == []
@@ -0,0 +1,27 @@
+from doujia.server.app import FlaskApp
+from doujia.server.task.ledger import reload_ledger
+
+
+def test_reload_should_publish_complete_state(app: FlaskApp):
+    state = app.ledger_state
+
+    assert reload_ledger(app, force=True)
+
+    assert app.ledger_state is not state
+    assert app.ledger_state.snapshot.entries is app.ledger_state.entries
+    assert app.ledger_state.options_map is not state.options_map
+
+
+def test_in_flight_request_should_keep_its_ledger_state(app: FlaskApp):
+    with app.app_context():
+        state = app.ledger
+        entries = app.entries
+
+        reload_ledger(app, force=True)
+
+        assert app.ledger is state
+        assert app.entries is entries
+        assert app.ledger_state is not state
+
+    with app.app_context():
+        assert app.ledger is app.ledger_state
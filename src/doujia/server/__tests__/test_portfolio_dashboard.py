@@ -0,0 +1,12 @@
+def test_dashboard_should_return_nav_pnl_and_holdings(client, mocker):
+    mock_user = mocker.Mock()
+    mock_user.user_id = "usr-6722965184682784673"
+    mock_user.authenticated = True
+    mocker.patch("doujia.server.filter.user.get_current_user", return_value=mock_user)
+
+    response = client.get("/portfolio/dashboard?group=All", headers={"Authorization": "Bearer 1234567890"})
+
+    assert response.status_code == 200
+    assert response.json.keys() == {"nav_index", "pnl", "holdings"}
+    assert response.json["pnl"]["currency"] == "CNY"
+    assert response.json["holdings"] == []
@@ -2,10 +2,16 @@ from typing import TypeVar
 
 from beancount.core import data
 from corbado_python_sdk import CorbadoSDK, SessionService
-from flask import Flask
+from flask import Flask, g, has_app_context
 from flask import current_app as _current_app
 
 from doujia.hsbc.hsbc_importer import HSBCSession
+from doujia.ledger.inventory_checkpoint import InventoryCheckpoints
+from doujia.ledger.snapshot import LedgerSnapshot
+from doujia.ledger.watcher import LedgerWatcher
+from doujia.server.logic.holding_stream import HoldingStream
+from doujia.server.logic.ledger import DoujiaConfig, LedgerState
+from doujia.server.logic.result_cache import ResultCache
 
 Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
 
@@ -15,9 +21,46 @@ class FlaskApp(Flask):
     ledger_root: str
     corbado: CorbadoSDK
     sessions: SessionService
-    entries: list[Directive]
-    options_map: dict
     hsbc_session: HSBCSession
+    ledger_watcher: LedgerWatcher | None
+    result_cache: ResultCache
+    holding_stream: HoldingStream
+
+    # reload 时整体替换, 不会修改已经发布的对象
+    ledger_state: LedgerState | None = None
+
+    @property
+    def ledger(self) -> LedgerState:
+        """
+        当前使用的账本状态
+        在 app context 中第一次访问时固定下来, 同一个请求内即使发生 reload 也始终看到同一份数据
+        """
+        if not has_app_context():
+            return self.ledger_state
+
+        if "ledger_state" not in g:
+            g.ledger_state = self.ledger_state
+        return g.ledger_state
+
+    @property
+    def entries(self) -> list[Directive]:
+        return self.ledger.entries
+
+    @property
+    def options_map(self) -> dict:
+        return self.ledger.options_map
+
+    @property
+    def doujia_config(self) -> DoujiaConfig:
+        return self.ledger.doujia_config
+
+    @property
+    def snapshot(self) -> LedgerSnapshot:
+        return self.ledger.snapshot
+
+    @property
+    def inventory_checkpoints(self) -> InventoryCheckpoints:
+        return self.ledger.inventory_checkpoints
 
 
 current_app: FlaskApp = _current_app
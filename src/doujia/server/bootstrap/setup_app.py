@@ -5,10 +5,16 @@ from flask import Flask
 from flask_cors import CORS
 from logzero import INFO, logger, setup_default_logger
 
+from doujia.ledger.watcher import LedgerWatcher
+from doujia.price.cache import symbol_price_cache
+from doujia.price.history import PriceHistoryStore
+from doujia.price.shared import SHARED_PATH_ENV, SharedPriceFile
 from doujia.server.controller.balance import bp as balance_bp
 from doujia.server.controller.importer import bp as importer_bp
 from doujia.server.controller.portfolio import bp as portfolio_bp
-from doujia.server.task.ledger import reload_ledger
+from doujia.server.logic.holding_stream import HoldingStream
+from doujia.server.logic.result_cache import ResultCache
+from doujia.server.task.ledger import get_watch_targets, reload_ledger
 from doujia.server.task.price import update_price_cache
 
 DEFAULT_CORBADO_PROJECT_ID = "pro-8910668211600497001"
@@ -48,6 +54,16 @@ def setup_app_config(app: Flask, test_config=None):
     if "CORBADO_PROJECT_ID" not in app.config:
         app.config["CORBADO_PROJECT_ID"] = DEFAULT_CORBADO_PROJECT_ID
 
+    # watch: 监听文件变化后重新加载; poll: 每 3 秒检查一次 git commit
+    if "LEDGER_RELOAD_MODE" in os.environ:
+        app.config["LEDGER_RELOAD_MODE"] = os.environ["LEDGER_RELOAD_MODE"]
+    elif "LEDGER_RELOAD_MODE" not in app.config:
+        app.config["LEDGER_RELOAD_MODE"] = "watch"
+
+    # 多个 worker 进程通过 instance 目录下的 mmap 文件共享价格, 只有一个进程获取价格
+    if "PRICE_CACHE_SHARED" in os.environ:
+        app.config["PRICE_CACHE_SHARED"] = os.environ["PRICE_CACHE_SHARED"].lower() in ("1", "true", "yes")
+
     if "CORBADO_API_SECRET" in os.environ:
         app.config["CORBADO_API_SECRET"] = os.environ["CORBADO_API_SECRET"]
     if "LEDGER_ROOT" in os.environ:
@@ -84,11 +100,57 @@ def setup_controller(app):
     app.register_blueprint(balance_bp)
 
 
+def setup_result_cache(app):
+    logger.debug("Setting up result cache")
+    app.result_cache = ResultCache(
+        max_bytes=app.config.get("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024),
+        max_entries=app.config.get("RESULT_CACHE_MAX_ENTRIES", 1024),
+    )
+
+
+def setup_holding_stream(app):
+    logger.debug("Setting up holding stream")
+    app.holding_stream = HoldingStream(app)
+
+
 def setup_hsbc(app):
     app.hsbc_session = None
 
 
+def setup_ledger_watcher(app):
+    if app.config.get("TESTING") or app.config["LEDGER_RELOAD_MODE"] != "watch":
+        app.ledger_watcher = None
+        return
+
+    logger.debug("Setting up ledger watcher")
+    app.ledger_watcher = LedgerWatcher(
+        get_targets=lambda: get_watch_targets(app),
+        on_change=lambda ledger_changed: reload_ledger(app, force=ledger_changed),
+    )
+    app.ledger_watcher.start()
+
+
+def setup_price_history(app):
+    if app.config.get("TESTING"):
+        return
+
+    # 启动时先从本地记录恢复价格, 不需要等待网络请求
+    logger.debug("Setting up price history")
+    symbol_price_cache.attach_store(PriceHistoryStore(os.path.join(app.instance_path, "price_history.sqlite3")))
+
+
+def setup_shared_price_cache(app):
+    if not app.config.get("PRICE_CACHE_SHARED"):
+        return
+
+    logger.debug("Setting up shared price cache")
+    path = os.environ.get(SHARED_PATH_ENV) or os.path.join(app.instance_path, "price_cache.mmap")
+    # 由服务启动的 Fava 等进程通过同一个环境变量找到共享文件
+    os.environ[SHARED_PATH_ENV] = path
+    symbol_price_cache.attach_shared(SharedPriceFile(path))
+
+
 def init_data(app):
     logger.debug("Initializing data")
-    reload_ledger(app)
+    reload_ledger(app, cold_start=True)
     update_price_cache(app)
@@ -2,13 +2,14 @@ import datetime
 from typing import TypeVar
 
 from beancount.core import data
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, abort, jsonify, request
 
 from doujia.price.price_map import get_last_and_realtime_price_map
 from doujia.report.balance import balance_at
 from doujia.report.cumulative_balance import gen_cumulative_balances
 from doujia.server.app import current_app
 from doujia.server.filter.auth import require_auth
+from doujia.server.filter.cache import cached_result
 
 Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
 
@@ -17,6 +18,7 @@ bp = Blueprint("balance", __name__, url_prefix="/balance")
 
 @bp.get("/short_assets")
 @require_auth
+@cached_result
 def get_short_assets():
     today = datetime.date.today() + datetime.timedelta(days=1)
     first_day_of_year = datetime.date(today.year, 1, 1)
@@ -27,7 +29,7 @@ def get_short_assets():
         (
             first_day_of_year,
             balance_at(
-                entries=current_app.entries,
+                entries=current_app.snapshot,
                 at_date=first_day_of_year,
                 account_prefixes=["Assets:Short", "Liabilities:Short"],
                 target_currency="USD",
@@ -37,7 +39,7 @@ def get_short_assets():
         (
             today,
             balance_at(
-                entries=current_app.entries,
+                entries=current_app.snapshot,
                 at_date=today,
                 account_prefixes=["Assets:Short", "Liabilities:Short"],
                 target_currency="USD",
@@ -49,6 +51,7 @@ def get_short_assets():
 
 @bp.get("/investments")
 @require_auth
+@cached_result
 def get_investments():
     today = datetime.date.today() + datetime.timedelta(days=1)
     first_day_of_year = datetime.date(today.year, 1, 1)
@@ -58,7 +61,7 @@ def get_investments():
         (
             first_day_of_year,
             balance_at(
-                entries=current_app.entries,
+                entries=current_app.snapshot,
                 at_date=first_day_of_year,
                 account_prefixes=["Assets:Short:Stock", "Assets:Short:Investment"],
                 target_currency="USD",
@@ -68,7 +71,7 @@ def get_investments():
         (
             today,
             balance_at(
-                entries=current_app.entries,
+                entries=current_app.snapshot,
                 at_date=today,
                 account_prefixes=["Assets:Short:Stock", "Assets:Short:Investment"],
                 target_currency="USD",
@@ -80,6 +83,7 @@ def get_investments():
 
 @bp.get("/current")
 @require_auth
+@cached_result
 def get_current():
     today = datetime.date.today() + datetime.timedelta(days=1)
     _, price_map = get_last_and_realtime_price_map(current_app.entries)
@@ -88,7 +92,7 @@ def get_current():
         (
             today,
             balance_at(
-                entries=current_app.entries,
+                entries=current_app.snapshot,
                 at_date=today,
                 account_prefixes=[
                     "Assets:Short:Current:CMB",
@@ -105,6 +109,7 @@ def get_current():
 
 @bp.get("/cumulative")
 @require_auth
+@cached_result
 def get_cumulative():
     today = datetime.date.today()
     end_date = datetime.date(today.year, 12, 31)
@@ -113,9 +118,42 @@ def get_cumulative():
 
     return jsonify(
         gen_cumulative_balances(
-            entries=current_app.entries,
+            entries=current_app.snapshot,
             account_prefix=account_prefix,
             begin_date=begin_date,
             end_date_inclusive=end_date,
         )
     )
+
+
+@bp.get("/at")
+@require_auth
+@cached_result
+def get_balance_at():
+    """
+    前缀匹配的每个账户在 date 之前 (不包括 date 当天) 的 inventory, 包括成本 lot
+    prefix 可以传入多个, 不传时返回所有账户
+    """
+    try:
+        at_date = datetime.date.fromisoformat(request.args["date"])
+    except (KeyError, ValueError):
+        abort(400, description="date must be an ISO date")
+    account_prefixes = request.args.getlist("prefix") or [""]
+
+    inventories = current_app.inventory_checkpoints.account_inventories(account_prefixes, at_date)
+    return jsonify(
+        [
+            {
+                "account": account,
+                "positions": [
+                    {
+                        "number": position.units.number,
+                        "currency": position.units.currency,
+                        "cost": position.cost._asdict() if position.cost is not None else None,
+                    }
+                    for position in inventory.get_positions()
+                ],
+            }
+            for account, inventory in sorted(inventories.items())
+        ]
+    )
@@ -1,14 +1,17 @@
 import datetime
 import os
+import queue
 from typing import Any, TypeVar
 
-import beangrow.config as configlib
 import beangrow.returns as returnslib
-from beancount.core import data, getters
+from beancount.core import data
 from beangrow import investments
-from flask import Blueprint, abort, jsonify, request
+from flask import Blueprint, abort, jsonify, request, stream_with_context
 
+from doujia.ledger.snapshot import LedgerSnapshot
 from doujia.price.price_map import get_last_and_realtime_price_map
+from doujia.report.dashboard import gen_dashboard_data
+from doujia.report.extraction import beangrow_extractor
 from doujia.report.investment import (
     calendar_returns,
     cumulative_returns,
@@ -16,38 +19,31 @@ from doujia.report.investment import (
     investments_performance,
     irr_summary,
 )
-from doujia.report.nav import gen_nav_index_data
+from doujia.report.nav_checkpoint import nav_checkpoints
 from doujia.report.pnl import gen_pnl_data
 from doujia.report.portfolio.portfolio import create_portfolio_report
 from doujia.server.app import current_app
 from doujia.server.filter.auth import require_auth
+from doujia.server.filter.cache import cached_result
 
 Directive = TypeVar("Directive", bound=data.Directive)  # type: ignore
 
 bp = Blueprint("portfolio", __name__, url_prefix="/portfolio")
 
+# 没有变化时发送心跳的间隔, 同时检查共享价格与账本是否有更新
+HOLDING_STREAM_HEARTBEAT_SECONDS = 15
+
 
 def _extract_beangrow_config(
-    entries: list[Directive],
+    snapshot: LedgerSnapshot,
     end_date: datetime.date,
     dcontext: Any,
 ) -> tuple[returnslib.Pricer, dict, dict[investments.Account, investments.AccountData]]:
-    accounts = getters.get_accounts(entries)
-
-    _, price_map = get_last_and_realtime_price_map(entries)
+    _, price_map = get_last_and_realtime_price_map(snapshot.entries)
     pricer = returnslib.Pricer(price_map)
 
     config_path = current_app.doujia_config.beangrow_config
-    beangrow_config = configlib.read_config(config_path, [], accounts)
-
-    account_data_map = investments.extract(
-        entries,
-        dcontext,
-        beangrow_config,
-        end_date,
-        False,
-        "",
-    )
+    beangrow_config, account_data_map = beangrow_extractor.extract(snapshot, dcontext, config_path, end_date)
 
     return pricer, beangrow_config.groups.group, account_data_map
 
@@ -56,7 +52,7 @@ def _extract_beangrow_config_from_fava(
     end_date: datetime.date,
 ) -> tuple[returnslib.Pricer, dict, dict[investments.Account, investments.AccountData]]:
     dcontext = current_app.options_map["dcontext"]
-    return _extract_beangrow_config(current_app.entries, end_date, dcontext)
+    return _extract_beangrow_config(current_app.snapshot, end_date, dcontext)
 
 
 def _get_group_and_config(group_name=None):
@@ -79,6 +75,7 @@ def _get_group_and_config(group_name=None):
 
 @bp.get("/irr_summary")
 @require_auth
+@cached_result
 def get_irr_summary():
     begin_date, end_date, pricer, group, adlist = _get_group_and_config()
 
@@ -95,6 +92,7 @@ def get_irr_summary():
 
 @bp.get("/pnl")
 @require_auth
+@cached_result
 def get_pnl():
     begin_date, end_date, pricer, group, adlist = _get_group_and_config()
 
@@ -111,10 +109,11 @@ def get_pnl():
 
 @bp.get("/nav_index")
 @require_auth
+@cached_result
 def get_nav_index():
     begin_date, end_date, pricer, group, adlist = _get_group_and_config()
 
-    nav_index = gen_nav_index_data(
+    nav_index = nav_checkpoints.gen_nav_index_data(
         account_datas=adlist,
         price_map=pricer.price_map,
         begin_date=begin_date,
@@ -125,8 +124,36 @@ def get_nav_index():
     return jsonify(nav_index)
 
 
+@bp.get("/dashboard")
+@require_auth
+@cached_result
+def get_dashboard():
+    """/nav_index, /pnl 与期末持仓, 只遍历一次交易"""
+    begin_date, end_date, pricer, group, adlist = _get_group_and_config()
+
+    dashboard = gen_dashboard_data(
+        account_datas=adlist,
+        price_map=pricer.price_map,
+        begin_date=begin_date,
+        end_date=end_date,
+        target_currency=group.currency,
+    )
+
+    return jsonify(
+        {
+            "nav_index": dashboard.nav,
+            "pnl": dashboard.pnl,
+            "holdings": [
+                {"number": position.units.number, "currency": position.units.currency}
+                for position in dashboard.holdings.get_positions()
+            ],
+        }
+    )
+
+
 @bp.get("/cash_flows")
 @require_auth
+@cached_result
 def get_cash_flows():
     begin_date, end_date, pricer, _, adlist = _get_group_and_config()
 
@@ -137,6 +164,7 @@ def get_cash_flows():
 
 @bp.get("/investments")
 @require_auth
+@cached_result
 def get_investments():
     begin_date, end_date, pricer, _, adlist = _get_group_and_config()
 
@@ -154,6 +182,7 @@ def get_investments():
 
 @bp.get("/calendar_returns")
 @require_auth
+@cached_result
 def get_calendar_returns():
     begin_date, end_date, pricer, group, adlist = _get_group_and_config()
 
@@ -162,6 +191,7 @@ def get_calendar_returns():
 
 @require_auth
 @bp.get("/cumulative_returns")
+@cached_result
 def get_cumulative_returns():
     begin_date, end_date, pricer, group, adlist = _get_group_and_config()
 
@@ -170,17 +200,56 @@ def get_cumulative_returns():
 
 @require_auth
 @bp.get("/holding")
+@cached_result
 def get_holding():
-    entries = current_app.entries
+    snapshot = current_app.snapshot
 
     beangrow_path = current_app.doujia_config.beangrow_config
     distribution_path = os.path.join(current_app.ledger_root, current_app.doujia_config.investment_config)
     investment_groups = get_investment_holdings(
-        entries,
+        snapshot,
         beangrow_path,
         distribution_path,
         current_app.options_map,
         datetime.date.today() + datetime.timedelta(days=1),
     )
 
-    return jsonify(create_portfolio_report(entries, investment_groups, "USD"))
+    return jsonify(create_portfolio_report(snapshot.entries, investment_groups, "USD"))
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {current_app.json.dumps(data)}\n\n"
+
+
+@bp.get("/holding/stream")
+@require_auth
+def stream_holding():
+    """
+    /portfolio/holding 的 Server-Sent Events 版本
+    连接后先发送完整的 snapshot, 之后价格变化时发送只包含变化字段的 delta, 组或持仓的组成变化时重新发送 snapshot
+    """
+    holding_stream = current_app.holding_stream
+    client, report = holding_stream.connect()
+
+    def generate():
+        try:
+            if report is not None:
+                yield _sse("snapshot", report)
+
+            while True:
+                try:
+                    event, data = client.get(timeout=HOLDING_STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    holding_stream.refresh()
+                    yield ": heartbeat\n\n"
+                    continue
+
+                yield _sse(event, data)
+        finally:
+            holding_stream.disconnect(client)
+
+    return current_app.response_class(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
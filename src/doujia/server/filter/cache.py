@@ -0,0 +1,38 @@
+import datetime
+from functools import wraps
+
+from flask import make_response, request
+
+from doujia.price.cache import symbol_price_cache
+from doujia.server.app import current_app
+from doujia.server.logic.result_cache import CachedResult
+
+
+def _normalize_args() -> tuple[tuple[str, str], ...]:
+    # __debug__user__ 等调试参数不影响结果
+    return tuple(sorted((k, v) for k, v in request.args.items(multi=True) if not k.startswith("__")))
+
+
+def cached_result(f):
+    """
+    按 (账本 commit, 价格缓存版本, endpoint, 查询参数) 缓存接口结果
+    接口使用 date.today() 计算区间, 因此日期也作为缓存版本的一部分
+    """
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        cache = current_app.result_cache
+        ledger = current_app.ledger
+        generation = (ledger.version, ledger.commit_id, symbol_price_cache.version, datetime.date.today())
+        key = (request.endpoint, _normalize_args())
+
+        cached = cache.get(generation, key)
+        if cached is not None:
+            return current_app.response_class(cached.body, status=cached.status, mimetype=cached.mimetype)
+
+        response = make_response(f(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            cache.put(generation, key, CachedResult(response.get_data(), response.status_code, response.mimetype))
+        return response
+
+    return decorated_function
@@ -0,0 +1,31 @@
+from doujia.server.logic.result_cache import CachedResult, ResultCache
+
+
+def _result(size: int) -> CachedResult:
+    return CachedResult(b"x" * size, 200, "application/json")
+
+
+def test_evict_least_recently_used_when_exceed_max_bytes():
+    cache = ResultCache(max_bytes=30)
+
+    cache.put(1, "a", _result(10))
+    cache.put(1, "b", _result(10))
+    cache.put(1, "c", _result(10))
+    assert cache.get(1, "a") is not None
+
+    cache.put(1, "d", _result(10))
+
+    assert cache.get(1, "b") is None
+    assert cache.get(1, "a") is not None
+    assert cache.size == 30
+
+
+def test_new_generation_should_invalidate_all_results():
+    cache = ResultCache()
+    cache.put((1, 1), "a", _result(10))
+
+    assert cache.get((1, 2), "a") is None
+
+    cache.put((1, 2), "b", _result(10))
+    assert cache.get((1, 1), "a") is None
+    assert len(cache) == 1
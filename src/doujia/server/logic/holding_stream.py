@@ -0,0 +1,120 @@
+import datetime
+import json
+import os
+import queue
+import threading
+from collections.abc import Callable
+
+from flask import Flask
+from logzero import logger
+
+from doujia.price.cache import SymbolPriceCache, symbol_price_cache
+from doujia.report.investment import get_investment_holdings
+from doujia.report.portfolio.data import GroupPositions
+from doujia.report.portfolio.delta import portfolio_delta
+from doujia.report.portfolio.portfolio import group_positions, value_portfolio
+from doujia.server.logic.ledger import LedgerState
+
+# (event, data), event 为 snapshot 或 delta
+StreamEvent = tuple[str, dict]
+
+
+class HoldingStream:
+    """
+    持仓报告的推送源
+    持仓 (get_investment_holdings 与按标的合并的持仓成本) 只在账本版本变化时重新计算
+    价格变化时只重新计算市值相关的字段, 与上一次结果的差异推送给每个连接
+    """
+
+    def __init__(self, app: Flask, target_currency: str = "USD", cache: SymbolPriceCache = symbol_price_cache):
+        self.app = app
+        self.target_currency = target_currency
+        self.cache = cache
+        # (账本版本, 日期) -> 持仓
+        self._positions: tuple[tuple[int, datetime.date], list[GroupPositions]] | None = None
+        # 最后一次推送的结果, 以及计算时的 (账本版本, 价格版本, 日期)
+        self._report: dict | None = None
+        self._generation: tuple[int, int, datetime.date] | None = None
+        self._clients: list[queue.Queue[StreamEvent]] = []
+        self._unsubscribe: Callable[[], None] | None = None
+        # 计算时读取共享价格可能触发订阅并再次进入 refresh
+        self._lock = threading.RLock()
+        self._clients_lock = threading.Lock()
+
+    def _load_positions(self, ledger: LedgerState) -> list[GroupPositions]:
+        today = datetime.date.today()
+        key = (ledger.version, today)
+        if self._positions is not None and self._positions[0] == key:
+            return self._positions[1]
+
+        investment_groups = get_investment_holdings(
+            ledger.snapshot,
+            ledger.doujia_config.beangrow_config,
+            os.path.join(self.app.ledger_root, ledger.doujia_config.investment_config),
+            ledger.options_map,
+            today + datetime.timedelta(days=1),
+        )
+        positions = group_positions(investment_groups)
+        self._positions = (key, positions)
+        return positions
+
+    def _compute(self, ledger: LedgerState) -> dict:
+        portfolio = value_portfolio(ledger.entries, self._load_positions(ledger), self.target_currency)
+        # 与 /portfolio/holding 的 JSON 结果相同
+        return json.loads(self.app.json.dumps(portfolio))
+
+    def refresh(self) -> StreamEvent | None:
+        """账本或价格变化后重新计算并推送给所有连接, 返回推送的事件"""
+        # 共享价格时读取 version 可能合并新的价格并再次调用 refresh, 因此在加锁之前读取
+        price_version = self.cache.version
+        with self._lock:
+            ledger = self.app.ledger_state
+            generation = (ledger.version, price_version, datetime.date.today())
+            if generation == self._generation:
+                return None
+
+            try:
+                report = self._compute(ledger)
+            except Exception as e:
+                logger.error(f"Failed to compute holding report: {e}")
+                return None
+
+            old = self._report
+            self._report, self._generation = report, generation
+
+            delta = None if old is None else portfolio_delta(old, report)
+            if delta is None:
+                event: StreamEvent = ("snapshot", report)
+            elif delta:
+                event = ("delta", delta)
+            else:
+                return None
+
+            # 在锁内推送, 保证各连接收到的事件与计算的顺序一致
+            with self._clients_lock:
+                for client in self._clients:
+                    client.put(event)
+            return event
+
+    def connect(self) -> tuple[queue.Queue[StreamEvent], dict | None]:
+        """
+        注册一个连接, 返回它的事件队列与当前完整的结果 (还没有计算成功时为 None), 之后的变化通过队列推送
+        注册与读取结果在同一个锁内, 之后的每次计算都会推送给这个连接
+        """
+        self.refresh()
+
+        client: queue.Queue[StreamEvent] = queue.Queue()
+        with self._lock, self._clients_lock:
+            self._clients.append(client)
+            if self._unsubscribe is None:
+                self._unsubscribe = self.cache.subscribe(lambda version, changed: self.refresh())
+            return client, self._report
+
+    def disconnect(self, client: queue.Queue[StreamEvent]):
+        with self._clients_lock:
+            if client in self._clients:
+                self._clients.remove(client)
+            # 没有连接时不再随价格变化计算
+            if not self._clients and self._unsubscribe is not None:
+                self._unsubscribe()
+                self._unsubscribe = None
@@ -1,9 +1,14 @@
 import os
+import threading
 from dataclasses import dataclass
 from typing import TypeVar
 
 from beancount.core import data
-from beancount.loader import load_file
+
+from doujia.ledger.cache import LedgerCache
+from doujia.ledger.inventory_checkpoint import InventoryCheckpoints
+from doujia.ledger.loader import incremental_loader
+from doujia.ledger.snapshot import LedgerSnapshot
 
 Directive = TypeVar("Directive", bound=data.Directive)
 
@@ -15,10 +20,33 @@ class DoujiaConfig:
     beangrow_config: str
     import_to: str
     import_account: str
+    # file/ 价格来源读取的 JSON 文件
+    price_file: str = ""
+    # http-json/ 价格来源的 URL 模板, 例如 https://example.com/quote/{symbol}
+    price_http_json: str = ""
+
+
+@dataclass(frozen=True)
+class LedgerState:
+    """一次 reload 的完整结果, 只能整体替换"""
+
+    # 每次 reload 递增, 未提交的修改也会产生新的 version
+    version: int
+    commit_id: str | None
+    entries: list[Directive]
+    options_map: dict
+    doujia_config: DoujiaConfig
+    snapshot: LedgerSnapshot
+    inventory_checkpoints: InventoryCheckpoints
 
 
-def load_beancount(ledger_path: str) -> tuple[list[Directive], DoujiaConfig, dict]:
-    entries, errors, options_map = load_file(ledger_path)
+def load_beancount(ledger_path: str, cache_dir: str | None = None) -> tuple[list[Directive], DoujiaConfig, dict]:
+    if cache_dir is None:
+        entries, errors, options_map = incremental_loader.load_file(ledger_path)
+    else:
+        entries, errors, options_map = LedgerCache(cache_dir).load_file(ledger_path, load=incremental_loader.load_file)
+        # 命中磁盘缓存时 incremental_loader 没有解析过文件, 在后台预热, 第一次修改后的 reload 不需要解析全部文件
+        threading.Thread(target=incremental_loader.warm, args=(ledger_path,), name="ledger-warm", daemon=True).start()
     if errors:
         raise ValueError(f"Beancount load errors: {errors}")
 
@@ -45,5 +73,9 @@ def load_beancount(ledger_path: str) -> tuple[list[Directive], DoujiaConfig, dic
                 config.beangrow_config = os.path.abspath(os.path.join(ledger_root, opt_value.value))
             elif opt_key.value == "import-to":
                 config.import_to = os.path.abspath(os.path.join(ledger_root, opt_value.value))
+            elif opt_key.value == "price-file":
+                config.price_file = os.path.abspath(os.path.join(ledger_root, opt_value.value))
+            elif opt_key.value == "price-http-json":
+                config.price_http_json = opt_value.value
 
     return entries, config, options_map
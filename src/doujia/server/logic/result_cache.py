@@ -0,0 +1,73 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    body: bytes
+    status: int
+    mimetype: str
+
+
+class ResultCache:
+    """
+    接口计算结果的 LRU 缓存
+    generation 由账本版本与价格缓存版本等组成, 任意一个发生变化时整个缓存失效
+    缓存总大小超过 max_bytes 或条目数超过 max_entries 时淘汰最久未使用的结果
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 1024):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._items: OrderedDict[Hashable, CachedResult] = OrderedDict()
+        self._size = 0
+        self._generation: Hashable | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, generation: Hashable, key: Hashable) -> CachedResult | None:
+        with self._lock:
+            if generation != self._generation:
+                return None
+
+            result = self._items.get(key)
+            if result is not None:
+                self._items.move_to_end(key)
+            return result
+
+    def put(self, generation: Hashable, key: Hashable, result: CachedResult):
+        # 单个结果超过上限时不缓存
+        if len(result.body) > self.max_bytes:
+            return
+
+        with self._lock:
+            if generation != self._generation:
+                self._clear()
+                self._generation = generation
+
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old.body)
+
+            self._items[key] = result
+            self._size += len(result.body)
+
+            while self._size > self.max_bytes or len(self._items) > self.max_entries:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted.body)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self._items.clear()
+        self._size = 0
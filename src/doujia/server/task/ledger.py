@@ -1,18 +1,33 @@
+import itertools
 import os
+import threading
 
 import git
 from logzero import logger
 
+from doujia.ledger.inventory_checkpoint import InventoryCheckpoints
+from doujia.ledger.snapshot import LedgerSnapshot
+from doujia.ledger.watcher import WatchTargets
 from doujia.server.app import FlaskApp
-from doujia.server.logic.ledger import load_beancount
+from doujia.server.logic.ledger import LedgerState, load_beancount
 
+_reload_lock = threading.Lock()
+_ledger_versions = itertools.count(1)
 
-def reload_ledger(app: FlaskApp) -> bool:
+
+def reload_ledger(app: FlaskApp, force: bool = False, cold_start: bool = False) -> bool:
     """
     重新加载 beancount 文件
-    当 git commit id 发生变化时才重新加载
+    当 git commit id 发生变化时才重新加载, force 为 True 时总是重新加载
+    新的 LedgerState 构建完成后才替换 app.ledger_state, 正在处理的请求继续使用旧的状态
+    cold_start 为 True 时 (启动时) 使用磁盘缓存, 之后的 reload 直接增量加载, 耗时只与变化的文件有关
     返回是否加载成功
     """
+    with _reload_lock:
+        return _reload_ledger(app, force, cold_start)
+
+
+def _reload_ledger(app: FlaskApp, force: bool, cold_start: bool) -> bool:
     ledger_path = os.path.join(app.ledger_root, "main.bean")
     logger.debug(f"Reloading ledger from {ledger_path}")
 
@@ -27,19 +42,52 @@ def reload_ledger(app: FlaskApp) -> bool:
         logger.error(f"Failed to get git commit ID: {e!s}")
 
     # 如果 commit id 没有变化, 不需要重新加载
-    if hasattr(app, "ledger_commit_id") and current_commit_id is not None and app.ledger_commit_id == current_commit_id:
+    if (
+        not force
+        and app.ledger_state is not None
+        and current_commit_id is not None
+        and app.ledger_state.commit_id == current_commit_id
+    ):
         logger.debug("Ledger content not changed, skip reloading")
         return True
 
     logger.info(f"ledger commit ID changed: {current_commit_id}")
 
-    # 更新 commit id 并重新加载
-    app.ledger_commit_id = current_commit_id
-    entries, doujia_config, options_map = load_beancount(ledger_path)
+    cache_dir = None
+    if cold_start and not app.config.get("TESTING"):
+        cache_dir = os.path.join(app.instance_path, "ledger_cache")
+    entries, doujia_config, options_map = load_beancount(ledger_path, cache_dir)
+
+    snapshot = LedgerSnapshot.build(entries, options_map)
 
-    app.entries = entries
-    app.options_map = options_map
-    app.doujia_config = doujia_config
+    # 一次赋值发布完整的新状态
+    app.ledger_state = LedgerState(
+        version=next(_ledger_versions),
+        commit_id=current_commit_id,
+        entries=entries,
+        options_map=options_map,
+        doujia_config=doujia_config,
+        snapshot=snapshot,
+        inventory_checkpoints=InventoryCheckpoints.build(snapshot),
+    )
 
     logger.info("Successfully reloaded beancount file")
     return True
+
+
+def get_watch_targets(app: FlaskApp) -> WatchTargets:
+    """返回需要监听的账本文件与 git HEAD/refs"""
+    state = app.ledger_state
+    ledger_files = set(state.options_map.get("include", [])) if state is not None else set()
+    ledger_files.add(os.path.join(app.ledger_root, "main.bean"))
+
+    git_paths = set()
+    git_dir = os.path.join(app.ledger_root, ".git")
+    if os.path.isdir(git_dir):
+        git_paths = {
+            os.path.join(git_dir, "HEAD"),
+            os.path.join(git_dir, "packed-refs"),
+            os.path.join(git_dir, "refs", "heads"),
+        }
+
+    return WatchTargets(ledger_files=ledger_files, git_paths=git_paths)
@@ -1,22 +1,50 @@
+import datetime
+
+import pytz
 from beancount.core.getters import get_commodity_directives
 from logzero import logger
 
-from doujia.price.yahoo import update_price_cache as update_price_cache_from_yahoo
+from doujia.price.cache import symbol_price_cache
+from doujia.price.market_hours import price_refresh_planner
+from doujia.price.price_map import price_providers
+from doujia.price.provider import FilePriceProvider, HttpJsonPriceProvider, get_price_sources
 from doujia.server.app import FlaskApp
+from doujia.server.logic.ledger import DoujiaConfig
+
+
+def _register_configured_providers(config: DoujiaConfig) -> None:
+    """账本中配置的 provider 在每次刷新时按最新配置注册"""
+    if config.price_file:
+        provider = price_providers.providers.get("file")
+        if not isinstance(provider, FilePriceProvider) or provider.path != config.price_file:
+            price_providers.register("file", FilePriceProvider(config.price_file))
+
+    if config.price_http_json:
+        provider = price_providers.providers.get("http-json")
+        if not isinstance(provider, HttpJsonPriceProvider) or provider.url_template != config.price_http_json:
+            price_providers.register("http-json", HttpJsonPriceProvider(config.price_http_json))
 
 
 def update_price_cache(app: FlaskApp) -> None:
-    commodity_map = get_commodity_directives(app.entries)
-    symbols = dict()
-    for currency, commodity in commodity_map.items():
-        if "price" in commodity.meta and "yahoo/" in commodity.meta["price"]:
-            symbols[currency] = commodity.meta["price"].split("/")[-1]
+    # 多进程共享价格时只有一个进程获取价格, 其他进程读取它写入的结果
+    if not symbol_price_cache.elect_refresher():
+        return
+
+    _register_configured_providers(app.doujia_config)
+
+    sources = get_price_sources(get_commodity_directives(app.entries))
+    if len(sources) == 0:
+        return
 
-    if len(symbols) == 0:
+    # 只刷新开盘或盘前盘后的市场
+    now = datetime.datetime.now(pytz.utc)
+    due = price_refresh_planner.plan((x for currency_sources in sources.values() for x in currency_sources), now)
+    if len(due) == 0:
         return
 
     try:
-        update_price_cache_from_yahoo(list(symbols.values()))
-        logger.info("Successfully updated price cache")
+        quotes = price_providers.refresh(due)
+        price_refresh_planner.record(due, quotes, now)
+        logger.info(f"Successfully updated price cache, {len(quotes)} symbols")
     except Exception as e:
         logger.error(f"Failed to update price cache: {e}")